@@ -0,0 +1,398 @@
+"""
+常驻分析服务
+把弹幕语料、逐文本的噪声/情感/关键词标签、分词缓存和按视频的计数常驻内存，
+通过本地HTTP接口在毫秒级返回查询结果，并支持不重启地增量导入新弹幕
+
+接口（均返回JSON，附带 elapsed_ms）:
+    GET  /summary                                   总量、噪声率、情感分布、排名前8
+    GET  /topk?keyword=大模型&video=BV...&k=10       按关键词和/或视频的高频弹幕
+    GET  /sentiment?keyword=...&video=...           情感分布
+    GET  /samples?keyword=...&video=...&sentiment=negative&n=20   示例弹幕
+    GET  /words?video=...&k=20                      分词后的高频词（分词结果按唯一文本缓存）
+    POST /ingest  {"bvid": "BV...", "danmaku": ["...", ...]}      增量导入
+
+用法:
+    python analysis_server.py --cache-file danmaku_cache.txt --port 8766
+"""
+import argparse
+import heapq
+import json
+import os
+import threading
+import time
+from array import array
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+from danmaku_corpus import DanmakuCorpus
+from data_analyzer import DataAnalyzer
+from data_processor import DanmakuProcessor
+from keyword_matcher import KeywordAutomaton
+
+SENTIMENT_NAMES = {1: 'positive', -1: 'negative', 0: 'neutral'}
+SENTIMENT_VALUES = {name: value for value, name in SENTIMENT_NAMES.items()}
+# 不在自动机中的临时关键词，缓存其匹配结果的数量上限
+ADHOC_CACHE_SIZE = 256
+MAX_K = 1000
+
+
+class AnalysisState:
+    def __init__(self, processor: DanmakuProcessor = None, analyzer: DataAnalyzer = None):
+        self.processor = processor or DanmakuProcessor()
+        self.analyzer = analyzer or DataAnalyzer()
+        self.corpus = DanmakuCorpus()
+        # 以下数组下标均为唯一文本id，随新文本出现而增长
+        self.noise = array('b')
+        self.sentiment = array('b')
+        # 分析维度关键词统一放进一个自动机，每个新文本只扫描一次
+        analyzer = self.analyzer
+        self.automaton = KeywordAutomaton(self.processor.keywords + analyzer.cost_keywords
+                                          + analyzer.application_keywords + analyzer.negative_keywords
+                                          + analyzer.positive_keywords)
+        self._positive_ids = {self.automaton.keywords.index(kw) for kw in analyzer.positive_keywords}
+        self._negative_ids = {self.automaton.keywords.index(kw) for kw in analyzer.negative_keywords}
+        # 关键词 -> 命中它的非噪声唯一文本id
+        self.keyword_uids: Dict[str, set] = {kw: set() for kw in self.automaton.keywords}
+        self.videos: List[str] = []
+        self.video_index: Dict[str, int] = {}
+        # 视频id -> Counter(唯一文本id -> 该视频中的出现次数)，只统计非噪声弹幕
+        self.video_counts: Dict[int, Counter] = {}
+        self.kept_total = 0
+        self.noise_total = 0
+        self.sentiment_totals = Counter()
+        self._tokens: Dict[int, tuple] = {}
+        self._visualizer = None
+        self._adhoc: Dict[str, set] = {}
+        self._results: Dict[tuple, object] = {}
+        self._lock = threading.RLock()
+
+    def _video_id(self, bvid: Optional[str]) -> int:
+        bvid = bvid or ''
+        video_id = self.video_index.get(bvid)
+        if video_id is None:
+            video_id = self.video_index[bvid] = len(self.videos)
+            self.videos.append(bvid)
+            self.video_counts[video_id] = Counter()
+        return video_id
+
+    def _label_new_text(self, uid: int, text: str):
+        is_noise = self.processor.is_noise(text)
+        matched = self.automaton.match_ids(text)
+        # 与 DataAnalyzer.sentiment_label 相同的计分规则，命中关键词由自动机一次给出
+        pos_score = len(matched & self._positive_ids)
+        neg_score = len(matched & self._negative_ids)
+        label = 1 if pos_score > neg_score else (-1 if neg_score > pos_score else 0)
+        self.noise.append(1 if is_noise else 0)
+        self.sentiment.append(label)
+        if not is_noise:
+            keywords = self.automaton.keywords
+            for keyword_id in matched:
+                self.keyword_uids[keywords[keyword_id]].add(uid)
+            for keyword, uids in self._adhoc.items():
+                if keyword in text:
+                    uids.add(uid)
+
+    def ingest(self, texts: Iterable[str], bvid: Optional[str] = None) -> Dict:
+        """
+        增量导入一个视频的弹幕，返回本次导入的条数和其中的噪声条数
+        """
+        added = noise = 0
+        with self._lock:
+            video_id = self._video_id(bvid)
+            counter = self.video_counts[video_id]
+            for text in texts:
+                uid = self.corpus.append(text)
+                if uid == len(self.noise):
+                    self._label_new_text(uid, text)
+                added += 1
+                if self.noise[uid]:
+                    noise += 1
+                    continue
+                counter[uid] += 1
+                self.sentiment_totals[self.sentiment[uid]] += 1
+            self.noise_total += noise
+            self.kept_total += added - noise
+            if added:
+                self._results.clear()
+        return {'added': added, 'noise': noise}
+
+    def load(self, danmaku_list: Iterable[str], timeline=None):
+        """
+        导入已有缓存；提供逐条对齐的 DanmakuTimeline 时按视频分组
+        """
+        if timeline is None or len(timeline) != len(danmaku_list):
+            self.ingest(danmaku_list)
+            return
+        batch = []
+        current = None
+        for text, video_id in zip(danmaku_list, timeline.video_ids):
+            if video_id != current and batch:
+                self.ingest(batch, timeline.videos[current])
+                batch = []
+            current = video_id
+            batch.append(text)
+        if batch:
+            self.ingest(batch, timeline.videos[current])
+
+    def _uids_for_keyword(self, keyword: str) -> set:
+        uids = self.keyword_uids.get(keyword)
+        if uids is not None:
+            return uids
+        uids = self._adhoc.get(keyword)
+        if uids is None:
+            # 临时关键词：扫描一次唯一文本，之后随导入增量维护
+            uids = {uid for uid, text in enumerate(self.corpus.iter_unique_texts())
+                    if not self.noise[uid] and keyword in text}
+            if len(self._adhoc) >= ADHOC_CACHE_SIZE:
+                self._adhoc.pop(next(iter(self._adhoc)))
+            self._adhoc[keyword] = uids
+        return uids
+
+    def _candidate_counts(self, keyword: Optional[str], video: Optional[str]):
+        """
+        返回 (唯一文本id, 次数) 的迭代器；视频不存在时返回None
+        """
+        if video is not None:
+            video_id = self.video_index.get(video)
+            if video_id is None:
+                return None
+            counter = self.video_counts[video_id]
+            if keyword is None:
+                return counter.items()
+            uids = self._uids_for_keyword(keyword)
+            if len(uids) < len(counter):
+                return ((uid, counter[uid]) for uid in uids if uid in counter)
+            return ((uid, count) for uid, count in counter.items() if uid in uids)
+        counts = self.corpus.counts()
+        if keyword is None:
+            return ((uid, counts[uid]) for uid in range(len(counts)) if not self.noise[uid])
+        return ((uid, counts[uid]) for uid in self._uids_for_keyword(keyword))
+
+    def _cached(self, key: tuple, compute):
+        result = self._results.get(key)
+        if result is None:
+            result = self._results[key] = compute()
+        return result
+
+    def topk(self, keyword: Optional[str] = None, video: Optional[str] = None, k: int = 10) -> List[Dict]:
+        with self._lock:
+            def compute():
+                candidates = self._candidate_counts(keyword, video)
+                if candidates is None:
+                    return []
+                top = heapq.nlargest(k, candidates, key=lambda item: item[1])
+                return [{'rank': i, 'danmaku': self.corpus.text(uid), 'count': count,
+                         'sentiment': SENTIMENT_NAMES[self.sentiment[uid]]}
+                        for i, (uid, count) in enumerate(top, 1)]
+            return self._cached(('topk', keyword, video, k), compute)
+
+    def sentiment_breakdown(self, keyword: Optional[str] = None, video: Optional[str] = None) -> Dict:
+        with self._lock:
+            def compute():
+                if keyword is None and video is None:
+                    totals = self.sentiment_totals
+                else:
+                    totals = Counter()
+                    for uid, count in self._candidate_counts(keyword, video) or ():
+                        totals[self.sentiment[uid]] += count
+                total = sum(totals.values())
+                result = {name: totals[value] for value, name in SENTIMENT_NAMES.items()}
+                result['total'] = total
+                result['positive_rate'] = totals[1] / total if total else 0
+                result['negative_rate'] = totals[-1] / total if total else 0
+                return result
+            return self._cached(('sentiment', keyword, video), compute)
+
+    def samples(self, keyword: Optional[str] = None, video: Optional[str] = None,
+                sentiment: Optional[str] = None, n: int = 20) -> List[str]:
+        """
+        符合条件的示例弹幕（不重复文本），找满n条即停止
+        """
+        label = SENTIMENT_VALUES.get(sentiment) if sentiment else None
+        result = []
+        with self._lock:
+            for uid, _ in self._candidate_counts(keyword, video) or ():
+                if len(result) >= n:
+                    break
+                if label is not None and self.sentiment[uid] != label:
+                    continue
+                result.append(self.corpus.text(uid))
+        return result
+
+    def _tokens_for(self, uid: int) -> tuple:
+        tokens = self._tokens.get(uid)
+        if tokens is None:
+            # 分词规则与词云一致；每个唯一文本只分词一次
+            if self._visualizer is None:
+                from visualizer import Visualizer
+                self._visualizer = Visualizer()
+            tokens = self._tokens[uid] = tuple(self._visualizer._tokenize(self.corpus.text(uid)))
+        return tokens
+
+    def top_words(self, video: Optional[str] = None, k: int = 20) -> List[Dict]:
+        with self._lock:
+            def compute():
+                word_freq = Counter()
+                for uid, count in self._candidate_counts(None, video) or ():
+                    for word in self._tokens_for(uid):
+                        word_freq[word] += count
+                return [{'word': word, 'count': count} for word, count in word_freq.most_common(k)]
+            return self._cached(('words', video, k), compute)
+
+    def summary(self) -> Dict:
+        with self._lock:
+            total = self.kept_total + self.noise_total
+            return {
+                'total': total,
+                'kept': self.kept_total,
+                'unique': self.corpus.unique_count,
+                'videos': len([bvid for bvid in self.videos if bvid]),
+                'noise_rate': self.noise_total / total if total else 0,
+                'sentiment': self.sentiment_breakdown(),
+                'top_8': self.topk(k=8),
+            }
+
+
+class _AnalysisHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, data: Dict):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        start = time.perf_counter()
+        url = urlparse(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        state = self.server.state
+        keyword = query.get('keyword') or None
+        video = query.get('video') or None
+        try:
+            k = min(int(query.get('k', 10)), MAX_K)
+            n = min(int(query.get('n', 20)), MAX_K)
+        except ValueError:
+            self._send_json(400, {'error': 'k 和 n 必须为整数'})
+            return
+
+        if url.path == '/summary':
+            data = state.summary()
+        elif url.path == '/topk':
+            data = {'items': state.topk(keyword, video, k)}
+        elif url.path == '/sentiment':
+            data = state.sentiment_breakdown(keyword, video)
+        elif url.path == '/samples':
+            sentiment = query.get('sentiment')
+            if sentiment and sentiment not in SENTIMENT_VALUES:
+                self._send_json(400, {'error': f"sentiment 可选 {', '.join(SENTIMENT_VALUES)}"})
+                return
+            data = {'items': state.samples(keyword, video, sentiment, n)}
+        elif url.path == '/words':
+            data = {'items': state.top_words(video, k)}
+        else:
+            self._send_json(404, {'error': 'not found'})
+            return
+        data = dict(data, elapsed_ms=round((time.perf_counter() - start) * 1000, 3))
+        self._send_json(200, data)
+
+    def do_POST(self):
+        start = time.perf_counter()
+        if urlparse(self.path).path != '/ingest':
+            self._send_json(404, {'error': 'not found'})
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            payload = json.loads(self.rfile.read(length) or b'{}')
+            if not isinstance(payload, dict):
+                raise ValueError('请求体必须是JSON对象')
+            texts = payload['danmaku']
+            if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+                raise ValueError('danmaku 必须是字符串列表')
+            if not isinstance(payload.get('bvid'), (str, type(None))):
+                raise ValueError('bvid 必须是字符串')
+        except (KeyError, TypeError, ValueError) as e:
+            self._send_json(400, {'error': f"请求格式错误: {e}"})
+            return
+        result = self.server.state.ingest(texts, payload.get('bvid'))
+        result['elapsed_ms'] = round((time.perf_counter() - start) * 1000, 3)
+        self._send_json(200, result)
+
+
+class AnalysisServer:
+    def __init__(self, state: AnalysisState = None, host: str = '127.0.0.1', port: int = 8766):
+        self.state = state or AnalysisState()
+        self._httpd = ThreadingHTTPServer((host, port), _AnalysisHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.state = self.state
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'AnalysisServer':
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._httpd.serve_forever()
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+
+def main(argv=None) -> int:
+    from danmaku_loader import CACHE_FILENAME, load_cache
+    from danmaku_timeline import DanmakuTimeline
+
+    parser = argparse.ArgumentParser(description='B站弹幕常驻分析服务')
+    parser.add_argument('--cache-file', default=CACHE_FILENAME, help='启动时导入的弹幕缓存（不存在时从空语料开始）')
+    parser.add_argument('--timeline-file', default='danmaku_timeline.bin', help='与缓存对齐的时间信息（用于按视频查询）')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--warm-tokens', action='store_true', help='启动时预先对全部不重复弹幕分词（/words 首次查询不再等待）')
+    args = parser.parse_args(argv)
+
+    state = AnalysisState()
+    cache = load_cache(args.cache_file)
+    if cache is not None:
+        start = time.perf_counter()
+        timeline = DanmakuTimeline.load(args.timeline_file) if os.path.exists(args.timeline_file) else None
+        state.load(cache, timeline)
+        cache.close()
+        print(f"已导入 {len(state.corpus)} 条弹幕（{state.corpus.unique_count} 条不重复），"
+              f"耗时 {time.perf_counter() - start:.1f} 秒")
+    if args.warm_tokens:
+        start = time.perf_counter()
+        state.top_words()
+        print(f"分词缓存已预热，耗时 {time.perf_counter() - start:.1f} 秒")
+    server = AnalysisServer(state, args.host, args.port)
+    print(f"分析服务已启动: {server.url} （Ctrl+C 退出）")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,410 @@
+"""
+近似分析模块
+按目标误差自动确定样本量，对弹幕抽样后估计情感占比、应用领域排名和关键话题排名，并给出置信区间。
+样本量只取决于目标误差和置信水平（语料越大越接近 z²·p(1-p)/e²），与语料规模无关
+
+抽样方式:
+    stratified  有与弹幕逐条对齐的时间信息时按视频分层（按各视频弹幕数比例分配样本量）
+    random      可随机访问的语料（DanmakuCorpus、列表）直接抽取下标
+    reservoir   只能顺序遍历的弹幕迭代器用蓄水池抽样（Algorithm L）
+
+用法:
+    python approximate_analysis.py --cache-file danmaku_cache.txt --target-error 0.01
+"""
+import argparse
+import math
+import random
+from collections import Counter
+from datetime import datetime
+from itertools import islice
+from statistics import NormalDist
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from data_analyzer import DataAnalyzer
+
+DEFAULT_TARGET_ERROR = 0.01
+DEFAULT_CONFIDENCE = 0.95
+
+
+def z_score(confidence: float) -> float:
+    """
+    双侧置信水平对应的标准正态分位数（0.95 -> 1.96）
+    """
+    return NormalDist().inv_cdf((1 + confidence) / 2)
+
+
+def required_sample_size(margin: float, confidence: float = DEFAULT_CONFIDENCE,
+                         population: Optional[int] = None, p: float = 0.5) -> int:
+    """
+    使比例估计的误差不超过 margin 所需的样本量：n0 = z²·p(1-p)/e²，
+    已知总体大小时再做有限总体校正 n = n0 / (1 + (n0-1)/N)；p=0.5 时最保守
+    """
+    if not 0 < margin < 1:
+        raise ValueError("目标误差必须在 0 和 1 之间")
+    n0 = z_score(confidence) ** 2 * p * (1 - p) / margin ** 2
+    if population is not None:
+        n0 = n0 / (1 + (n0 - 1) / population) if population > 0 else 0
+    n = math.ceil(n0)
+    return min(n, population) if population is not None else n
+
+
+def wilson_interval(rate: float, n: float, confidence: float = DEFAULT_CONFIDENCE) -> Tuple[float, float]:
+    """
+    比例的Wilson置信区间；n 为（有效）样本量，比例接近0或1时也不会越界
+    """
+    if n <= 0:
+        return 0.0, 1.0
+    z = z_score(confidence)
+    z2 = z * z
+    denominator = 1 + z2 / n
+    center = (rate + z2 / (2 * n)) / denominator
+    half = z * math.sqrt(rate * (1 - rate) / n + z2 / (4 * n * n)) / denominator
+    return max(0.0, center - half), min(1.0, center + half)
+
+
+def reservoir_sample(items: Iterable, k: int, rng: random.Random = None) -> Tuple[List, int]:
+    """
+    蓄水池抽样（Algorithm L）：一次遍历等概率抽取k条，返回 (样本, 总条数)
+    按几何分布直接跳过不会入选的元素，随机数调用次数约为 k·log(N/k)
+    """
+    rng = rng or random.Random()
+    iterator = iter(items)
+    reservoir = list(islice(iterator, k))
+    seen = len(reservoir)
+    if seen < k or k <= 0:
+        return reservoir, seen + sum(1 for _ in iterator)
+
+    def uniform() -> float:
+        u = rng.random()
+        while u == 0.0:
+            u = rng.random()
+        return u
+
+    w = math.exp(math.log(uniform()) / k)
+    while True:
+        skip = int(math.log(uniform()) / math.log(1 - w)) if w < 1 else 0
+        skipped = sum(1 for _ in islice(iterator, skip))
+        seen += skipped
+        if skipped < skip:
+            return reservoir, seen
+        sentinel = object()
+        item = next(iterator, sentinel)
+        if item is sentinel:
+            return reservoir, seen
+        seen += 1
+        reservoir[rng.randrange(k)] = item
+        w *= math.exp(math.log(uniform()) / k)
+
+
+def _allocate(sizes: np.ndarray, n: int) -> np.ndarray:
+    """
+    按比例分配各层样本量（最大余数法），每个非空层至少1条且不超过该层大小
+    """
+    total = int(sizes.sum())
+    exact = sizes * (n / total)
+    alloc = np.floor(exact).astype(np.int64)
+    remainder = n - int(alloc.sum())
+    if remainder > 0:
+        alloc[np.argsort(-(exact - alloc), kind='stable')[:remainder]] += 1
+    alloc = np.maximum(alloc, (sizes > 0).astype(np.int64))
+    return np.minimum(alloc, sizes)
+
+
+def _stratum_estimate(values: List[float], size: int) -> Tuple[float, float]:
+    """
+    单层样本的均值及均值估计的方差（含有限总体校正）
+    """
+    n = len(values)
+    mean = sum(values) / n
+    if n < 2:
+        return mean, 0.0
+    variance = sum((v - mean) ** 2 for v in values) / (n - 1)
+    return mean, (1 - n / size) * variance / n
+
+
+class ApproximateAnalyzer:
+    def __init__(self, analyzer: DataAnalyzer = None, target_error: float = DEFAULT_TARGET_ERROR,
+                 confidence: float = DEFAULT_CONFIDENCE, seed: Optional[int] = None):
+        self.analyzer = analyzer or DataAnalyzer()
+        self.target_error = target_error
+        self.confidence = confidence
+        self.rng = random.Random(seed)
+        # 抽中的文本只判断/分词一次（重复弹幕很常见）
+        self._label_cache: Dict[str, int] = {}
+        self._token_cache: Dict[str, List[str]] = {}
+
+    def sample(self, danmaku_list: Iterable[str], timeline=None) -> Dict:
+        """
+        抽取样本，返回 {'method', 'population', 'size', 'strata': [{'size', 'weight', 'texts'}]}
+        """
+        if hasattr(danmaku_list, '__getitem__') and hasattr(danmaku_list, '__len__'):
+            population = len(danmaku_list)
+            n = required_sample_size(self.target_error, self.confidence, population)
+            if timeline is not None and len(timeline) == population and population and len(timeline.videos) <= n:
+                return self._stratified_sample(danmaku_list, timeline, n)
+            rows = sorted(self.rng.sample(range(population), n))
+            strata = [{'size': population, 'weight': 1.0, 'texts': [danmaku_list[i] for i in rows]}] if n else []
+            return {'method': 'random', 'population': population, 'size': n, 'strata': strata}
+
+        # 总体大小未知，按不做有限总体校正的样本量抽取（结果偏保守）
+        n = required_sample_size(self.target_error, self.confidence)
+        texts, population = reservoir_sample(danmaku_list, n, self.rng)
+        strata = [{'size': population, 'weight': 1.0, 'texts': texts}] if texts else []
+        return {'method': 'reservoir', 'population': population, 'size': len(texts), 'strata': strata}
+
+    def _stratified_sample(self, danmaku_list, timeline, n: int) -> Dict:
+        video_ids = timeline.to_numpy()['video_ids']
+        population = len(video_ids)
+        sizes = np.bincount(video_ids, minlength=len(timeline.videos)).astype(np.int64)
+        alloc = _allocate(sizes, n)
+        # 稳定排序后每个视频的行号连续，起点由各层大小的前缀和给出
+        order = np.argsort(video_ids, kind='stable')
+        starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+        strata = []
+        for video in np.flatnonzero(alloc):
+            size, take, start = int(sizes[video]), int(alloc[video]), int(starts[video])
+            picks = sorted(self.rng.sample(range(size), take))
+            rows = order[start:start + size][picks]
+            strata.append({'size': size, 'weight': size / population,
+                           'texts': [danmaku_list[int(i)] for i in np.sort(rows)]})
+        return {'method': 'stratified', 'population': population, 'size': int(alloc.sum()), 'strata': strata}
+
+    def estimate(self, sample: Dict, func: Callable[[str], float]) -> Dict:
+        """
+        估计每条弹幕上 func 取值的总体均值：分层时为各层均值按层权重加权，方差同样按权重平方合并
+        返回 {'mean', 'low', 'high', 'total', 'total_low', 'total_high'}；
+        func 取0/1时均值即比例，区间用以有效样本量计算的Wilson区间，否则用正态近似区间
+        """
+        mean, variance, binary = 0.0, 0.0, True
+        for stratum in sample['strata']:
+            values = [func(text) for text in stratum['texts']]
+            binary = binary and all(v in (0, 1) for v in values)
+            stratum_mean, stratum_var = _stratum_estimate(values, stratum['size'])
+            mean += stratum['weight'] * stratum_mean
+            variance += stratum['weight'] ** 2 * stratum_var
+        if binary:
+            if variance > 0:
+                effective_n = mean * (1 - mean) / variance
+            else:
+                # 方差为0：全部取同一值或样本覆盖了整个总体
+                effective_n = sample['population'] if sample['size'] >= sample['population'] else sample['size']
+            low, high = wilson_interval(mean, effective_n, self.confidence)
+            if sample['size'] >= sample['population']:
+                low = high = mean
+        else:
+            half = z_score(self.confidence) * math.sqrt(variance)
+            low, high = max(0.0, mean - half), mean + half
+        population = sample['population']
+        return {'mean': mean, 'low': low, 'high': high,
+                'total': mean * population, 'total_low': low * population, 'total_high': high * population}
+
+    def _label(self, text: str) -> int:
+        label = self._label_cache.get(text)
+        if label is None:
+            label = self._label_cache[text] = self.analyzer.sentiment_label(text)
+        return label
+
+    def _tokens(self, text: str) -> List[str]:
+        tokens = self._token_cache.get(text)
+        if tokens is None:
+            import jieba
+            tokens = self._token_cache[text] = [word.strip() for word in jieba.cut(text)]
+        return tokens
+
+    def analyze_sentiment(self, sample: Dict) -> Dict:
+        return {
+            'positive': self.estimate(sample, lambda text: 1 if self._label(text) > 0 else 0),
+            'negative': self.estimate(sample, lambda text: 1 if self._label(text) < 0 else 0),
+            'neutral': self.estimate(sample, lambda text: 1 if self._label(text) == 0 else 0),
+        }
+
+    def analyze_keyword_share(self, sample: Dict, keywords: List[str]) -> Dict:
+        """
+        包含任一关键词的弹幕占比及条数估计
+        """
+        return self.estimate(sample, lambda text: 1 if any(kw in text for kw in keywords) else 0)
+
+    def analyze_application_mentions(self, sample: Dict) -> List[Tuple[str, Dict]]:
+        """
+        各应用领域的提及次数估计，按点估计降序取前10
+        """
+        results = [(kw, self.estimate(sample, lambda text, kw=kw: 1 if kw in text else 0))
+                   for kw in self.analyzer.application_keywords]
+        results = [item for item in results if item[1]['mean'] > 0]
+        return sorted(results, key=lambda item: item[1]['mean'], reverse=True)[:10]
+
+    def extract_key_topics(self, sample: Dict) -> List[Tuple[str, Dict]]:
+        """
+        重要话题词的出现次数估计（每条弹幕的出现次数作为观测值），按点估计降序取前10
+        """
+        important_words = ['模型', 'AI', '人工智能', '技术', '发展', '未来',
+                           '应用', '能力', '效果', '使用', '体验']
+        sampled = Counter()
+        for stratum in sample['strata']:
+            for text in stratum['texts']:
+                sampled.update(word for word in self._tokens(text) if word in important_words)
+        results = [(word, self.estimate(sample, lambda text, word=word: self._tokens(text).count(word)))
+                   for word in sampled]
+        return sorted(results, key=lambda item: item[1]['mean'], reverse=True)[:10]
+
+    def _examples(self, sample: Dict, keywords: List[str], limit: int = 5) -> List[str]:
+        found = []
+        for stratum in sample['strata']:
+            for text in stratum['texts']:
+                if text not in found and any(kw in text for kw in keywords):
+                    found.append(text)
+                    if len(found) >= limit:
+                        return found
+        return found
+
+    def _interval(self, estimate: Dict) -> str:
+        return (f"{estimate['mean']*100:.1f}%（{self.confidence*100:.0f}%置信区间 "
+                f"{estimate['low']*100:.1f}%–{estimate['high']*100:.1f}%）")
+
+    @staticmethod
+    def _count_interval(estimate: Dict, unit: str = '条') -> str:
+        return f"约 {estimate['total']:,.0f} {unit}（{estimate['total_low']:,.0f}–{estimate['total_high']:,.0f}）"
+
+    def generate_conclusion(self, danmaku_list: List[str], stats: Dict, index=None) -> str:
+        """
+        生成近似分析结论：各项比例与排名均为抽样估计，并标注置信区间
+        index: 可选的 InvertedIndex（与 danmaku_list 对应），有则用它按原始顺序提取示例弹幕
+        """
+        print("\n正在进行近似数据分析（抽样估计）...")
+        sample = self.sample(danmaku_list, stats.get('timeline'))
+        method_names = {'stratified': '按视频分层抽样', 'random': '简单随机抽样', 'reservoir': '蓄水池抽样'}
+        print(f"{method_names[sample['method']]} {sample['size']:,} 条（总体 {sample['population']:,} 条）")
+
+        sentiment = self.analyze_sentiment(sample)
+        applications = self.analyze_application_mentions(sample)
+        cost_share = self.analyze_keyword_share(sample, self.analyzer.cost_keywords)
+        concern_share = self.analyze_keyword_share(sample, self.analyzer.negative_keywords)
+        topics = self.extract_key_topics(sample)
+        index = self.analyzer._index_for(danmaku_list, index)
+        if index is not None:
+            cost_examples = index.first_rows(self.analyzer.cost_keywords, limit=5)
+            concern_examples = index.first_rows(self.analyzer.negative_keywords, limit=5)
+        else:
+            cost_examples = self._examples(sample, self.analyzer.cost_keywords)
+            concern_examples = self._examples(sample, self.analyzer.negative_keywords)
+
+        positive, negative, neutral = sentiment['positive'], sentiment['negative'], sentiment['neutral']
+        if positive['low'] > negative['high']:
+            attitude = '较为积极'
+        elif negative['low'] > positive['high']:
+            attitude = '存在一定担忧'
+        else:
+            attitude = (f"{'偏向积极' if positive['mean'] > negative['mean'] else '偏向担忧'}"
+                        f"（积极与消极占比的置信区间重叠，差异在抽样误差范围内）")
+
+        conclusion = f"""
+{'='*80}
+B站用户对大语言模型技术的主流看法分析报告（近似模式）
+{'='*80}
+
+一、总体概况
+-----------
+- 有效弹幕总数: {stats['total_count']:,} 条
+- 原始弹幕数: {stats['original_count']:,} 条
+- 数据来源: B站综合排序前300个相关视频
+- 抽样方式: {method_names[sample['method']]}，样本 {sample['size']:,} 条
+- 目标误差: ±{self.target_error*100:.1f}%（置信水平 {self.confidence*100:.0f}%），以下比例和次数均为估计值
+
+二、情感倾向分析
+---------------
+- 积极态度: {self._interval(positive)}
+- 消极态度: {self._interval(negative)}
+- 中性态度: {self._interval(neutral)}
+
+总体来看，用户对大语言模型技术的态度{attitude}。
+
+三、应用成本关注
+---------------
+与成本相关的弹幕{self._count_interval(cost_share)}，占 {self._interval(cost_share)}
+"""
+        if cost_examples:
+            conclusion += "\n典型评论示例：\n"
+            for i, mention in enumerate(cost_examples, 1):
+                conclusion += f"  {i}. {mention}\n"
+        else:
+            conclusion += "用户对成本的直接讨论相对较少。\n"
+
+        conclusion += f"""
+四、潜在应用领域
+---------------
+用户提及的主要应用领域（按估计提及次数排序，括号内为置信区间）：
+"""
+        for i, (app, estimate) in enumerate(applications[:8], 1):
+            conclusion += f"  {i}. {app}: {self._count_interval(estimate, '次提及')}\n"
+
+        conclusion += f"""
+五、不利影响和担忧
+---------------
+与不利影响相关的弹幕{self._count_interval(concern_share)}，占 {self._interval(concern_share)}
+"""
+        if concern_examples:
+            conclusion += "\n典型担忧示例：\n"
+            for i, concern in enumerate(concern_examples, 1):
+                conclusion += f"  {i}. {concern}\n"
+        else:
+            conclusion += "用户对不利影响的讨论相对较少。\n"
+
+        conclusion += f"""
+六、关键话题
+-----------
+弹幕中最常提及的关键话题（按估计出现次数排序）：
+"""
+        for i, (topic, estimate) in enumerate(topics[:8], 1):
+            conclusion += f"  {i}. {topic}: {self._count_interval(estimate, '次')}\n"
+
+        conclusion += f"""
+七、主要结论
+-----------
+1. 用户关注度: 大语言模型技术在B站用户中引起了广泛关注
+2. 态度倾向: {'用户整体态度积极，看好技术发展前景' if positive['low'] > 0.5 else '用户态度较为复杂，既有期待也有担忧'}
+3. 应用场景: 用户关注的应用领域主要集中在{', '.join(app for app, _ in applications[:3]) if applications else '多个'}等方面
+4. 成本因素: {'用户对成本问题有一定关注' if cost_share['total'] > 10 else '用户对成本问题的讨论相对较少'}
+5. 风险意识: {'用户对技术带来的潜在风险有一定认识' if concern_share['total'] > 10 else '用户的风险讨论相对较少'}
+
+注: 本报告为抽样估计，未包含时间分布分析；需要精确结果时请关闭近似模式
+
+{'='*80}
+报告生成时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+{'='*80}
+"""
+        return conclusion
+
+
+def main(argv=None) -> int:
+    import time
+    from danmaku_corpus import DanmakuCorpus
+    from danmaku_loader import CACHE_FILENAME, load_cache
+    from data_processor import DanmakuProcessor
+
+    parser = argparse.ArgumentParser(description='弹幕近似分析（抽样估计并给出置信区间）')
+    parser.add_argument('--cache-file', default=CACHE_FILENAME)
+    parser.add_argument('--target-error', type=float, default=DEFAULT_TARGET_ERROR, help='比例估计的目标误差（默认0.01）')
+    parser.add_argument('--confidence', type=float, default=DEFAULT_CONFIDENCE, help='置信水平（默认0.95）')
+    parser.add_argument('--seed', type=int, default=None, help='随机种子（固定后结果可复现）')
+    args = parser.parse_args(argv)
+
+    cache = load_cache(args.cache_file)
+    if cache is None:
+        print(f"缓存文件不存在: {args.cache_file}")
+        return 1
+    corpus = DanmakuCorpus.from_iterable(cache)
+    corpus.freeze()
+    cache.close()
+    filtered = DanmakuProcessor().filter_danmaku(corpus)
+    stats = {'total_count': len(filtered), 'original_count': len(corpus)}
+    start = time.perf_counter()
+    analyzer = ApproximateAnalyzer(target_error=args.target_error, confidence=args.confidence, seed=args.seed)
+    print(analyzer.generate_conclusion(filtered, stats))
+    print(f"近似分析耗时 {time.perf_counter() - start:.2f} 秒")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
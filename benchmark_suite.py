@@ -0,0 +1,276 @@
+"""
+流水线基准测试套件
+在10k/100k/1M规模的合成弹幕语料上测量各处理阶段耗时，
+与JSON基线对比，任一阶段退化超过阈值时以非零状态码退出
+
+用法:
+    python benchmark_suite.py                      # 与基线对比
+    python benchmark_suite.py --save-baseline      # 记录当前结果为基线
+    python benchmark_suite.py --sizes 10000 --stages filter_danmaku,process_text
+"""
+import argparse
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from typing import Callable, Dict, List
+
+from danmaku_corpus import DanmakuCorpus
+from danmaku_generator import DanmakuGenerator
+from data_analyzer import DataAnalyzer
+from data_processor import DanmakuProcessor
+
+DEFAULT_SIZES = [10000, 100000, 1000000]
+BASELINE_FILE = 'benchmark_baseline.json'
+RESULT_FILE = 'benchmark_results.json'
+
+# 与语料规模无关的阶段（XML解析、Excel导出）只在固定规模下测一次
+FIXED_SIZE = 'fixed'
+XML_FIXTURE_SIZE = 3000
+
+
+class _FixtureRaw:
+    def __init__(self, content: bytes):
+        self._content = content
+
+    def stream(self, chunk_size: int, decode_content: bool = True):
+        for start in range(0, len(self._content), chunk_size):
+            yield self._content[start:start + chunk_size]
+
+
+class _FixtureResponse:
+    def __init__(self, content: bytes):
+        self.content = content
+        self.raw = _FixtureRaw(content)
+        self.status_code = 200
+        self.encoding = 'utf-8'
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding)
+
+    def close(self):
+        pass
+
+
+class _FixtureSession:
+    def __init__(self, content: bytes):
+        self._content = content
+        self.headers = {}
+
+    def get(self, url, **kwargs):
+        return _FixtureResponse(self._content)
+
+
+def _fixture_crawler(xml_content: bytes):
+    """
+    创建不访问网络、从固定XML读取弹幕的爬虫实例
+    """
+    from danmaku_crawler import BilibiliDanmakuCrawler
+
+    crawler = BilibiliDanmakuCrawler(credentials_file=None)
+    crawler.session = _FixtureSession(xml_content)
+    return crawler
+
+
+class BenchmarkSuite:
+    def __init__(self, sizes: List[int], iterations: int = 3, output_dir: str = None, seed: int = 42):
+        self.sizes = sizes
+        self.iterations = iterations
+        self.generator = DanmakuGenerator(seed=seed)
+        # 未指定输出目录时词云/Excel写入临时目录，close() 时删除
+        self._temp_dir = None if output_dir else tempfile.TemporaryDirectory(prefix='danmaku_bench_')
+        self.output_dir = output_dir or self._temp_dir.name
+        self.results = {}
+        # 执行出错的阶段: {阶段[规模]: 异常说明}
+        self.failures = {}
+
+    def close(self):
+        if self._temp_dir is not None:
+            self._temp_dir.cleanup()
+            self._temp_dir = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _time(self, func: Callable) -> float:
+        """
+        重复执行并返回中位耗时（毫秒），阶段内的打印输出被屏蔽
+        """
+        times = []
+        for _ in range(self.iterations):
+            with redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                func()
+                times.append((time.perf_counter() - start) * 1000)
+        return statistics.median(times)
+
+    def _corpus_stages(self, corpus: List[str]) -> Dict[str, Callable]:
+        from data_processor_batch import DanmakuBatchProcessor
+        from visualizer import Visualizer
+
+        processor = DanmakuProcessor()
+        batch = DanmakuBatchProcessor()
+        analyzer = DataAnalyzer()
+        visualizer = Visualizer()
+        compact = DanmakuCorpus.from_iterable(corpus)
+        with redirect_stdout(io.StringIO()):
+            filtered = processor.filter_danmaku(corpus)
+            stats = processor.get_all_stats(corpus)
+
+        return {
+            'filter_danmaku': lambda: processor.filter_danmaku(corpus),
+            'count_word_frequency': lambda: processor.count_word_frequency(filtered, 8),
+            'count_cluster_frequency': lambda: processor.count_cluster_frequency(filtered, 8),
+            'get_all_stats': lambda: processor.get_all_stats(corpus),
+            'get_all_stats[corpus]': lambda: processor.get_all_stats(compact),
+            'batch.filter_danmaku': lambda: batch.filter_danmaku(corpus),
+            'batch.count_word_frequency': lambda: batch.count_word_frequency(filtered, 8),
+            'batch.get_all_stats': lambda: batch.get_all_stats(corpus),
+            'batch.analyze_sentiment': lambda: batch.analyze_sentiment(filtered),
+            'analyze_sentiment': lambda: analyzer.analyze_sentiment(filtered),
+            'analyze_application_mentions': lambda: analyzer.analyze_application_mentions(filtered),
+            'analyze_cost_mentions': lambda: analyzer.analyze_cost_mentions(filtered),
+            'analyze_concerns': lambda: analyzer.analyze_concerns(filtered),
+            'extract_key_topics': lambda: analyzer.extract_key_topics(filtered),
+            'generate_conclusion': lambda: analyzer.generate_conclusion(filtered, stats),
+            'process_text': lambda: visualizer.process_text(filtered),
+            'create_wordcloud': lambda: visualizer.create_wordcloud(
+                filtered, os.path.join(self.output_dir, 'wordcloud.png')),
+            'create_advanced_wordcloud': lambda: visualizer.create_advanced_wordcloud(
+                filtered, os.path.join(self.output_dir, 'wordcloud_advanced.png')),
+        }
+
+    def _fixed_stages(self) -> Dict[str, Callable]:
+        from excel_writer import ExcelWriter
+
+        sample = self.generator.generate(XML_FIXTURE_SIZE)
+        crawler = _fixture_crawler(self.generator.xml_response(1, XML_FIXTURE_SIZE))
+        processor = DanmakuProcessor()
+        with redirect_stdout(io.StringIO()):
+            stats = processor.get_all_stats(sample)
+        writer = ExcelWriter(os.path.join(self.output_dir, 'danmaku_statistics.xlsx'))
+
+        return {
+            'get_danmaku(xml)': lambda: crawler.get_danmaku(1),
+            'write_statistics': lambda: writer.write_statistics(stats),
+        }
+
+    def run(self, stage_filter: List[str] = None) -> Dict[str, float]:
+        """
+        运行全部（或指定的）阶段，返回 {阶段[规模]: 中位耗时ms}
+        """
+        def selected(name):
+            return not stage_filter or name in stage_filter
+
+        groups = [(FIXED_SIZE, self._fixed_stages)]
+        groups += [(size, lambda size=size: self._corpus_stages(self.generator.generate(size)))
+                   for size in self.sizes]
+
+        for size, build in groups:
+            print(f"\n准备 {size} 规模的数据...")
+            stages = build()
+            for name, func in stages.items():
+                if not selected(name):
+                    continue
+                key = f"{name}[{size}]"
+                try:
+                    self.results[key] = self._time(func)
+                except Exception as e:
+                    # 阶段崩溃同样算作回归，继续测量其余阶段
+                    self.failures[key] = f"{type(e).__name__}: {e}"
+                    print(f"  {key:<45} {'出错':>12}  {self.failures[key]}")
+                    continue
+                print(f"  {key:<45} {self.results[key]:>12.2f} ms")
+        return self.results
+
+
+def compare_with_baseline(results: Dict[str, float], baseline: Dict[str, float],
+                          threshold: float) -> List[str]:
+    """
+    返回退化超过阈值的阶段说明
+    """
+    regressions = []
+    print("\n" + "="*80)
+    print(f"{'阶段':<45} {'基线 (ms)':>12} {'当前 (ms)':>12} {'变化':>8}")
+    print("-"*80)
+    for key, current in results.items():
+        base = baseline.get(key)
+        if base is None:
+            print(f"{key:<45} {'-':>12} {current:>12.2f} {'新增':>8}")
+            continue
+        change = (current - base) / base if base > 0 else 0.0
+        flag = ''
+        if change > threshold:
+            flag = '  <-- 退化'
+            regressions.append(f"{key}: {base:.2f} ms -> {current:.2f} ms (+{change*100:.1f}%)")
+        print(f"{key:<45} {base:>12.2f} {current:>12.2f} {change*100:>7.1f}%{flag}")
+    print("="*80)
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='弹幕处理流水线基准测试')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help='合成语料规模（默认 10000 100000 1000000）')
+    parser.add_argument('--stages', type=lambda s: s.split(','), default=None,
+                        help='只运行指定阶段，逗号分隔')
+    parser.add_argument('--iterations', type=int, default=3, help='每个阶段的重复次数')
+    parser.add_argument('--seed', type=int, default=42, help='合成语料的随机种子')
+    parser.add_argument('--baseline', default=BASELINE_FILE, help='基线JSON文件')
+    parser.add_argument('--save-baseline', action='store_true', help='将本次结果写入基线')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='允许的退化比例，超过即失败（默认0.2即20%%）')
+    args = parser.parse_args(argv)
+
+    # 没有基线时无法判断退化，直接以非零退出码结束，避免门禁形同虚设
+    if not args.save_baseline and not os.path.exists(args.baseline):
+        print(f"未找到基线文件 {args.baseline}，请先运行 --save-baseline")
+        return 2
+
+    with BenchmarkSuite(args.sizes, iterations=args.iterations, seed=args.seed) as suite:
+        results = suite.run(args.stages)
+        failures = suite.failures
+
+    with open(RESULT_FILE, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"\n基准测试结果已保存到: {RESULT_FILE}")
+
+    if failures:
+        print("\n以下阶段执行出错:")
+        for key, error in failures.items():
+            print(f"  {key}: {error}")
+        return 1
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, 'r', encoding='utf-8') as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, ensure_ascii=False, indent=2)
+        print(f"基线已更新: {args.baseline}")
+        return 0
+
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressions = compare_with_baseline(results, baseline, args.threshold)
+    if regressions:
+        print("\n以下阶段性能退化超过阈值:")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    print("\n所有阶段均未超过退化阈值")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,160 @@
+"""
+B站访问凭据管理模块
+按需获取并缓存 buvid3/buvid4 cookies 和 WBI 签名密钥（本地JSON文件，带过期时间），
+只在接口真正需要时才刷新，替代每次启动都访问主页获取cookies的做法
+"""
+import json
+import os
+import threading
+import time
+from hashlib import md5
+from typing import Callable, Dict, Optional, Tuple
+from urllib.parse import quote, urlencode
+
+CREDENTIALS_FILENAME = 'bili_credentials.json'
+# buvid有效期很长，定期刷新即可；WBI密钥每天轮换
+DEFAULT_COOKIE_TTL = 7 * 86400
+DEFAULT_WBI_TTL = 12 * 3600
+
+# WBI签名的混淆重排表（img_key+sub_key 按此顺序取前32位得到 mixin_key）
+MIXIN_KEY_ENC_TAB = [
+    46, 47, 18, 2, 53, 8, 23, 32, 15, 50, 10, 31, 58, 3, 45, 35, 27, 43, 5, 49,
+    33, 9, 42, 19, 29, 28, 14, 39, 12, 38, 41, 13, 37, 48, 7, 16, 24, 55, 40,
+    61, 26, 17, 0, 1, 60, 51, 30, 4, 22, 25, 54, 21, 56, 59, 6, 63, 57, 62, 11,
+    36, 20, 34, 44, 52
+]
+_WBI_FILTERED_CHARS = "!'()*"
+
+
+def get_mixin_key(img_key: str, sub_key: str) -> str:
+    raw = img_key + sub_key
+    return ''.join(raw[i] for i in MIXIN_KEY_ENC_TAB)[:32]
+
+
+def sign_wbi_params(params: Dict, img_key: str, sub_key: str, wts: Optional[int] = None) -> Dict[str, str]:
+    """
+    为请求参数添加 wts（时间戳）和 w_rid（签名）
+    参数按键排序、过滤 !'()* 后以encodeURIComponent方式编码，拼接mixin_key取MD5
+    """
+    signed = {k: ''.join(c for c in str(v) if c not in _WBI_FILTERED_CHARS) for k, v in params.items()}
+    signed['wts'] = str(int(time.time()) if wts is None else wts)
+    query = urlencode(sorted(signed.items()), quote_via=quote, safe='')
+    signed['w_rid'] = md5((query + get_mixin_key(img_key, sub_key)).encode('utf-8')).hexdigest()
+    return signed
+
+
+def _key_from_url(url: str) -> str:
+    """
+    https://i0.hdslb.com/bfs/wbi/7cd084941338484aae1ad9425b84077c.png -> 7cd0849...
+    """
+    return url.rsplit('/', 1)[-1].split('.', 1)[0]
+
+
+class BiliCredentials:
+    def __init__(self, get: Callable, api_url: str = 'https://api.bilibili.com',
+                 cache_file: Optional[str] = CREDENTIALS_FILENAME,
+                 cookie_ttl: float = DEFAULT_COOKIE_TTL, wbi_ttl: float = DEFAULT_WBI_TTL):
+        """
+        get: 发送请求的函数 get(endpoint, url, **kwargs) -> response（爬虫的 _get，计入指标）
+        cache_file: 凭据缓存文件，None 表示只缓存在内存中
+        """
+        self._get = get
+        self.api_url = api_url
+        self.cache_file = cache_file
+        self.cookie_ttl = cookie_ttl
+        self.wbi_ttl = wbi_ttl
+        self._lock = threading.Lock()
+        self._data = self._load()
+
+    def _load(self) -> Dict:
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return {}
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        # 不同接口地址（如本地替身服务器）的凭据不能混用
+        return data if data.get('api_url') == self.api_url else {}
+
+    def _save(self):
+        if not self.cache_file:
+            return
+        tmp_path = f"{self.cache_file}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(dict(self._data, api_url=self.api_url), f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.cache_file)
+
+    def _fresh(self, name: str) -> bool:
+        return self._data.get(f'{name}_expire_at', 0) > time.time()
+
+    def cookies(self) -> Dict[str, str]:
+        """
+        返回 buvid3/buvid4 cookies，缓存过期时请求 /x/frontend/finger/spi 刷新
+        """
+        with self._lock:
+            if not self._fresh('cookies'):
+                self._refresh_cookies()
+            return dict(self._data.get('cookies', {}))
+
+    def _refresh_cookies(self):
+        try:
+            response = self._get('spi', f'{self.api_url}/x/frontend/finger/spi', timeout=10)
+            data = json.loads(response.content).get('data') or {}
+        except Exception as e:
+            print(f"获取buvid失败: {e}")
+            return
+        cookies = {name: data[key] for key, name in (('b_3', 'buvid3'), ('b_4', 'buvid4')) if data.get(key)}
+        if not cookies:
+            print("获取buvid失败: 响应中没有buvid")
+            return
+        self._data['cookies'] = cookies
+        self._data['cookies_expire_at'] = time.time() + self.cookie_ttl
+        self._save()
+
+    def wbi_keys(self) -> Optional[Tuple[str, str]]:
+        """
+        返回 (img_key, sub_key)，缓存过期时请求 /x/web-interface/nav 刷新（未登录也会返回密钥）
+        """
+        with self._lock:
+            if not self._fresh('wbi'):
+                self._refresh_wbi_keys()
+            keys = self._data.get('wbi')
+            return (keys['img_key'], keys['sub_key']) if keys else None
+
+    def _refresh_wbi_keys(self):
+        try:
+            response = self._get('nav', f'{self.api_url}/x/web-interface/nav', timeout=10)
+            wbi_img = (json.loads(response.content).get('data') or {}).get('wbi_img') or {}
+            img_key = _key_from_url(wbi_img['img_url'])
+            sub_key = _key_from_url(wbi_img['sub_url'])
+        except Exception as e:
+            print(f"获取WBI签名密钥失败: {e}")
+            return
+        self._data['wbi'] = {'img_key': img_key, 'sub_key': sub_key}
+        self._data['wbi_expire_at'] = time.time() + self.wbi_ttl
+        self._save()
+
+    def sign(self, params: Dict) -> Dict:
+        """
+        对参数做WBI签名；获取不到密钥时原样返回（请求可能被风控拒绝）
+        """
+        keys = self.wbi_keys()
+        if keys is None:
+            return dict(params)
+        return sign_wbi_params(params, *keys)
+
+    def invalidate(self):
+        """
+        请求被风控拒绝（412/-352）后调用，下次使用时重新获取cookies和密钥
+        """
+        with self._lock:
+            self._data.pop('cookies_expire_at', None)
+            self._data.pop('wbi_expire_at', None)
+
+
+if __name__ == '__main__':
+    # 文档中的示例：mixin_key 应为 ea1db124af3c7062474693fa704f4ff8
+    img, sub = '7cd084941338484aae1ad9425b84077c', '4932caff0ff746eab6f01bf08b70ac45'
+    print(get_mixin_key(img, sub))
+    print(sign_wbi_params({'foo': '114', 'bar': '514', 'zab': 1919810}, img, sub, wts=1702204169))
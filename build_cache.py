@@ -0,0 +1,131 @@
+"""
+增量构建缓存模块
+为流水线每个阶段计算输入指纹（弹幕缓存内容哈希、相关源码、配置），
+与上次运行记录在 .build_cache.json 中的指纹比对，输入未变且输出文件完好的阶段直接跳过
+
+文件指纹走快速路径：大小和修改时间与上次记录一致时沿用记录的内容哈希，不重新读文件
+"""
+import hashlib
+import json
+import os
+import time
+from typing import Dict, Iterable, Optional
+
+BUILD_CACHE_FILENAME = '.build_cache.json'
+_HASH_CHUNK_SIZE = 1024 * 1024
+_MANIFEST_VERSION = 1
+
+
+def _new_hash():
+    return hashlib.blake2b(digest_size=16)
+
+
+class BuildCache:
+    def __init__(self, path: str = BUILD_CACHE_FILENAME, enabled: bool = True):
+        """
+        enabled=False 时所有阶段都视为过期（相当于强制重建），但仍会记录本次结果
+        """
+        self.path = path
+        self.enabled = enabled
+        self._manifest = self._load()
+        self._dirty = False
+
+    def _load(self) -> Dict:
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    manifest = json.load(f)
+                if manifest.get('version') == _MANIFEST_VERSION:
+                    return manifest
+            except (OSError, ValueError):
+                pass
+        return {'version': _MANIFEST_VERSION, 'files': {}, 'stages': {}}
+
+    def save(self):
+        if not self._dirty:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+
+    @staticmethod
+    def _stat_key(path: str) -> Optional[list]:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return [st.st_size, st.st_mtime_ns]
+
+    def file_hash(self, path: str) -> Optional[str]:
+        """
+        文件内容哈希，文件不存在时返回None
+        大小和修改时间与记录一致时直接返回记录的哈希
+        """
+        stat_key = self._stat_key(path)
+        if stat_key is None:
+            return None
+        key = os.path.abspath(path)
+        entry = self._manifest['files'].get(key)
+        if entry and entry['stat'] == stat_key:
+            return entry['hash']
+
+        digest = _new_hash()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(_HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+        file_hash = digest.hexdigest()
+        self._manifest['files'][key] = {'stat': stat_key, 'hash': file_hash}
+        self._dirty = True
+        return file_hash
+
+    def fingerprint(self, files: Iterable[str] = (), **config) -> str:
+        """
+        阶段指纹：输入文件内容哈希 + 可JSON序列化的配置（关键词列表、参数等）
+        """
+        digest = _new_hash()
+        for path in files:
+            digest.update(f"{os.path.basename(path)}={self.file_hash(path)};".encode('utf-8'))
+        digest.update(json.dumps(config, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8'))
+        return digest.hexdigest()
+
+    def is_fresh(self, stage: str, fingerprint: str) -> bool:
+        """
+        指纹一致且记录的输出文件都存在、未被改动
+        """
+        if not self.enabled:
+            return False
+        entry = self._manifest['stages'].get(stage)
+        if not entry or entry['fingerprint'] != fingerprint:
+            return False
+        return all(self._stat_key(path) == stat_key for path, stat_key in entry['outputs'].items())
+
+    def value(self, stage: str):
+        """
+        阶段记录的附带结果（如统计摘要），没有记录时返回None
+        """
+        entry = self._manifest['stages'].get(stage)
+        return entry.get('value') if entry else None
+
+    def record(self, stage: str, fingerprint: str, outputs: Iterable[str] = (), value=None):
+        """
+        阶段成功完成后记录指纹和输出文件状态
+        """
+        self._manifest['stages'][stage] = {
+            'fingerprint': fingerprint,
+            'outputs': {path: self._stat_key(path) for path in outputs if os.path.exists(path)},
+            'value': value,
+            'built_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+        }
+        self._dirty = True
+
+    def invalidate(self, stage: Optional[str] = None):
+        """
+        删除某个阶段（默认全部阶段）的记录
+        """
+        if stage is None:
+            self._manifest['stages'].clear()
+        else:
+            self._manifest['stages'].pop(stage, None)
+        self._dirty = True
@@ -0,0 +1,183 @@
+"""
+列式数据导出模块
+把过滤后的弹幕、完整频次表、噪声标签和分析统计写成带类型、压缩的Parquet文件
+（或可内存映射的Arrow IPC文件），下游工具可以直接读取，不必重新运行 DanmakuProcessor
+
+输出目录中的文件：
+    danmaku.*      过滤后的弹幕，逐条一行（文本/视频BV号为字典编码列，附视频内时间和发送时间戳）
+    frequency.*    不重复弹幕的频次表（排名、次数、占比、情感标签）
+    noise.*        原始不重复弹幕及其噪声标签
+    tallies.*      分析统计（情感分布、应用领域提及次数），长表格式
+"""
+import os
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from danmaku_corpus import DanmakuCorpus, iter_weighted
+
+# 尝试导入pyarrow（可选依赖）
+try:
+    import pyarrow as pa  # type: ignore
+    import pyarrow.parquet as pq  # type: ignore
+    import pyarrow.feather as feather  # type: ignore
+    PYARROW_AVAILABLE = True
+except ImportError:
+    pa = pq = feather = None  # type: ignore
+    PYARROW_AVAILABLE = False
+
+DEFAULT_OUTPUT_DIR = 'danmaku_parquet'
+FORMAT_EXTENSIONS = {'parquet': '.parquet', 'arrow': '.arrow'}
+
+
+class ColumnarExporter:
+    def __init__(self, output_dir: str = DEFAULT_OUTPUT_DIR, fmt: str = 'parquet',
+                 compression: Optional[str] = 'zstd'):
+        """
+        fmt: 'parquet'（压缩率高，适合归档和pandas/DuckDB读取）
+             'arrow'（Arrow IPC文件，compression=None 时可零拷贝内存映射）
+        compression: parquet支持 zstd/snappy/gzip，arrow支持 zstd/lz4
+        """
+        if fmt not in FORMAT_EXTENSIONS:
+            raise ValueError(f"不支持的格式: {fmt}（可选 {', '.join(FORMAT_EXTENSIONS)}）")
+        self.output_dir = output_dir
+        self.fmt = fmt
+        self.compression = compression
+        self.available = PYARROW_AVAILABLE
+        if not self.available:
+            print("警告: pyarrow未安装，无法导出Parquet/Arrow文件。")
+            print("可以运行 'pip install pyarrow' 来安装。")
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.output_dir, name + FORMAT_EXTENSIONS[self.fmt])
+
+    def _write(self, table, name: str) -> str:
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = self.path(name)
+        tmp_path = f"{path}.tmp"
+        if self.fmt == 'parquet':
+            pq.write_table(table, tmp_path, compression=self.compression or 'none')
+        else:
+            feather.write_feather(table, tmp_path, compression=self.compression or 'uncompressed')
+        os.replace(tmp_path, path)
+        return path
+
+    @staticmethod
+    def _text_column(danmaku_list: Iterable[str]):
+        """
+        弹幕文本的字典编码列：DanmakuCorpus 直接用唯一文本表和id数组构建，不逐条生成str
+        """
+        if isinstance(danmaku_list, DanmakuCorpus):
+            indices = pa.array(np.frombuffer(danmaku_list.ids(), dtype=np.uint32)
+                               if len(danmaku_list) else np.zeros(0, np.uint32))
+            dictionary = pa.array(list(danmaku_list.iter_unique_texts()), type=pa.string())
+            return pa.DictionaryArray.from_arrays(indices.cast(pa.int32()), dictionary)
+        return pa.array(list(danmaku_list), type=pa.string()).dictionary_encode()
+
+    def write_corpus(self, danmaku_list: Iterable[str], timeline=None) -> str:
+        """
+        逐条弹幕表；timeline 与弹幕逐条对齐时附带 bvid/offset/timestamp 列
+        """
+        columns = {'text': self._text_column(danmaku_list)}
+        if timeline is not None and len(timeline) == len(danmaku_list):
+            arrays = timeline.to_numpy()
+            videos = pa.array(timeline.videos, type=pa.string())
+            columns['bvid'] = pa.DictionaryArray.from_arrays(
+                pa.array(arrays['video_ids']).cast(pa.int32()), videos)
+            columns['offset'] = pa.array(arrays['offsets'], type=pa.float32())
+            columns['timestamp'] = pa.array(arrays['timestamps'].astype('datetime64[s]'),
+                                            type=pa.timestamp('s'))
+        return self._write(pa.table(columns), 'danmaku')
+
+    def write_frequencies(self, frequencies: Counter, total: int, sentiment_label=None) -> str:
+        """
+        完整频次表，按次数降序；sentiment_label 为 DataAnalyzer.sentiment_label 时附带情感列
+        """
+        items = list(frequencies.most_common())
+        counts = np.fromiter((count for _, count in items), dtype=np.uint32, count=len(items))
+        columns = {
+            'rank': pa.array(np.arange(1, len(items) + 1, dtype=np.uint32)),
+            'text': pa.array([text for text, _ in items], type=pa.string()),
+            'count': pa.array(counts),
+            'share': pa.array(counts / total if total else np.zeros(len(items)), type=pa.float64()),
+        }
+        if sentiment_label is not None:
+            columns['sentiment'] = pa.array([sentiment_label(text) for text, _ in items], type=pa.int8())
+        return self._write(pa.table(columns), 'frequency')
+
+    def write_noise_labels(self, danmaku_list: Iterable[str], is_noise) -> str:
+        """
+        原始（未过滤）弹幕的不重复文本、出现次数和噪声标签，每个文本只判断一次
+        """
+        items = list(iter_weighted(danmaku_list))
+        table = pa.table({
+            'text': pa.array([text for text, _ in items], type=pa.string()),
+            'count': pa.array([weight for _, weight in items], type=pa.uint32()),
+            'is_noise': pa.array([is_noise(text) for text, _ in items], type=pa.bool_()),
+        })
+        return self._write(table, 'noise')
+
+    def write_tallies(self, tallies: Dict[str, Dict[str, float]]) -> str:
+        """
+        分析统计长表：category（统计类别）, key, value
+        """
+        rows = [(category, str(key), float(value))
+                for category, values in tallies.items() for key, value in values.items()]
+        table = pa.table({
+            'category': pa.array([row[0] for row in rows], type=pa.string()).dictionary_encode(),
+            'key': pa.array([row[1] for row in rows], type=pa.string()),
+            'value': pa.array([row[2] for row in rows], type=pa.float64()),
+        })
+        return self._write(table, 'tallies')
+
+    def export_all(self, stats: Dict, processor, analyzer, raw_danmaku: Iterable[str] = None,
+                   frequencies: Counter = None) -> List[str]:
+        """
+        导出全部文件，返回写出的路径；pyarrow不可用时返回空列表
+        raw_danmaku: 过滤前的弹幕（用于噪声标签），不提供时跳过 noise 文件
+        """
+        if not self.available:
+            return []
+        filtered = stats['all_danmaku']
+        if frequencies is None:
+            frequencies = processor.frequency_counter(filtered)
+        sentiment = analyzer.analyze_sentiment(filtered)
+        paths = [
+            self.write_corpus(filtered, stats.get('timeline')),
+            self.write_frequencies(frequencies, stats['total_count'], analyzer.sentiment_label),
+            self.write_tallies({
+                'sentiment': sentiment,
+                'application': analyzer.analyze_application_mentions(filtered),
+                'summary': {'original_count': stats['original_count'], 'total_count': stats['total_count'],
+                            'unique_count': len(frequencies)},
+            }),
+        ]
+        if raw_danmaku is not None:
+            paths.append(self.write_noise_labels(raw_danmaku, processor.is_noise))
+        for path in paths:
+            print(f"已导出: {path} ({os.path.getsize(path) / 1024:.1f} KB)")
+        return paths
+
+
+def load_table(path: str, memory_map: bool = True):
+    """
+    读取导出的文件；Arrow IPC文件默认内存映射打开（未压缩时列数据零拷贝）
+    """
+    if not PYARROW_AVAILABLE:
+        raise ImportError("读取Parquet/Arrow文件需要安装pyarrow")
+    if path.endswith('.parquet'):
+        return pq.read_table(path, memory_map=memory_map)
+    return feather.read_table(path, memory_map=memory_map)
+
+
+if __name__ == '__main__':
+    from data_analyzer import DataAnalyzer
+    from data_processor import DanmakuProcessor
+
+    test_data = DanmakuCorpus.from_iterable(['666', '大模型真厉害', '大模型真厉害', '点赞', '这个模型不错'])
+    processor = DanmakuProcessor()
+    stats = processor.get_all_stats(test_data)
+    exporter = ColumnarExporter()
+    for exported in exporter.export_all(stats, processor, DataAnalyzer(), raw_danmaku=test_data):
+        print(load_table(exported).to_pandas())
@@ -0,0 +1,621 @@
+"""
+分布式爬取工作队列
+协调者把待爬视频写入共享队列（按bvid去重），多个工作节点按优先级领取任务、
+爬取弹幕并把结果（弹幕文本和p属性）写回队列，最后由协调者按入队顺序汇总
+
+后端:
+    SQLiteWorkQueue  - 本机多进程/多线程共享（SQLite文件锁）
+    RedisWorkQueue   - 多机共享，使用任意兼容redis-py接口的客户端
+    InMemoryRedis    - 进程内的Redis替身，用于测试和单机多线程
+"""
+import bisect
+import json
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+# WATCH的键在EXEC前被其他客户端修改时事务被放弃；没有安装redis包时InMemoryRedis抛出同名异常
+try:
+    from redis.exceptions import WatchError  # type: ignore
+except ImportError:
+    class WatchError(Exception):
+        pass
+
+# 领取后超过租约时间未完成的任务会被重新分配（工作节点崩溃/断网）
+DEFAULT_LEASE_SECONDS = 300
+DEFAULT_MAX_ATTEMPTS = 3
+
+STATUS_PENDING = 'pending'
+STATUS_CLAIMED = 'claimed'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+
+
+class WorkQueue(ABC):
+    """
+    队列接口。任务为视频信息字典（至少包含bvid，可带priority，数值大的先被领取），结果为
+    {'status': 'ok'|'no_cid', 'danmaku': [...], 'p': [...]}
+    """
+
+    @abstractmethod
+    def enqueue(self, tasks: Iterable[Dict]) -> int:
+        """
+        写入任务，已存在的bvid被忽略，返回新增数量
+        """
+
+    @abstractmethod
+    def claim(self, worker_id: str, lease_seconds: float = DEFAULT_LEASE_SECONDS) -> Optional[Dict]:
+        """
+        领取优先级最高的任务（SQLite后端同优先级按入队顺序），没有可领取的任务时返回None
+        """
+
+    @abstractmethod
+    def complete(self, bvid: str, result: Dict, worker_id: Optional[str] = None) -> bool:
+        """
+        任务完成，写入结果；给出 worker_id 时只有仍持有该任务的节点才能完成
+        （租约过期后任务已被其他节点领取时不写入），返回是否写入
+        """
+
+    @abstractmethod
+    def fail(self, bvid: str, error: str, max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+             worker_id: Optional[str] = None) -> bool:
+        """
+        任务失败：未超过最大尝试次数时放回队列，否则标记为失败；worker_id 的含义同 complete
+        """
+
+    @abstractmethod
+    def stats(self) -> Dict[str, int]:
+        """
+        各状态的任务数及总数
+        """
+
+    @abstractmethod
+    def results(self) -> Iterator[Tuple[Dict, Dict]]:
+        """
+        按入队顺序返回已完成的 (任务, 结果)
+        """
+
+    @abstractmethod
+    def mark_enqueue_done(self):
+        """
+        协调者标记任务已全部入队，工作节点在队列清空后即可退出
+        """
+
+    @abstractmethod
+    def enqueue_done(self) -> bool:
+        """
+        协调者是否已标记任务全部入队
+        """
+
+    def is_drained(self) -> bool:
+        stats = self.stats()
+        return self.enqueue_done() and stats[STATUS_PENDING] == 0 and stats[STATUS_CLAIMED] == 0
+
+    def close(self):
+        pass
+
+
+class SQLiteWorkQueue(WorkQueue):
+    def __init__(self, path: str = 'crawl_queue.db', timeout: float = 30.0):
+        self.path = path
+        # 同一进程内多个工作线程共用连接，由锁串行化；跨进程由SQLite的文件锁保证
+        self._conn = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        self._lock = threading.Lock()
+        if path != ':memory:':
+            self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript('''
+            CREATE TABLE IF NOT EXISTS tasks (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                bvid TEXT UNIQUE NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                priority REAL NOT NULL DEFAULT 0,
+                worker TEXT,
+                lease_until REAL NOT NULL DEFAULT 0,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                result TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_tasks_claim ON tasks(status, priority DESC, seq);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        ''')
+
+    def _transaction(self, func, *args):
+        """
+        在 BEGIN IMMEDIATE 事务中执行，领取时其他进程不会读到同一任务
+        """
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                result = func(*args)
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+            self._conn.execute('COMMIT')
+            return result
+
+    def enqueue(self, tasks: Iterable[Dict]) -> int:
+        def insert():
+            added = 0
+            for task in tasks:
+                cursor = self._conn.execute(
+                    'INSERT OR IGNORE INTO tasks (bvid, payload, priority) VALUES (?, ?, ?)',
+                    (task['bvid'], json.dumps(task, ensure_ascii=False), task.get('priority', 0)))
+                added += cursor.rowcount
+            return added
+        return self._transaction(insert)
+
+    def claim(self, worker_id: str, lease_seconds: float = DEFAULT_LEASE_SECONDS) -> Optional[Dict]:
+        def take():
+            now = time.time()
+            row = self._conn.execute(
+                "SELECT seq, bvid, payload FROM tasks "
+                "WHERE status = 'pending' OR (status = 'claimed' AND lease_until < ?) "
+                "ORDER BY priority DESC, seq LIMIT 1", (now,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE tasks SET status = 'claimed', worker = ?, lease_until = ?, attempts = attempts + 1 "
+                "WHERE bvid = ?", (worker_id, now + lease_seconds, row[1]))
+            task = json.loads(row[2])
+            task['seq'] = row[0]
+            return task
+        return self._transaction(take)
+
+    @staticmethod
+    def _owner_clause(worker_id: Optional[str]) -> Tuple[str, tuple]:
+        if worker_id is None:
+            return '', ()
+        return " AND status = 'claimed' AND worker = ?", (worker_id,)
+
+    def complete(self, bvid: str, result: Dict, worker_id: Optional[str] = None) -> bool:
+        owner, params = self._owner_clause(worker_id)
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE tasks SET status = 'done', result = ?, lease_until = 0 WHERE bvid = ?" + owner,
+                (json.dumps(result, ensure_ascii=False), bvid) + params)
+        return cursor.rowcount > 0
+
+    def fail(self, bvid: str, error: str, max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+             worker_id: Optional[str] = None) -> bool:
+        owner, params = self._owner_clause(worker_id)
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE tasks SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                "error = ?, lease_until = 0 WHERE bvid = ?" + owner, (max_attempts, error, bvid) + params)
+        return cursor.rowcount > 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute('SELECT status, COUNT(*) FROM tasks GROUP BY status').fetchall()
+        stats = {STATUS_PENDING: 0, STATUS_CLAIMED: 0, STATUS_DONE: 0, STATUS_FAILED: 0}
+        stats.update(rows)
+        stats['total'] = sum(count for _, count in rows)
+        return stats
+
+    def results(self) -> Iterator[Tuple[Dict, Dict]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, payload, result FROM tasks WHERE status = 'done' ORDER BY seq").fetchall()
+        for seq, payload, result in rows:
+            task = json.loads(payload)
+            task['seq'] = seq
+            yield task, json.loads(result)
+
+    def mark_enqueue_done(self):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('enqueue_done', '1')")
+
+    def enqueue_done(self) -> bool:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'enqueue_done'").fetchone()
+        return row is not None
+
+    def close(self):
+        self._conn.close()
+
+
+def _decode(value):
+    """
+    redis-py 默认返回bytes（decode_responses=False），统一转为str
+    """
+    return value.decode('utf-8') if isinstance(value, bytes) else value
+
+
+class RedisWorkQueue(WorkQueue):
+    """
+    只使用 SADD/SISMEMBER/LLEN/HSET/HGET/HGETALL/HDEL/HINCRBY/RPUSH/LRANGE/ZADD/ZREM/ZREVRANGE 等基础命令
+    和 WATCH/MULTI/EXEC 事务，redis-py 的 Redis 客户端和 InMemoryRedis 均可使用
+    待领取任务存放在有序集合中，分数为优先级（同分时按成员字典序从大到小领取，与ZPOPMAX一致）
+
+    领取、完成、失败和租约回收都在一个MULTI/EXEC事务中修改状态，工作节点在任意时刻崩溃，
+    任务要么仍在待领取集合中，要么带着租约等待过期回收，不会两边都不在
+    """
+
+    def __init__(self, client, namespace: str = 'danmaku_crawl'):
+        self.client = client
+        self.ns = namespace
+
+    def _key(self, name: str) -> str:
+        return f"{self.ns}:{name}"
+
+    def _enqueue_one(self, task: Dict) -> bool:
+        """
+        WATCH去重集合和入队顺序列表，在一个MULTI/EXEC中写入任务的全部数据：
+        协调者在任意时刻崩溃，任务要么完整入队，要么没有留下任何痕迹
+        """
+        bvid = task['bvid']
+        while True:
+            with self.client.pipeline() as pipe:
+                try:
+                    pipe.watch(self._key('seen'), self._key('order'))
+                    if pipe.sismember(self._key('seen'), bvid):
+                        return False
+                    seq = pipe.llen(self._key('order')) + 1
+                    pipe.multi()
+                    pipe.sadd(self._key('seen'), bvid)
+                    pipe.rpush(self._key('order'), bvid)
+                    pipe.hset(self._key('tasks'), bvid, json.dumps(dict(task, seq=seq), ensure_ascii=False))
+                    pipe.hset(self._key('status'), bvid, STATUS_PENDING)
+                    pipe.zadd(self._key('pending'), {bvid: task.get('priority', 0)})
+                    pipe.execute()
+                    return True
+                except WatchError:
+                    continue
+
+    def enqueue(self, tasks: Iterable[Dict]) -> int:
+        return sum(1 for task in tasks if self._enqueue_one(task))
+
+    def _priority(self, bvid: str) -> float:
+        task = json.loads(_decode(self.client.hget(self._key('tasks'), bvid)))
+        return task.get('priority', 0)
+
+    def requeue_expired(self) -> int:
+        """
+        把租约过期的任务放回待领取队列
+        """
+        now = time.time()
+        requeued = 0
+        for bvid, deadline in self.client.hgetall(self._key('leases')).items():
+            if float(_decode(deadline)) >= now:
+                continue
+            bvid = _decode(bvid)
+            priority = self._priority(bvid)
+            with self.client.pipeline() as pipe:
+                try:
+                    # 检查与放回之间租约被完成/续领时放弃，下次再回收
+                    pipe.watch(self._key('leases'))
+                    deadline = pipe.hget(self._key('leases'), bvid)
+                    if deadline is None or float(_decode(deadline)) >= now:
+                        continue
+                    pipe.multi()
+                    pipe.hdel(self._key('leases'), bvid)
+                    pipe.hset(self._key('status'), bvid, STATUS_PENDING)
+                    pipe.zadd(self._key('pending'), {bvid: priority})
+                    pipe.execute()
+                except WatchError:
+                    continue
+            requeued += 1
+        return requeued
+
+    def _claim_top(self, worker_id: str, lease_seconds: float) -> Optional[Dict]:
+        """
+        乐观事务：WATCH待领取集合，读取最高优先级的任务，再在MULTI/EXEC中把它移出集合并写入租约；
+        其他节点抢先领取时事务被放弃并重试
+        """
+        while True:
+            with self.client.pipeline() as pipe:
+                try:
+                    pipe.watch(self._key('pending'))
+                    top = pipe.zrevrange(self._key('pending'), 0, 0)
+                    if not top:
+                        return None
+                    bvid = _decode(top[0])
+                    pipe.multi()
+                    pipe.zrem(self._key('pending'), bvid)
+                    pipe.hset(self._key('leases'), bvid, time.time() + lease_seconds)
+                    pipe.hset(self._key('status'), bvid, STATUS_CLAIMED)
+                    pipe.hset(self._key('workers'), bvid, worker_id)
+                    pipe.hincrby(self._key('attempts'), bvid, 1)
+                    pipe.hget(self._key('tasks'), bvid)
+                    return json.loads(_decode(pipe.execute()[-1]))
+                except WatchError:
+                    continue
+
+    def claim(self, worker_id: str, lease_seconds: float = DEFAULT_LEASE_SECONDS) -> Optional[Dict]:
+        task = self._claim_top(worker_id, lease_seconds)
+        if task is None and self.requeue_expired():
+            task = self._claim_top(worker_id, lease_seconds)
+        return task
+
+    def _finish(self, bvid: str, worker_id: Optional[str], write) -> bool:
+        """
+        WATCH租约表确认任务仍由 worker_id 持有后，在MULTI/EXEC中执行 write(pipe)；
+        领取、回收、完成都会修改租约表，检查与写入之间持有者变化时事务被放弃并重试
+        """
+        while True:
+            with self.client.pipeline() as pipe:
+                try:
+                    pipe.watch(self._key('leases'))
+                    if worker_id is not None and (
+                            pipe.hget(self._key('leases'), bvid) is None
+                            or _decode(pipe.hget(self._key('workers'), bvid)) != worker_id):
+                        return False
+                    pipe.multi()
+                    write(pipe)
+                    pipe.hdel(self._key('leases'), bvid)
+                    pipe.execute()
+                    return True
+                except WatchError:
+                    continue
+
+    def complete(self, bvid: str, result: Dict, worker_id: Optional[str] = None) -> bool:
+        def write(pipe):
+            pipe.hset(self._key('results'), bvid, json.dumps(result, ensure_ascii=False))
+            pipe.hset(self._key('status'), bvid, STATUS_DONE)
+        return self._finish(bvid, worker_id, write)
+
+    def fail(self, bvid: str, error: str, max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+             worker_id: Optional[str] = None) -> bool:
+        attempts = int(_decode(self.client.hget(self._key('attempts'), bvid)) or 0)
+        priority = self._priority(bvid)
+
+        def write(pipe):
+            pipe.hset(self._key('errors'), bvid, error)
+            if attempts >= max_attempts:
+                pipe.hset(self._key('status'), bvid, STATUS_FAILED)
+            else:
+                pipe.hset(self._key('status'), bvid, STATUS_PENDING)
+                pipe.zadd(self._key('pending'), {bvid: priority})
+        return self._finish(bvid, worker_id, write)
+
+    def stats(self) -> Dict[str, int]:
+        stats = {STATUS_PENDING: 0, STATUS_CLAIMED: 0, STATUS_DONE: 0, STATUS_FAILED: 0}
+        statuses = self.client.hgetall(self._key('status')).values()
+        for status in statuses:
+            status = _decode(status)
+            stats[status] = stats.get(status, 0) + 1
+        stats['total'] = len(statuses)
+        return stats
+
+    def results(self) -> Iterator[Tuple[Dict, Dict]]:
+        for bvid in self.client.lrange(self._key('order'), 0, -1):
+            bvid = _decode(bvid)
+            if _decode(self.client.hget(self._key('status'), bvid)) != STATUS_DONE:
+                continue
+            task = json.loads(_decode(self.client.hget(self._key('tasks'), bvid)))
+            yield task, json.loads(_decode(self.client.hget(self._key('results'), bvid)))
+
+    def mark_enqueue_done(self):
+        self.client.hset(self._key('meta'), 'enqueue_done', 1)
+
+    def enqueue_done(self) -> bool:
+        return self.client.hget(self._key('meta'), 'enqueue_done') is not None
+
+
+class _InMemoryPipeline:
+    """
+    redis-py Pipeline 的进程内实现：WATCH之后、MULTI之前的命令立即执行，
+    其余命令排队到 execute() 时在客户端锁内一次性执行；WATCH的键被修改过则抛出WatchError
+    """
+
+    def __init__(self, client: 'InMemoryRedis'):
+        self._client = client
+        self._watched = None
+        self._commands = []
+        self._immediate = False
+
+    def watch(self, *keys):
+        with self._client._lock:
+            self._watched = {key: self._client._versions.get(key, 0) for key in keys}
+        self._immediate = True
+
+    def multi(self):
+        self._immediate = False
+
+    def __getattr__(self, name: str):
+        command = getattr(self._client, name)
+        if self._immediate:
+            return command
+
+        def queued(*args, **kwargs):
+            self._commands.append((command, args, kwargs))
+            return self
+        return queued
+
+    def execute(self):
+        with self._client._lock:
+            try:
+                if self._watched is not None and any(
+                        self._client._versions.get(key, 0) != version for key, version in self._watched.items()):
+                    raise WatchError("WATCH的键已被修改，事务被放弃")
+                return [command(*args, **kwargs) for command, args, kwargs in self._commands]
+            finally:
+                self.reset()
+
+    def reset(self):
+        self._watched = None
+        self._commands = []
+        self._immediate = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.reset()
+
+
+class InMemoryRedis:
+    """
+    RedisWorkQueue 用到的Redis命令的进程内实现（相当于 decode_responses=True 的客户端）
+    """
+
+    def __init__(self):
+        self._data = {}
+        # 可重入：事务在持锁期间逐条调用下面的命令
+        self._lock = threading.RLock()
+        # 每个键的修改次数，供WATCH判断
+        self._versions = {}
+        # 有序集合另存按 (分数, 成员) 升序排列的列表，与Redis的排序规则一致
+        self._zsorted = {}
+
+    def _get(self, key: str, factory):
+        value = self._data.get(key)
+        if value is None:
+            value = self._data[key] = factory()
+        return value
+
+    def _touch(self, key: str):
+        self._versions[key] = self._versions.get(key, 0) + 1
+
+    def pipeline(self, transaction: bool = True) -> _InMemoryPipeline:
+        return _InMemoryPipeline(self)
+
+    def sadd(self, key: str, *members) -> int:
+        with self._lock:
+            members_set = self._get(key, set)
+            added = sum(1 for m in members if str(m) not in members_set)
+            members_set.update(str(m) for m in members)
+            self._touch(key)
+            return added
+
+    def sismember(self, key: str, member) -> bool:
+        with self._lock:
+            return str(member) in self._data.get(key, ())
+
+    def scard(self, key: str) -> int:
+        with self._lock:
+            return len(self._data.get(key, ()))
+
+    def hset(self, key: str, field, value) -> int:
+        with self._lock:
+            table = self._get(key, dict)
+            is_new = str(field) not in table
+            table[str(field)] = str(value)
+            self._touch(key)
+            return int(is_new)
+
+    def hget(self, key: str, field) -> Optional[str]:
+        with self._lock:
+            return self._data.get(key, {}).get(str(field))
+
+    def hgetall(self, key: str) -> Dict[str, str]:
+        with self._lock:
+            return dict(self._data.get(key, {}))
+
+    def hdel(self, key: str, *fields) -> int:
+        with self._lock:
+            table = self._data.get(key, {})
+            removed = sum(1 for f in fields if table.pop(str(f), None) is not None)
+            self._touch(key)
+            return removed
+
+    def hincrby(self, key: str, field, amount: int = 1) -> int:
+        with self._lock:
+            table = self._get(key, dict)
+            value = int(table.get(str(field), 0)) + amount
+            table[str(field)] = str(value)
+            self._touch(key)
+            return value
+
+    def rpush(self, key: str, *values) -> int:
+        with self._lock:
+            items = self._get(key, list)
+            items.extend(str(v) for v in values)
+            self._touch(key)
+            return len(items)
+
+    def lpop(self, key: str) -> Optional[str]:
+        with self._lock:
+            items = self._data.get(key)
+            self._touch(key)
+            return items.pop(0) if items else None
+
+    def llen(self, key: str) -> int:
+        with self._lock:
+            return len(self._data.get(key, ()))
+
+    def lrange(self, key: str, start: int, end: int):
+        with self._lock:
+            items = self._data.get(key, [])
+            return list(items[start:None if end == -1 else end + 1])
+
+    def _zremove(self, key: str, member: str) -> bool:
+        scores = self._data.get(key, {})
+        if member not in scores:
+            return False
+        entries = self._zsorted[key]
+        del entries[bisect.bisect_left(entries, (scores.pop(member), member))]
+        return True
+
+    def zadd(self, key: str, mapping: Dict) -> int:
+        with self._lock:
+            scores = self._get(key, dict)
+            entries = self._zsorted.setdefault(key, [])
+            added = 0
+            for member, score in mapping.items():
+                member = str(member)
+                added += not self._zremove(key, member)
+                scores[member] = float(score)
+                bisect.insort(entries, (float(score), member))
+            self._touch(key)
+            return added
+
+    def zrem(self, key: str, *members) -> int:
+        with self._lock:
+            removed = sum(1 for m in members if self._zremove(key, str(m)))
+            self._touch(key)
+            return removed
+
+    def zrevrange(self, key: str, start: int, end: int):
+        """
+        按分数从高到低，同分时成员字典序从大到小
+        """
+        with self._lock:
+            entries = self._zsorted.get(key, [])[::-1]
+            return [member for _, member in entries[start:None if end == -1 else end + 1]]
+
+    def zpopmax(self, key: str, count: int = 1):
+        with self._lock:
+            scores = self._data.get(key, {})
+            entries = self._zsorted.get(key, [])
+            popped = []
+            while entries and len(popped) < count:
+                score, member = entries.pop()
+                del scores[member]
+                popped.append((member, score))
+            self._touch(key)
+            return popped
+
+    def zcard(self, key: str) -> int:
+        with self._lock:
+            return len(self._data.get(key, ()))
+
+    def delete(self, *keys) -> int:
+        with self._lock:
+            for k in keys:
+                self._zsorted.pop(k, None)
+                self._touch(k)
+            return sum(1 for k in keys if self._data.pop(k, None) is not None)
+
+
+def open_queue(spec: str) -> WorkQueue:
+    """
+    根据描述打开队列:
+        sqlite:crawl_queue.db     本机共享的SQLite文件
+        redis://host:6379/0       Redis（需要安装redis包）
+        memory:                   进程内（仅用于测试/单机多线程）
+    """
+    if spec.startswith('sqlite:'):
+        return SQLiteWorkQueue(spec[len('sqlite:'):] or 'crawl_queue.db')
+    if spec.startswith(('redis://', 'rediss://')):
+        try:
+            import redis  # type: ignore
+        except ImportError:
+            raise RuntimeError("使用Redis队列需要安装redis包: pip install redis")
+        return RedisWorkQueue(redis.Redis.from_url(spec))
+    if spec.startswith('memory:'):
+        return RedisWorkQueue(InMemoryRedis())
+    raise ValueError(f"无法识别的队列: {spec}（可选 sqlite:路径 / redis://... / memory:）")
@@ -0,0 +1,88 @@
+"""
+爬取调度模块
+按每次请求的预期弹幕产出给视频排序（搜索结果中的 video_review 即弹幕数），
+并在请求数或时间预算用尽时提前停止，使有限预算下先拿到覆盖面最大的数据
+"""
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+# list.so 单次返回的弹幕上限（与视频时长有关，常见为1000~8000条），超过部分拿不到
+DEFAULT_DANMAKU_CAP = 3000
+# 每个视频需要的请求数：pagelist + list.so
+REQUESTS_PER_VIDEO = 2
+
+
+class YieldScheduler:
+    def __init__(self, danmaku_cap: int = DEFAULT_DANMAKU_CAP, requests_per_video: int = REQUESTS_PER_VIDEO):
+        self.danmaku_cap = danmaku_cap
+        self.requests_per_video = requests_per_video
+
+    def expected_yield(self, video: Dict) -> int:
+        """
+        预计能获取的弹幕数
+        """
+        return min(int(video.get('danmaku') or 0), self.danmaku_cap)
+
+    def priority(self, video: Dict) -> float:
+        """
+        每次请求的预期弹幕数；播放量只用于弹幕数相同时打破平局
+        """
+        view = int(video.get('view') or 0)
+        return self.expected_yield(video) / self.requests_per_video + min(view, 10 ** 9) * 1e-12
+
+    def order(self, videos: Iterable[Dict], max_requests: Optional[int] = None) -> List[Dict]:
+        """
+        按优先级降序排列（稳定排序，同优先级保持搜索顺序），给定请求预算时截断
+        """
+        ordered = sorted(videos, key=self.priority, reverse=True)
+        if max_requests is not None:
+            ordered = ordered[:max(max_requests, 0) // self.requests_per_video]
+        return ordered
+
+
+class CrawlBudget:
+    """
+    请求数/时间预算，多个工作线程共享同一个实例
+    request_counter 返回当前已发出的请求数（通常来自爬虫指标）
+    """
+
+    def __init__(self, max_requests: Optional[int] = None, time_budget: Optional[float] = None,
+                 request_counter: Callable[[], float] = None):
+        self.max_requests = max_requests
+        self.time_budget = time_budget
+        self.request_counter = request_counter
+        self._start = None
+        self._start_requests = 0
+        self._lock = threading.Lock()
+
+    def start(self) -> 'CrawlBudget':
+        with self._lock:
+            if self._start is None:
+                self._start = time.perf_counter()
+                self._start_requests = self.request_counter() if self.request_counter else 0
+        return self
+
+    def requests_used(self) -> float:
+        return (self.request_counter() if self.request_counter else 0) - self._start_requests
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._start if self._start is not None else 0.0
+
+    def can_afford(self, requests: int = REQUESTS_PER_VIDEO) -> bool:
+        """
+        剩余预算是否还够再爬一个视频
+        """
+        if self.max_requests is not None and self.requests_used() + requests > self.max_requests:
+            return False
+        if self.time_budget is not None and self.elapsed() >= self.time_budget:
+            return False
+        return True
+
+    def describe(self) -> str:
+        parts = []
+        if self.max_requests is not None:
+            parts.append(f"请求 {self.requests_used():.0f}/{self.max_requests}")
+        if self.time_budget is not None:
+            parts.append(f"耗时 {self.elapsed():.1f}/{self.time_budget:.1f} 秒")
+        return '，'.join(parts) or '无预算限制'
@@ -0,0 +1,233 @@
+"""
+爬虫指标模块
+进程内的计数器/直方图/仪表注册表，可输出Prometheus文本格式
+（写入文件或通过 /metrics HTTP端点暴露），用于观察请求速率、延迟、限流和吞吐
+"""
+import bisect
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, List, Tuple
+
+# 请求延迟直方图的默认分桶（秒）
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: LabelKey) -> str:
+    if not key:
+        return ''
+    escaped = (v.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in key)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(key, escaped)) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """单调递增计数器"""
+    kind = 'counter'
+
+    def __init__(self, name: str, help_text: str, lock: threading.Lock):
+        self.name = name
+        self.help = help_text
+        self._lock = lock
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        key = _label_key(labels)
+        with self._lock:
+            return self._values.get(key, 0)
+
+    def total(self) -> float:
+        with self._lock:
+            return sum(self._values.values())
+
+    def samples(self) -> Iterable[Tuple[str, LabelKey, float]]:
+        """
+        由 MetricsRegistry.to_prometheus 在持锁时调用
+        """
+        for key, value in sorted(self._values.items()):
+            yield self.name, key, value
+
+
+class Gauge(Counter):
+    """可任意设置的仪表"""
+    kind = 'gauge'
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+
+class Histogram:
+    """固定分桶直方图"""
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, lock: threading.Lock,
+                 buckets: Tuple[float, ...] = DEFAULT_LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._lock = lock
+        # 标签 -> [各桶计数（非累计）..., 超出最大桶的计数], 总和, 总数
+        self._values: Dict[LabelKey, List] = {}
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def count(self, **labels) -> int:
+        key = _label_key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            return entry[2] if entry else 0
+
+    def quantile(self, q: float, **labels) -> float:
+        """
+        按分桶估算分位数（取所在桶的上界）
+        """
+        key = _label_key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if not entry or not entry[2]:
+                return 0.0
+            counts, num = list(entry[0]), entry[2]
+        target = q * num
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            if cumulative >= target:
+                return bound
+        return float('inf')
+
+    def samples(self) -> Iterable[Tuple[str, LabelKey, float]]:
+        for key, (counts, total, num) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                yield f"{self.name}_bucket", key + (('le', _format_value(float(bound))),), cumulative
+            yield f"{self.name}_sum", key, total
+            yield f"{self.name}_count", key, num
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+        self.created = time.time()
+        self._server = None
+        self._server_thread = None
+
+    def _get_or_create(self, cls, name: str, help_text: str, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help_text, self._lock, **kwargs)
+        if type(metric) is not cls:
+            raise ValueError(f"指标 {name} 已注册为 {metric.kind}")
+        return metric
+
+    def counter(self, name: str, help_text: str = '') -> Counter:
+        return self._get_or_create(Counter, name, help_text)
+
+    def gauge(self, name: str, help_text: str = '') -> Gauge:
+        return self._get_or_create(Gauge, name, help_text)
+
+    def histogram(self, name: str, help_text: str = '',
+                  buckets: Tuple[float, ...] = DEFAULT_LATENCY_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help_text, buckets=buckets)
+
+    def get(self, name: str):
+        return self._metrics.get(name)
+
+    def to_prometheus(self) -> str:
+        """
+        输出Prometheus文本格式（text/plain; version=0.0.4）
+        """
+        lines = []
+        with self._lock:
+            for name, metric in sorted(self._metrics.items()):
+                if metric.help:
+                    lines.append(f"# HELP {name} {metric.help}")
+                lines.append(f"# TYPE {name} {metric.kind}")
+                for sample_name, key, value in metric.samples():
+                    lines.append(f"{sample_name}{_format_labels(key)} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+    def dump(self, path: str):
+        """
+        原子地写入文本文件（可供 node_exporter 的 textfile collector 读取）
+        """
+        # 临时文件按线程区分，多个工作线程同时写出时互不覆盖
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp_path, path)
+
+    def serve(self, port: int = 9108, host: str = '127.0.0.1') -> str:
+        """
+        在后台线程启动 /metrics HTTP端点，返回访问地址
+        """
+        registry = self
+
+        class _MetricsHandler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split('?', 1)[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = registry.to_prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self._server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        self._server.daemon_threads = True
+        self._server_thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._server_thread.start()
+        bound_host, bound_port = self._server.server_address[:2]
+        return f"http://{bound_host}:{bound_port}/metrics"
+
+    def stop_server(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server_thread.join()
+            self._server = None
+
+
+if __name__ == '__main__':
+    registry = MetricsRegistry()
+    requests_total = registry.counter('demo_requests_total', '请求数')
+    latency = registry.histogram('demo_request_duration_seconds', '请求延迟')
+    for i in range(100):
+        requests_total.inc(endpoint='search', status='200')
+        latency.observe(i / 200, endpoint='search')
+    print(registry.to_prometheus())
+    print('p95 ≈', latency.quantile(0.95, endpoint='search'))
@@ -0,0 +1,185 @@
+"""
+爬虫传输层
+按主机配置连接池大小的 requests.Session（挂载带重试的HTTPAdapter），
+统计keep-alive连接复用情况，支持流式解压读取响应体，
+可选使用 httpx 的HTTP/2多路复用客户端
+"""
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# 尝试导入httpx（可选依赖，HTTP/2还需要h2包）
+try:
+    import httpx  # type: ignore
+    HTTPX_AVAILABLE = True
+except ImportError:
+    httpx = None  # type: ignore
+    HTTPX_AVAILABLE = False
+
+# 默认连接池大小：弹幕/分P/搜索接口都在api主机上，www主机只用于初始化cookies
+DEFAULT_POOL_SIZES = {
+    'https://api.bilibili.com': 16,
+    'https://www.bilibili.com': 4,
+}
+DEFAULT_POOL_SIZE = 10
+# 可安全自动重试的状态码；412是风控封禁，立即重试没有意义，交给爬虫自行处理
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def _make_retry(retries: int, backoff_factor: float) -> Retry:
+    return Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=frozenset(['GET', 'HEAD']),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+
+
+class CrawlerTransport:
+    def __init__(self, pool_sizes: Dict[str, int] = None, default_pool_size: int = DEFAULT_POOL_SIZE,
+                 retries: int = 3, backoff_factor: float = 0.5, http2: bool = False):
+        """
+        pool_sizes: URL前缀 -> 该主机的最大连接数（requests按最长前缀匹配适配器）
+        http2: 使用httpx的HTTP/2客户端（同一主机的并发请求复用一条连接）
+        """
+        self.pool_sizes = dict(DEFAULT_POOL_SIZES if pool_sizes is None else pool_sizes)
+        self.default_pool_size = default_pool_size
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.http_versions: Dict[str, int] = {}
+
+        if http2 and not HTTPX_AVAILABLE:
+            print("警告: httpx未安装，无法使用HTTP/2，改用requests（HTTP/1.1）。")
+            print("可以运行 'pip install httpx[http2]' 来安装。")
+            http2 = False
+        self.http2 = http2
+        self.session = self._build_httpx_client() if http2 else self._build_session()
+
+    def _build_session(self) -> requests.Session:
+        session = requests.Session()
+        retry = _make_retry(self.retries, self.backoff_factor)
+        for prefix in ('https://', 'http://'):
+            session.mount(prefix, HTTPAdapter(pool_connections=4, pool_maxsize=self.default_pool_size,
+                                              max_retries=retry))
+        for prefix, size in self.pool_sizes.items():
+            # 每个前缀只对应一个主机，一个池即可；pool_block=False 时超出上限的连接用完即关
+            session.mount(prefix.rstrip('/') + '/',
+                          HTTPAdapter(pool_connections=1, pool_maxsize=size, max_retries=retry))
+        return session
+
+    def _build_httpx_client(self):
+        max_connections = sum(self.pool_sizes.values()) or self.default_pool_size
+        client = httpx.Client(
+            http2=True,
+            limits=httpx.Limits(max_connections=max_connections,
+                                max_keepalive_connections=max_connections),
+            # httpx的传输层只重试连接失败，状态码重试由爬虫的限流逻辑处理
+            transport=httpx.HTTPTransport(http2=True, retries=self.retries),
+            event_hooks={'response': [self._record_http_version]},
+        )
+        return client
+
+    def _record_http_version(self, response):
+        version = response.http_version
+        self.http_versions[version] = self.http_versions.get(version, 0) + 1
+
+    @property
+    def request_errors(self) -> Tuple[type, ...]:
+        """
+        当前客户端的网络异常类型
+        """
+        if self.http2:
+            return (httpx.HTTPError,)
+        return (requests.RequestException,)
+
+    def get(self, url: str, **kwargs):
+        return self.session.get(url, **kwargs)
+
+    @contextmanager
+    def stream(self, url: str, chunk_size: int = STREAM_CHUNK_SIZE, **kwargs):
+        """
+        流式GET：yield (response, 已解压的数据块迭代器)，响应体边下载边交给调用方解析
+        """
+        if self.http2:
+            with self.session.stream('GET', url, **kwargs) as response:
+                yield response, response.iter_bytes(chunk_size)
+            return
+
+        response = self.session.get(url, stream=True, **kwargs)
+        try:
+            # decode_content=True 时urllib3按Content-Encoding增量解压gzip/deflate/br
+            yield response, response.raw.stream(chunk_size, decode_content=True)
+        finally:
+            # 读完的连接归还连接池，未读完的连接直接关闭
+            response.close()
+
+    @staticmethod
+    def retry_count(response) -> int:
+        """
+        该响应在传输层被自动重试的次数
+        """
+        retries = getattr(getattr(response, 'raw', None), 'retries', None)
+        history = getattr(retries, 'history', None)
+        return len(history) if history else 0
+
+    def connection_stats(self) -> List[Dict]:
+        """
+        各主机连接池的keep-alive复用统计
+        requests: 新建连接数、请求数、复用次数、当前空闲连接数
+        httpx: 按HTTP版本统计的响应数
+        """
+        if self.http2:
+            return [{'http_version': version, 'requests': count}
+                    for version, count in sorted(self.http_versions.items())]
+
+        stats = []
+        seen = set()
+        for prefix, adapter in self.session.adapters.items():
+            pools = adapter.poolmanager.pools
+            for key in list(pools.keys()):
+                try:
+                    pool = pools[key]
+                except KeyError:
+                    continue
+                if id(pool) in seen:
+                    continue
+                seen.add(id(pool))
+                stats.append({
+                    'adapter': prefix,
+                    'host': f"{pool.scheme}://{pool.host}:{pool.port}",
+                    'max_size': pool.pool.maxsize if pool.pool is not None else 0,
+                    'connections_opened': pool.num_connections,
+                    'requests': pool.num_requests,
+                    'reused': max(pool.num_requests - pool.num_connections, 0),
+                    'idle': pool.pool.qsize() if pool.pool is not None else 0,
+                })
+        return stats
+
+    def format_connection_stats(self) -> str:
+        stats = self.connection_stats()
+        if self.http2:
+            return '  '.join(f"{s['http_version']}: {s['requests']} 次请求" for s in stats)
+        lines = [f"{'主机':<36} {'池上限':>6} {'新建连接':>8} {'请求数':>8} {'复用率':>8}"]
+        for s in stats:
+            reuse = s['reused'] / s['requests'] * 100 if s['requests'] else 0
+            lines.append(f"{s['host']:<36} {s['max_size']:>6} {s['connections_opened']:>8} "
+                         f"{s['requests']:>8} {reuse:>7.1f}%")
+        return '\n'.join(lines)
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
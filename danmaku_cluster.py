@@ -0,0 +1,150 @@
+"""
+近似重复弹幕聚类模块
+使用字符shingle + MinHash + LSH分桶，在近似线性时间内把
+'哈哈哈哈' / '哈哈哈哈哈' 这类变体归为同一簇
+"""
+import random
+import re
+import zlib
+from collections import Counter
+from typing import Dict, Iterable, List, Tuple
+
+from danmaku_corpus import DanmakuCorpus
+
+# 大于2^32的最小素数，crc32哈希经 (a*h+b) % P 置换后仍接近均匀分布
+_HASH_PRIME = 4294967311
+
+
+def cluster_rows(clusters: List[Dict], top_n: int = 8) -> List[Dict]:
+    """
+    把聚类结果整理为排名前N的簇及其代表弹幕（各版本处理器共用）
+    """
+    return [
+        {
+            'rank': i,
+            'danmaku': cluster['representative'],
+            'count': cluster['count'],
+            'variant_count': len(cluster['variants']),
+            'variants': [text for text, _ in cluster['variants'][:5]]
+        }
+        for i, cluster in enumerate(clusters[:top_n], 1)
+    ]
+
+
+class MinHashLSHClusterer:
+    def __init__(self, num_perm: int = 64, bands: int = 16, shingle_size: int = 2,
+                 threshold: float = 0.5, seed: int = 1):
+        if num_perm % bands != 0:
+            raise ValueError(f"num_perm({num_perm}) 必须能被 bands({bands}) 整除")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.threshold = threshold
+
+        # 固定随机种子，保证每次运行聚类结果一致
+        rng = random.Random(seed)
+        self._perms = [(rng.randrange(1, _HASH_PRIME), rng.randrange(0, _HASH_PRIME))
+                       for _ in range(num_perm)]
+        self._space_pattern = re.compile(r'\s+')
+
+    def _shingles(self, text: str) -> set:
+        """
+        将弹幕切分为字符shingle集合
+        """
+        text = self._space_pattern.sub('', text.lower())
+        k = self.shingle_size
+        if len(text) <= k:
+            return {text}
+        return {text[i:i + k] for i in range(len(text) - k + 1)}
+
+    def signature(self, text: str) -> Tuple[int, ...]:
+        """
+        计算弹幕的MinHash签名
+        """
+        hashes = [zlib.crc32(s.encode('utf-8')) for s in self._shingles(text)]
+        return tuple(
+            min((a * h + b) % _HASH_PRIME for h in hashes)
+            for a, b in self._perms
+        )
+
+    @staticmethod
+    def similarity(sig_a: Tuple[int, ...], sig_b: Tuple[int, ...]) -> float:
+        """
+        由签名估计两条弹幕的Jaccard相似度
+        """
+        same = sum(1 for x, y in zip(sig_a, sig_b) if x == y)
+        return same / len(sig_a)
+
+    def cluster(self, text_counts: Iterable[Tuple[str, int]]) -> List[Dict]:
+        """
+        对 (弹幕, 次数) 进行近似重复聚类，按簇总次数降序返回
+        每个簇以出现次数最多的变体作为代表文本
+        """
+        texts = []
+        counts = []
+        signatures = []
+        for text, count in text_counts:
+            texts.append(text)
+            counts.append(count)
+            signatures.append(self.signature(text))
+
+        # 并查集
+        parent = list(range(len(texts)))
+
+        def find(x):
+            while parent[x] != x:
+                parent[x] = parent[parent[x]]
+                x = parent[x]
+            return x
+
+        # LSH分桶：同一band内签名完全相同的弹幕成为候选对，
+        # 只与桶内首个成员比较，避免O(n²)的两两比较
+        buckets = {}
+        for idx, sig in enumerate(signatures):
+            for band in range(self.bands):
+                start = band * self.rows
+                key = (band, sig[start:start + self.rows])
+                head = buckets.setdefault(key, idx)
+                if head == idx:
+                    continue
+                root_a, root_b = find(head), find(idx)
+                if root_a != root_b and self.similarity(signatures[head], sig) >= self.threshold:
+                    parent[root_b] = root_a
+
+        groups = {}
+        for idx in range(len(texts)):
+            groups.setdefault(find(idx), []).append(idx)
+
+        clusters = []
+        for members in groups.values():
+            members.sort(key=lambda i: counts[i], reverse=True)
+            clusters.append({
+                'representative': texts[members[0]],
+                'count': sum(counts[i] for i in members),
+                'variants': [(texts[i], counts[i]) for i in members],
+            })
+        clusters.sort(key=lambda c: c['count'], reverse=True)
+        return clusters
+
+    def cluster_danmaku(self, danmaku_list: Iterable[str]) -> List[Dict]:
+        """
+        对弹幕列表先做精确计数，再对去重后的文本聚类
+        """
+        if isinstance(danmaku_list, DanmakuCorpus):
+            return self.cluster(danmaku_list.iter_unique())
+        return self.cluster(Counter(danmaku_list).items())
+
+    def count_cluster_frequency(self, danmaku_list: Iterable[str], top_n: int = 8) -> List[Dict]:
+        """
+        按近似重复簇统计词频，返回排名前N的簇及其代表弹幕
+        """
+        return cluster_rows(self.cluster_danmaku(danmaku_list), top_n)
+
+
+if __name__ == '__main__':
+    clusterer = MinHashLSHClusterer()
+    test_data = ['哈哈哈哈', '哈哈哈哈哈', '哈哈哈', '大模型真厉害', '大模型真厉害啊',
+                 '这个模型不错', '哈哈哈哈'] * 3
+    for c in clusterer.cluster_danmaku(test_data):
+        print(c['representative'], c['count'], c['variants'])
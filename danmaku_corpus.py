@@ -0,0 +1,168 @@
+"""
+紧凑弹幕语料模块
+所有不重复的弹幕文本以UTF-8编码顺序存放在同一块缓冲区中，
+每条弹幕只保存一个整数id，避免为每条短弹幕各保留一个str对象
+"""
+from array import array
+from typing import Callable, Iterable, Iterator, List, Tuple, Union
+
+
+class DanmakuCorpus:
+    def __init__(self):
+        # 第i个唯一文本位于 _buffer[_offsets[i]:_offsets[i+1]]
+        self._buffer = bytearray()
+        self._offsets = array('Q', [0])
+        # 每个唯一文本的出现次数
+        self._counts = array('I')
+        # 每条弹幕对应的唯一文本id（保持原始顺序）
+        self._ids = array('I')
+        # 文本 -> id 的驻留表，仅在追加数据时使用，可通过 freeze() 释放
+        self._lookup = {}
+
+    @classmethod
+    def from_iterable(cls, danmaku_iter: Iterable[str]) -> 'DanmakuCorpus':
+        """
+        从任意弹幕迭代器构建语料（逐条读取，不要求先生成列表）
+        """
+        corpus = cls()
+        corpus.extend(danmaku_iter)
+        return corpus
+
+    def _intern(self, text: str) -> int:
+        uid = self._lookup.get(text)
+        if uid is None:
+            if not self._lookup and len(self._counts):
+                self._rebuild_lookup()
+                return self._intern(text)
+            uid = len(self._counts)
+            self._buffer += text.encode('utf-8')
+            self._offsets.append(len(self._buffer))
+            self._counts.append(0)
+            self._lookup[text] = uid
+        return uid
+
+    def _rebuild_lookup(self):
+        self._lookup = {text: uid for uid, text in enumerate(self.iter_unique_texts())}
+
+    def append(self, text: str) -> int:
+        """
+        追加一条弹幕，返回其唯一文本id
+        """
+        uid = self._intern(text)
+        self._counts[uid] += 1
+        self._ids.append(uid)
+        return uid
+
+    def extend(self, danmaku_iter: Iterable[str]):
+        """
+        追加多条弹幕
+        """
+        for text in danmaku_iter:
+            self.append(text)
+
+    def freeze(self):
+        """
+        释放驻留表，只保留紧凑存储（之后追加时会自动重建）
+        """
+        self._lookup = {}
+
+    def text(self, uid: int) -> str:
+        """
+        根据唯一文本id取出文本
+        """
+        return self._buffer[self._offsets[uid]:self._offsets[uid + 1]].decode('utf-8')
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __iter__(self) -> Iterator[str]:
+        """
+        按原始顺序逐条解码弹幕，任意时刻只生成当前这一条str
+        """
+        text = self.text
+        for uid in self._ids:
+            yield text(uid)
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[str, List[str]]:
+        if isinstance(index, slice):
+            return [self.text(uid) for uid in self._ids[index]]
+        return self.text(self._ids[index])
+
+    @property
+    def unique_count(self) -> int:
+        return len(self._counts)
+
+    def ids(self) -> array:
+        """
+        每条弹幕对应的唯一文本id数组
+        """
+        return self._ids
+
+    def counts(self) -> array:
+        """
+        每个唯一文本的出现次数数组（下标为唯一文本id）
+        """
+        return self._counts
+
+    def iter_unique_texts(self) -> Iterator[str]:
+        """
+        按首次出现顺序遍历不重复文本
+        """
+        for uid in range(len(self._counts)):
+            yield self.text(uid)
+
+    def iter_unique(self) -> Iterator[Tuple[str, int]]:
+        """
+        按首次出现顺序遍历 (文本, 出现次数)，可替代对全部弹幕的逐条统计
+        """
+        for uid, count in enumerate(self._counts):
+            yield self.text(uid), count
+
+    def filter(self, predicate: Callable[[str], bool]) -> 'DanmakuCorpus':
+        """
+        按文本过滤，谓词对每个唯一文本只调用一次
+        """
+        keep = array('b', (1 if predicate(text) else 0 for text in self.iter_unique_texts()))
+
+        result = DanmakuCorpus()
+        remap = array('i', [-1]) * len(keep)
+        for uid, kept in enumerate(keep):
+            if kept:
+                remap[uid] = result.unique_count
+                result._buffer += self._buffer[self._offsets[uid]:self._offsets[uid + 1]]
+                result._offsets.append(len(result._buffer))
+                result._counts.append(self._counts[uid])
+
+        for uid in self._ids:
+            new_uid = remap[uid]
+            if new_uid >= 0:
+                result._ids.append(new_uid)
+        return result
+
+    def nbytes(self) -> int:
+        """
+        紧凑存储占用的字节数（不含驻留表）
+        """
+        return (len(self._buffer)
+                + self._offsets.itemsize * len(self._offsets)
+                + self._counts.itemsize * len(self._counts)
+                + self._ids.itemsize * len(self._ids))
+
+
+def iter_weighted(danmaku_list: Iterable[str]) -> Iterator[Tuple[str, int]]:
+    """
+    统一遍历 (文本, 权重)：语料对象按唯一文本带次数遍历，普通列表逐条权重为1
+    """
+    if isinstance(danmaku_list, DanmakuCorpus):
+        return danmaku_list.iter_unique()
+    return ((text, 1) for text in danmaku_list)
+
+
+if __name__ == '__main__':
+    import sys
+    test_data = ['666', '大模型真厉害', '6', '点赞', '这个模型不错', '666666', '大模型真厉害'] * 1000
+    corpus = DanmakuCorpus.from_iterable(test_data)
+    print(f"弹幕数: {len(corpus)}, 唯一文本数: {corpus.unique_count}")
+    print(f"紧凑存储: {corpus.nbytes()} 字节, 列表存储约: "
+          f"{sys.getsizeof(test_data) + sum(sys.getsizeof(t) for t in set(test_data))} 字节")
+    print(list(corpus.iter_unique()))
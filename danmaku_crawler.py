@@ -3,18 +3,62 @@ B站弹幕爬虫模块
 使用requests和BeautifulSoup爬取B站视频弹幕数据
 """
 import requests
+import html
 import json
+import os
+import socket
+import threading
 import time
 import re
 import random
+from contextlib import contextmanager
+from xml.etree import ElementTree
 from urllib.parse import quote
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
 from bs4 import BeautifulSoup
+from bili_credentials import CREDENTIALS_FILENAME, BiliCredentials
+from concurrent.futures import ThreadPoolExecutor
+from crawl_queue import SQLiteWorkQueue, WorkQueue
+from crawl_scheduler import CrawlBudget, YieldScheduler
+from crawler_metrics import MetricsRegistry
+from crawler_transport import CrawlerTransport
+from danmaku_timeline import DanmakuTimeline
+
+# 尝试导入orjson（可选依赖，解析搜索结果JSON更快）
+try:
+    import orjson  # type: ignore
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+# 视频搜索接口单页最多返回50条
+SEARCH_PAGE_SIZE = 50
+_HTML_TAG = re.compile(r'<[^>]+>')
+
+
+def _project_search_item(item: Dict) -> Dict:
+    """
+    只保留需要的字段；标题去掉关键词高亮标签并还原HTML实体
+    """
+    return {
+        'bvid': item.get('bvid', ''),
+        'title': html.unescape(_HTML_TAG.sub('', item.get('title', ''))),
+        'aid': item.get('aid', 0),
+        'view': item.get('play', 0),
+        'danmaku': item.get('video_review', 0)
+    }
 
 
 class BilibiliDanmakuCrawler:
-    def __init__(self):
-        self.session = requests.Session()
+    def __init__(self, base_url: str = 'https://www.bilibili.com',
+                 api_url: str = 'https://api.bilibili.com',
+                 request_delay: Tuple[float, float] = (1.5, 3.0),
+                 video_delay: float = 0.5, metrics: MetricsRegistry = None,
+                 metrics_file: str = None, transport: CrawlerTransport = None,
+                 scheduler: YieldScheduler = None,
+                 credentials_file: Optional[str] = CREDENTIALS_FILENAME):
+        # 传输层：按主机配置连接池、自动重试、可选HTTP/2
+        self.transport = transport or CrawlerTransport({api_url: 16, base_url: 4})
         # 更完整的浏览器请求头
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36 Edg/131.0.0.0',
@@ -30,55 +74,157 @@ class BilibiliDanmakuCrawler:
             'Cache-Control': 'no-cache',
             'Pragma': 'no-cache'
         })
-        self.base_url = 'https://www.bilibili.com'
-        self.search_url = 'https://api.bilibili.com/x/web-interface/search/type'
+        if self.transport.http2:
+            # HTTP/2禁止携带连接级请求头
+            self.session.headers.pop('Connection', None)
+        self.base_url = base_url
+        self.api_url = api_url
+        # 搜索走WBI签名接口，未签名的请求更容易被412风控拦截
+        self.search_url = f'{api_url}/x/web-interface/wbi/search/type'
+        # 搜索翻页间的随机延迟区间和视频之间的固定延迟（秒），对接本地替身服务器时可设为0
+        self.request_delay = request_delay
+        self.video_delay = video_delay
+        # 按每次请求的预期弹幕数决定视频的爬取顺序
+        self.scheduler = scheduler or YieldScheduler()
+        
+        # 最近一次爬取的弹幕时间信息（与返回的弹幕列表逐条对齐）
+        self.timeline = DanmakuTimeline()
+        
+        # 请求/吞吐指标；设置 metrics_file 时每处理完一个视频写出一次Prometheus文本
+        self.metrics = metrics or MetricsRegistry()
+        self.metrics_file = metrics_file
+        self._m_requests = self.metrics.counter('crawler_requests_total', '按接口和状态码统计的请求数')
+        self._m_latency = self.metrics.histogram('crawler_request_duration_seconds', '请求延迟（秒）')
+        self._m_bytes = self.metrics.counter('crawler_response_bytes_total', '下载的响应字节数（解压后）')
+        self._m_throttled = self.metrics.counter('crawler_throttled_total', '被限流的请求数（412/429）')
+        self._m_retries = self.metrics.counter('crawler_retries_total', '重试次数')
+        self._m_errors = self.metrics.counter('crawler_request_errors_total', '网络异常次数')
+        self._m_danmaku = self.metrics.counter('crawler_danmaku_total', '获取的弹幕条数')
+        self._m_videos = self.metrics.counter('crawler_videos_total', '处理的视频数')
+        self._m_request_rate = self.metrics.gauge('crawler_requests_per_second', '本次爬取各接口的平均请求速率')
+        self._m_danmaku_rate = self.metrics.gauge('crawler_danmaku_per_second', '本次爬取的平均弹幕获取速率')
+        self._m_conn_opened = self.metrics.gauge('crawler_connections_opened', '各主机连接池新建的连接数')
+        self._m_conn_reused = self.metrics.gauge('crawler_connections_reused', '各主机复用keep-alive连接的请求数')
         
-        # 初始化时访问主页获取cookies
-        self._init_session()
+        # buvid cookies和WBI密钥缓存在本地，首次调用需要它们的接口时才获取
+        self.credentials = BiliCredentials(self._get, api_url, credentials_file)
+        self._applied_cookies = {}
     
-    def _init_session(self):
+    @property
+    def session(self):
+        return self.transport.session
+    
+    @session.setter
+    def session(self, session):
+        self.transport.session = session
+    
+    def _ensure_cookies(self):
+        """
+        把（按需获取的）buvid cookies放入session，cookies刷新后重新设置
         """
-        初始化session，访问主页获取必要的cookies
+        cookies = self.credentials.cookies()
+        if cookies != self._applied_cookies:
+            for name, value in cookies.items():
+                self.session.cookies.set(name, value)
+            self._applied_cookies = cookies
+    
+    def _get(self, endpoint: str, url: str, **kwargs):
+        """
+        发送GET请求并按接口记录延迟、状态码、字节数和限流情况
         """
+        start = time.perf_counter()
         try:
-            print("正在初始化连接...")
-            response = self.session.get(self.base_url, timeout=10)
-            if response.status_code == 200:
-                print("连接初始化成功")
-            time.sleep(1)  # 等待一下
-        except Exception as e:
-            print(f"初始化连接时出错: {e}")
+            response = self.transport.get(url, **kwargs)
+        except self.transport.request_errors as e:
+            self._m_latency.observe(time.perf_counter() - start, endpoint=endpoint)
+            self._m_errors.inc(endpoint=endpoint, error=type(e).__name__)
+            raise
+        self._m_latency.observe(time.perf_counter() - start, endpoint=endpoint)
+        self._record_response(endpoint, response, len(response.content))
+        return response
+    
+    def _record_response(self, endpoint: str, response, num_bytes: int):
+        self._m_requests.inc(endpoint=endpoint, status=response.status_code)
+        self._m_bytes.inc(num_bytes, endpoint=endpoint)
+        retries = self.transport.retry_count(response)
+        if retries:
+            self._m_retries.inc(retries, endpoint=endpoint)
+        if response.status_code in (412, 429):
+            self._m_throttled.inc(endpoint=endpoint, status=response.status_code)
+    
+    @contextmanager
+    def _stream(self, endpoint: str, url: str, **kwargs):
+        """
+        流式GET，yield (response, 已解压数据块迭代器)，延迟和字节数在读完后记录
+        """
+        start = time.perf_counter()
+        num_bytes = 0
+        response = None
+        
+        def counted(chunks):
+            nonlocal num_bytes
+            for chunk in chunks:
+                num_bytes += len(chunk)
+                yield chunk
+        
+        try:
+            with self.transport.stream(url, **kwargs) as (response, chunks):
+                yield response, counted(chunks)
+        except self.transport.request_errors as e:
+            self._m_errors.inc(endpoint=endpoint, error=type(e).__name__)
+            raise
+        finally:
+            self._m_latency.observe(time.perf_counter() - start, endpoint=endpoint)
+            if response is not None:
+                self._record_response(endpoint, response, num_bytes)
+    
+    def _update_rates(self, elapsed: float):
+        """
+        按本次爬取的耗时刷新速率指标
+        """
+        if elapsed <= 0:
+            return
+        for endpoint in ('search', 'pagelist', 'danmaku'):
+            self._m_request_rate.set(round(self._m_latency.count(endpoint=endpoint) / elapsed, 3),
+                                     endpoint=endpoint)
+        self._m_danmaku_rate.set(round(self._m_danmaku.total() / elapsed, 3))
+        if not self.transport.http2:
+            for pool in self.transport.connection_stats():
+                self._m_conn_opened.set(pool['connections_opened'], host=pool['host'])
+                self._m_conn_reused.set(pool['reused'], host=pool['host'])
+        if self.metrics_file:
+            self.metrics.dump(self.metrics_file)
         
     def search_videos(self, keyword: str, max_videos: int = 300) -> List[Dict]:
         """
         搜索相关视频，返回视频信息列表
+        每页取接口允许的最大条数，处理当前页时已在后台请求下一页
         """
         videos = []
         page = 1
-        page_size = 20
+        page_size = SEARCH_PAGE_SIZE
+        max_pages = -(-max_videos // page_size)
+        retried = False
         
         print(f"开始搜索关键词: {keyword}")
         
-        while len(videos) < max_videos:
-            params = {
-                'search_type': 'video',
-                'keyword': keyword,
-                'page': page,
-                'pagesize': page_size,
-                'order': 'totalrank'  # 综合排序
-            }
-            
-            try:
-                # 随机延迟，模拟人类行为
-                time.sleep(random.uniform(1.5, 3.0))
-                
-                # 更新Referer为搜索页面（URL编码关键词）
-                encoded_keyword = quote(keyword)
-                self.session.headers.update({
-                    'Referer': f'https://www.bilibili.com/search?keyword={encoded_keyword}'
-                })
-                
-                response = self.session.get(self.search_url, params=params, timeout=15)
+        # 更新Referer为搜索页面（URL编码关键词）
+        encoded_keyword = quote(keyword)
+        self.session.headers.update({
+            'Referer': f'https://www.bilibili.com/search?keyword={encoded_keyword}'
+        })
+        
+        with ThreadPoolExecutor(max_workers=1) as prefetcher:
+            future = prefetcher.submit(self._fetch_search_page, keyword, page, page_size)
+            while len(videos) < max_videos:
+                try:
+                    response = future.result()
+                except requests.RequestException as e:
+                    print(f"搜索请求异常: {e}")
+                    break
+                except Exception as e:
+                    print(f"搜索过程出错: {e}")
+                    break
                 
                 # 检查响应状态
                 if response.status_code == 412:
@@ -87,74 +233,97 @@ class BilibiliDanmakuCrawler:
                     print("  1. 等待几分钟后重试")
                     print("  2. 检查网络连接")
                     print("  3. 考虑使用浏览器手动访问获取cookies")
-                    # 尝试等待后重试一次
-                    if page == 1:
+                    # 刷新凭据，等待后重试一次
+                    if page == 1 and not retried:
                         print("等待5秒后重试...")
+                        self.credentials.invalidate()
                         time.sleep(5)
+                        retried = True
+                        self._m_retries.inc(endpoint='search')
+                        future = prefetcher.submit(self._fetch_search_page, keyword, page, page_size)
                         continue
                     break
                 elif response.status_code != 200:
                     print(f"搜索请求失败，状态码: {response.status_code}")
                     try:
-                        error_data = response.json()
+                        error_data = _json_loads(response.content)
                         print(f"错误信息: {error_data.get('message', '未知错误')}")
-                    except:
+                    except ValueError:
                         print(f"响应内容: {response.text[:200]}")
                     break
                 
                 # 检查响应内容类型
-                if not response.text or not response.text.strip():
+                if not response.content or not response.content.strip():
                     print(f"搜索响应为空")
                     break
                 
                 # 检查是否为JSON格式
                 try:
-                    data = response.json()
-                except json.JSONDecodeError as json_err:
+                    data = _json_loads(response.content)
+                except ValueError as json_err:
                     print(f"JSON解析失败: {json_err}")
                     print(f"响应内容前500字符: {response.text[:500]}")
                     break
                 
+                if data.get('code') == -352 and not retried:
+                    # WBI签名或cookies未通过风控校验，刷新后重试一次
+                    print("搜索请求未通过风控校验（-352），刷新凭据后重试...")
+                    self.credentials.invalidate()
+                    retried = True
+                    self._m_retries.inc(endpoint='search')
+                    future = prefetcher.submit(self._fetch_search_page, keyword, page, page_size)
+                    continue
                 if data.get('code') != 0:
                     print(f"搜索出错: {data.get('message', '未知错误')}, code: {data.get('code')}")
                     break
-                    
-                result = data.get('data', {}).get('result', [])
+                
+                data = data.get('data') or {}
+                result = data.get('result') or []
                 if not result:
                     print(f"第 {page} 页没有更多结果")
                     break
-                    
+                
+                # 还需要下一页时先发出请求（含随机延迟），再处理当前页
+                num_pages = min(max_pages, data.get('numPages') or max_pages)
+                page += 1
+                need_next = page <= num_pages and len(videos) + len(result) < max_videos
+                if need_next:
+                    future = prefetcher.submit(self._fetch_search_page, keyword, page, page_size)
+                
                 for item in result:
                     if len(videos) >= max_videos:
                         break
-                    videos.append({
-                        'bvid': item.get('bvid', ''),
-                        'title': item.get('title', ''),
-                        'aid': item.get('aid', 0),
-                        'view': item.get('play', 0),
-                        'danmaku': item.get('video_review', 0)
-                    })
+                    videos.append(_project_search_item(item))
                 
                 print(f"已获取 {len(videos)} 个视频信息...")
-                page += 1
-                # 页面之间的延迟已经在请求前添加
-                
-            except requests.RequestException as e:
-                print(f"搜索请求异常: {e}")
-                break
-            except Exception as e:
-                print(f"搜索过程出错: {e}")
-                break
-                
+                if not need_next:
+                    break
+        
         return videos[:max_videos]
     
+    def _fetch_search_page(self, keyword: str, page: int, page_size: int):
+        """
+        请求一页搜索结果（在预取线程中执行）
+        """
+        params = {
+            'search_type': 'video',
+            'keyword': keyword,
+            'page': page,
+            'pagesize': page_size,
+            'order': 'totalrank'  # 综合排序
+        }
+        # 随机延迟，模拟人类行为
+        time.sleep(random.uniform(*self.request_delay))
+        self._ensure_cookies()
+        return self._get('search', self.search_url, params=self.credentials.sign(params), timeout=15)
+    
     def get_cid(self, bvid: str) -> int:
         """
         根据BV号获取cid（弹幕文件ID）
         """
-        url = f"https://api.bilibili.com/x/player/pagelist?bvid={bvid}"
+        url = f"{self.api_url}/x/player/pagelist?bvid={bvid}"
         try:
-            response = self.session.get(url, timeout=10)
+            response = self._get('pagelist', url, timeout=10)
             data = response.json()
             if data.get('code') == 0:
                 pages = data.get('data', [])
@@ -164,65 +333,253 @@ class BilibiliDanmakuCrawler:
             print(f"获取cid失败 {bvid}: {e}")
         return 0
     
-    def get_danmaku(self, cid: int) -> List[str]:
+    def get_danmaku(self, cid: int, timeline: DanmakuTimeline = None, video_id: int = 0) -> List[str]:
         """
         获取指定cid的弹幕数据
+        传入timeline时，同时记录每条弹幕p属性中的视频内时间和发送时间戳
+        响应体边下载边解压边增量解析，不必等待整个XML到达
         """
-        url = f"https://api.bilibili.com/x/v1/dm/list.so?oid={cid}"
-        danmaku_list = []
-        
         try:
-            response = self.session.get(url, timeout=10)
-            response.encoding = 'utf-8'
-            
-            # 解析XML格式的弹幕
-            soup = BeautifulSoup(response.text, 'xml')
-            d_elements = soup.find_all('d')
-            
-            for d in d_elements:
-                text = d.get_text().strip()
-                if text:
-                    danmaku_list.append(text)
-                    
+            danmaku_list, p_list = self.fetch_danmaku(cid)
         except Exception as e:
+            # 下载中途失败时与整体下载一样丢弃该视频，不保留不完整的弹幕
             print(f"获取弹幕失败 cid={cid}: {e}")
-            
+            return []
+        
+        if timeline is not None:
+            for p in p_list:
+                timeline.append_p(p, video_id)
         return danmaku_list
     
-    def crawl_danmaku(self, keywords: List[str], max_videos: int = 300) -> List[str]:
+    def fetch_danmaku(self, cid: int) -> Tuple[List[str], List[str]]:
+        """
+        下载并解析弹幕，返回 (弹幕文本列表, 对应的p属性列表)，网络异常和非200状态码直接抛出
+        """
+        url = f"{self.api_url}/x/v1/dm/list.so?oid={cid}"
+        danmaku_list = []
+        p_list = []
+        
+        with self._stream('danmaku', url, timeout=10) as (response, chunks):
+            self._check_danmaku_status(response)
+            parser = ElementTree.XMLPullParser(events=('start', 'end'))
+            root = None
+            try:
+                for chunk in chunks:
+                    parser.feed(chunk)
+                    for event, elem in parser.read_events():
+                        if root is None:
+                            root = elem
+                        elif event == 'end' and elem.tag == 'd':
+                            text = (elem.text or '').strip()
+                            if text:
+                                danmaku_list.append(text)
+                                p_list.append(elem.get('p', ''))
+                            # 已处理的元素从根节点移除，避免整棵树驻留内存
+                            root.clear()
+                parser.close()
+                return danmaku_list, p_list
+            except ElementTree.ParseError:
+                pass
+        
+        # 个别响应含非法XML字符：重新整体下载，回退到容错的BeautifulSoup解析
+        # （正常路径不缓存响应体，只有这种少见情况才把整个响应读入内存）
+        response = self._get('danmaku', url, timeout=10)
+        self._check_danmaku_status(response)
+        return self._parse_danmaku_xml(response.content)
+    
+    @staticmethod
+    def _check_danmaku_status(response):
+        if response.status_code != 200:
+            raise requests.HTTPError(f"弹幕请求失败，状态码: {response.status_code}", response=response)
+    
+    @staticmethod
+    def _parse_danmaku_xml(content: bytes) -> Tuple[List[str], List[str]]:
+        soup = BeautifulSoup(content, 'xml')
+        danmaku_list = []
+        p_list = []
+        for d in soup.find_all('d'):
+            text = d.get_text().strip()
+            if text:
+                danmaku_list.append(text)
+                p_list.append(d.get('p', ''))
+        return danmaku_list, p_list
+    
+    def crawl_danmaku(self, keywords: List[str], max_videos: int = 300,
+                      queue: WorkQueue = None, workers: int = 1,
+                      max_requests: int = None, time_budget: float = None) -> List[str]:
         """
         爬取多个关键词相关的视频弹幕
+        未传入queue时使用进程内的SQLite队列；workers>1 时在本进程内并发爬取
+        视频按预期弹幕产出从高到低爬取；给定请求数或时间（秒）预算时，预算用尽即停止，
+        返回已爬取部分（仍按搜索顺序排列）
         """
-        all_danmaku = []
-        processed_bvids = set()
+        queue = queue or SQLiteWorkQueue(':memory:')
+        budget = None
+        if max_requests is not None or time_budget is not None:
+            budget = CrawlBudget(max_requests, time_budget, self.requests_sent).start()
+        
+        self.enqueue_videos(keywords, queue, max_videos, budget)
+        if workers > 1:
+            threads = [threading.Thread(target=self.run_worker, args=(queue, f"thread-{i}", 0.1, budget))
+                       for i in range(workers)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        else:
+            self.run_worker(queue, budget=budget)
         
+        stats = queue.stats()
+        if budget is not None and stats['pending']:
+            print(f"预算用尽（{budget.describe()}），{stats['pending']} 个低产出视频未爬取")
+        return self.collect_results(queue)
+    
+    def requests_sent(self) -> float:
+        """
+        本爬虫实例已发出的请求数（含网络异常）
+        """
+        return self._m_requests.total() + self._m_errors.total()
+    
+    def enqueue_videos(self, keywords: List[str], queue: WorkQueue, max_videos: int = 300,
+                       budget: CrawlBudget = None) -> int:
+        """
+        协调者：搜索各关键词并把视频按预期产出定好优先级写入共享队列（队列按bvid去重），
+        返回新增的视频数。给定请求预算时，只入队剩余预算够爬取的高产出视频
+        """
+        added = 0
+        truncate = budget is not None and budget.max_requests is not None
+        candidates = {}
         for keyword in keywords:
             print(f"\n处理关键词: {keyword}")
-            videos = self.search_videos(keyword, max_videos)
+            videos = [dict(video, keyword=keyword, priority=self.scheduler.priority(video))
+                      for video in self.search_videos(keyword, max_videos)]
+            if truncate:
+                for video in videos:
+                    candidates.setdefault(video['bvid'], video)
+                continue
+            new = queue.enqueue(videos)
+            print(f"入队 {new} 个视频（{len(videos) - new} 个已在队列中）")
+            added += new
+        
+        if truncate:
+            remaining = budget.max_requests - budget.requests_used()
+            selected = self.scheduler.order(candidates.values(), remaining)
+            # 入队顺序保持搜索顺序，汇总结果时与不截断时一致
+            selected_bvids = {video['bvid'] for video in selected}
+            added = queue.enqueue(v for v in candidates.values() if v['bvid'] in selected_bvids)
+            print(f"请求预算剩余 {remaining:.0f} 次：从 {len(candidates)} 个视频中按预期产出入队 {added} 个")
+        queue.mark_enqueue_done()
+        return added
+    
+    def run_worker(self, queue: WorkQueue, worker_id: str = None, poll_interval: float = 1.0,
+                   budget: CrawlBudget = None) -> int:
+        """
+        工作节点：循环领取视频（预期产出高的先领）、爬取弹幕并把结果写回队列，
+        队列清空或预算用尽后返回处理的视频数
+        """
+        worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        start = time.perf_counter()
+        processed = 0
+        if budget is not None:
+            budget.start()
+        
+        while True:
+            if budget is not None and not budget.can_afford(self.scheduler.requests_per_video):
+                print(f"{worker_id} 预算用尽（{budget.describe()}），停止领取")
+                break
+            video = queue.claim(worker_id)
+            if video is None:
+                if queue.is_drained():
+                    break
+                # 协调者仍在入队，或其他节点的任务尚未完成（租约过期后可被重新领取）
+                time.sleep(poll_interval)
+                continue
             
-            for i, video in enumerate(videos, 1):
-                bvid = video['bvid']
-                if bvid in processed_bvids:
-                    continue
-                processed_bvids.add(bvid)
-                
-                print(f"[{i}/{len(videos)}] 处理视频: {video['title'][:50]}")
-                
+            bvid = video['bvid']
+            print(f"[{video.get('seq', '?')}/{queue.stats()['total']}] {worker_id} 处理视频: {video['title'][:50]}")
+            try:
                 cid = self.get_cid(bvid)
-                if cid:
-                    danmaku = self.get_danmaku(cid)
-                    all_danmaku.extend(danmaku)
-                    print(f"  获取到 {len(danmaku)} 条弹幕")
-                    time.sleep(0.5)  # 避免请求过快
-                else:
+                if not cid:
+                    self._m_videos.inc(status='no_cid')
                     print(f"  无法获取cid")
-                    
+                    queue.complete(bvid, {'status': 'no_cid', 'danmaku': [], 'p': []}, worker_id=worker_id)
+                    continue
+                danmaku, p_list = self.fetch_danmaku(cid)
+            except Exception as e:
+                self._m_videos.inc(status='error')
+                print(f"获取弹幕失败 {bvid}: {e}")
+                queue.fail(bvid, f"{type(e).__name__}: {e}", worker_id=worker_id)
+                continue
+            
+            if not queue.complete(bvid, {'status': 'ok', 'cid': cid, 'danmaku': danmaku, 'p': p_list},
+                                  worker_id=worker_id):
+                # 租约已过期且任务已被其他节点领取，结果以持有者为准
+                print(f"  {bvid} 的租约已被其他节点接管，丢弃本次结果")
+                continue
+            processed += 1
+            self._m_danmaku.inc(len(danmaku))
+            self._m_videos.inc(status='ok')
+            self._update_rates(time.perf_counter() - start)
+            print(f"  获取到 {len(danmaku)} 条弹幕"
+                  f"（{self._m_danmaku_rate.value():.0f} 条/秒，限流 {self._m_throttled.total():.0f} 次）")
+            time.sleep(self.video_delay)  # 避免请求过快
+        
+        self._update_rates(time.perf_counter() - start)
+        return processed
+    
+    def collect_results(self, queue: WorkQueue) -> List[str]:
+        """
+        协调者：按入队顺序汇总各节点的结果，同时重建 self.timeline
+        """
+        all_danmaku, self.timeline = collect_results(queue)
         return all_danmaku
+    
+    def metrics_summary(self) -> str:
+        """
+        各接口请求数、p50/p95延迟、限流次数和吞吐的文字汇总
+        """
+        lines = [f"{'接口':<10} {'请求数':>8} {'请求/秒':>8} {'p50(ms)':>9} {'p95(ms)':>9} {'限流':>6} {'下载(KB)':>10}"]
+        for endpoint in ('spi', 'nav', 'search', 'pagelist', 'danmaku'):
+            count = self._m_latency.count(endpoint=endpoint)
+            if not count:
+                continue
+            throttled = sum(self._m_throttled.value(endpoint=endpoint, status=code) for code in (412, 429))
+            lines.append(
+                f"{endpoint:<10} {count:>8} {self._m_request_rate.value(endpoint=endpoint):>8.2f} "
+                f"{self._m_latency.quantile(0.5, endpoint=endpoint) * 1000:>9.0f} "
+                f"{self._m_latency.quantile(0.95, endpoint=endpoint) * 1000:>9.0f} "
+                f"{throttled:>6.0f} {self._m_bytes.value(endpoint=endpoint) / 1024:>10.1f}"
+            )
+        lines.append(f"弹幕: {self._m_danmaku.total():.0f} 条，{self._m_danmaku_rate.value():.1f} 条/秒，"
+                     f"重试 {self._m_retries.total():.0f} 次")
+        lines.append(self.transport.format_connection_stats())
+        return '\n'.join(lines)
+
+
+def collect_results(queue: WorkQueue) -> Tuple[List[str], DanmakuTimeline]:
+    """
+    按入队顺序汇总队列中的结果，返回 (弹幕列表, 与之逐条对齐的时间信息)
+    """
+    all_danmaku = []
+    timeline = DanmakuTimeline()
+    for video, result in queue.results():
+        if result['status'] != 'ok':
+            continue
+        video_id = timeline.add_video(video['bvid'])
+        for p in result['p']:
+            timeline.append_p(p, video_id)
+        all_danmaku.extend(result['danmaku'])
+    
+    stats = queue.stats()
+    if stats['failed']:
+        print(f"{stats['failed']} 个视频多次重试后仍失败")
+    return all_danmaku, timeline
 
 
 if __name__ == '__main__':
-    crawler = BilibiliDanmakuCrawler()
+    crawler = BilibiliDanmakuCrawler(metrics_file='crawler_metrics.prom')
     keywords = ['大语言模型', '大模型', 'LLM']
     danmaku = crawler.crawl_danmaku(keywords, max_videos=300)
     print(f"\n总共获取 {len(danmaku)} 条弹幕")
+    print(crawler.metrics_summary())
 
@@ -0,0 +1,234 @@
+"""
+合成弹幕语料生成模块
+按固定随机种子生成分布接近真实数据的弹幕（长尾重复分布、中英混排、
+'666'/'点赞'等噪声、按真实比例出现的关键词），可流式写入磁盘或逐条迭代，
+并生成配套的搜索/分P/弹幕XML/弹幕protobuf接口响应，供爬虫基准测试使用
+"""
+import bisect
+import itertools
+import json
+import random
+import zlib
+from typing import Dict, Iterator, List
+from xml.sax.saxutils import escape
+
+# 各类弹幕的默认占比（参考 danmaku_cache.txt 的实际分布）
+DEFAULT_RATES = {
+    'noise': 0.18,     # '666'、'点赞'、纯数字/纯英文等噪声
+    'unique': 0.35,    # 只出现一次的长尾评论
+    'keyword': 0.06,   # 含'大模型'/'GPT'等关键词
+    'ascii': 0.12,     # 中英混排
+}
+
+_SUBJECTS = ['老师', '这个模型', 'up主', '这节课', '这个视频', '大家', '我', '课代表',
+             '这个方法', '评论区', '这个项目', '代码']
+_PREDICATES = ['讲得很好', '太强了', '学到了', '看不懂', '成本太高了', '会替代工作吗',
+               '在教育领域应用很广', '有幻觉问题', '改变未来', '免费用吗', '编程很强',
+               '求资料', '讲得太快了', '收藏了', '有点担忧', '很厉害', '不准确', '进步很快']
+_TAILS = ['', '', '', '！', '啊', '吧', '！！！', '～', '哈哈哈', '？', '了']
+_KEYWORDS = ['大模型', '大语言模型', 'LLM', 'GPT', 'ChatGPT', '语言模型', 'AI模型']
+_ASCII_WORDS = ['AI', 'python', 'prompt', 'RAG', 'Agent', 'transformer', 'token',
+                'DeepSeek', 'API', 'GPU', 'OK', 'lol']
+_NOISE = ['666', '6666', '666666', '点赞', '三连', '已三连', '关注了', '投币', '1', '11',
+          '2333', 'ok', 'hhh', '？？？', '打卡']
+_NUMBERS = '0123456789'
+
+
+def _zipf_cum_weights(n: int, exponent: float) -> List[float]:
+    return list(itertools.accumulate(1.0 / (rank ** exponent) for rank in range(1, n + 1)))
+
+
+def _varint(value: int) -> bytes:
+    """
+    protobuf varint编码
+    """
+    out = bytearray()
+    value &= (1 << 64) - 1
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _pb_field(number: int, value) -> bytes:
+    """
+    编码一个protobuf字段（int -> varint，str/bytes -> length-delimited）
+    """
+    if isinstance(value, int):
+        return _varint(number << 3) + _varint(value)
+    if isinstance(value, str):
+        value = value.encode('utf-8')
+    return _varint((number << 3) | 2) + _varint(len(value)) + value
+
+
+class DanmakuGenerator:
+    def __init__(self, seed: int = 42, pool_size: int = 20000, zipf_exponent: float = 1.0,
+                 rates: Dict[str, float] = None):
+        self.seed = seed
+        self.rates = dict(DEFAULT_RATES, **(rates or {}))
+        self.zipf_exponent = zipf_exponent
+
+        # 可重复评论池：排名越靠前重复越多（Zipf长尾分布）
+        pool_rng = random.Random(seed)
+        self.pool = [self._compose(pool_rng) for _ in range(pool_size)]
+        self._pool_cum_weights = _zipf_cum_weights(pool_size, zipf_exponent)
+        self._noise_cum_weights = _zipf_cum_weights(len(_NOISE), 1.6)
+
+    def _compose(self, rng: random.Random) -> str:
+        """
+        拼出一条普通弹幕（按比例混入关键词和英文单词）
+        """
+        subject = rng.choice(_SUBJECTS)
+        if rng.random() < self.rates['keyword']:
+            subject = rng.choice(_KEYWORDS)
+        text = subject + rng.choice(_PREDICATES)
+        if rng.random() < self.rates['ascii']:
+            word = rng.choice(_ASCII_WORDS)
+            text = f"{word} {text}" if rng.random() < 0.5 else f"{text} {word}"
+        return text + rng.choice(_TAILS)
+
+    def _weighted_pick(self, rng: random.Random, items: List[str], cum_weights: List[float]) -> str:
+        index = bisect.bisect(cum_weights, rng.random() * cum_weights[-1])
+        return items[min(index, len(items) - 1)]
+
+    def iter_danmaku(self, count: int, seed_offset: int = 0) -> Iterator[str]:
+        """
+        逐条生成弹幕，相同 (seed, seed_offset, count) 得到完全相同的序列
+        """
+        rng = random.Random(f"{self.seed}-{seed_offset}")
+        noise_rate = self.rates['noise']
+        unique_rate = self.rates['unique']
+        for i in range(count):
+            roll = rng.random()
+            if roll < noise_rate:
+                yield self._weighted_pick(rng, _NOISE, self._noise_cum_weights)
+            elif roll < noise_rate + unique_rate:
+                # 长尾：在普通弹幕后附加随机内容，使其基本只出现一次
+                suffix = ''.join(rng.choice(_NUMBERS) for _ in range(rng.randint(2, 6)))
+                yield f"{self._compose(rng)}{suffix}"
+            else:
+                yield self._weighted_pick(rng, self.pool, self._pool_cum_weights)
+
+    def generate(self, count: int, seed_offset: int = 0) -> List[str]:
+        return list(self.iter_danmaku(count, seed_offset))
+
+    def write_corpus(self, path: str, count: int, seed_offset: int = 0):
+        """
+        流式写入缓存格式的语料文件（每行一条弹幕），内存占用与规模无关
+        """
+        with open(path, 'w', encoding='utf-8') as f:
+            for i, text in enumerate(self.iter_danmaku(count, seed_offset)):
+                if i:
+                    f.write('\n')
+                f.write(text)
+
+    # ---- 伪造的B站接口响应 ----
+
+    def search_response(self, keyword: str, page: int, page_size: int = 20,
+                        total_results: int = 1000) -> Dict:
+        """
+        伪造 /x/web-interface/search/type 的视频搜索响应
+        """
+        rng = random.Random(f"{self.seed}-search-{keyword}-{page}")
+        start = (page - 1) * page_size
+        results = []
+        for i in range(start, min(start + page_size, total_results)):
+            aid = 100000 + i
+            results.append({
+                'type': 'video',
+                'aid': aid,
+                'bvid': f"BV{self.seed:02d}{aid:08d}",
+                'title': f'<em class="keyword">{escape(keyword)}</em> {self._compose(rng)} 第{i + 1}期',
+                'author': f"up主{rng.randint(1, 500)}",
+                'play': int(rng.paretovariate(1.2) * 1000),
+                'video_review': int(rng.paretovariate(1.3) * 50),
+                'duration': f"{rng.randint(1, 59)}:{rng.randint(0, 59):02d}",
+            })
+        num_pages = (total_results + page_size - 1) // page_size
+        return {'code': 0, 'message': '0',
+                'data': {'page': page, 'pagesize': page_size, 'numResults': total_results,
+                         'numPages': num_pages, 'result': results}}
+
+    def pagelist_response(self, bvid: str) -> Dict:
+        """
+        伪造 /x/player/pagelist 响应，cid由bvid确定
+        """
+        cid = int(bvid[-8:]) if bvid[-8:].isdigit() else zlib.crc32(bvid.encode('utf-8')) % 10 ** 8
+        return {'code': 0, 'message': '0', 'data': [{'cid': cid, 'page': 1, 'part': 'P1'}]}
+
+    def _danmaku_rows(self, cid: int, count: int):
+        rng = random.Random(f"{self.seed}-dm-{cid}")
+        duration = rng.randint(300, 3600)
+        base_ts = 1700000000 + rng.randint(0, 300) * 86400
+        for i, text in enumerate(self.iter_danmaku(count, seed_offset=cid)):
+            yield {
+                'id': cid * 100000 + i,
+                'progress': rng.uniform(0, duration),
+                'ctime': base_ts + rng.randint(0, 30 * 86400),
+                'mid_hash': f"{rng.getrandbits(32):08x}",
+                'content': text,
+            }
+
+    def xml_response(self, cid: int, count: int = 3000) -> bytes:
+        """
+        伪造 /x/v1/dm/list.so 的XML弹幕响应（带完整p属性）
+        """
+        parts = ['<?xml version="1.0" encoding="UTF-8"?><i><chatserver>chat.bilibili.com</chatserver>',
+                 f'<chatid>{cid}</chatid><mission>0</mission><maxlimit>{count}</maxlimit>']
+        for row in self._danmaku_rows(cid, count):
+            p = f"{row['progress']:.5f},1,25,16777215,{row['ctime']},0,{row['mid_hash']},{row['id']},10"
+            parts.append(f'<d p="{p}">{escape(row["content"])}</d>')
+        parts.append('</i>')
+        return ''.join(parts).encode('utf-8')
+
+    def protobuf_response(self, cid: int, count: int = 3000) -> bytes:
+        """
+        伪造 /x/v2/dm/web/seg.so 的protobuf弹幕响应（DmSegMobileReply.elems）
+        """
+        out = bytearray()
+        for row in self._danmaku_rows(cid, count):
+            elem = b''.join([
+                _pb_field(1, row['id']),
+                _pb_field(2, int(row['progress'] * 1000)),
+                _pb_field(3, 1),
+                _pb_field(4, 25),
+                _pb_field(5, 16777215),
+                _pb_field(6, row['mid_hash']),
+                _pb_field(7, row['content']),
+                _pb_field(8, row['ctime']),
+                _pb_field(9, 10),
+            ])
+            out += _pb_field(1, elem)
+        return bytes(out)
+
+
+def corpus_stats(danmaku_iter) -> Dict:
+    """
+    统计语料的分布特征，便于与真实缓存对比
+    """
+    from collections import Counter
+    counter = Counter(danmaku_iter)
+    total = sum(counter.values())
+    singletons = sum(1 for c in counter.values() if c == 1)
+    top = counter.most_common(10)
+    return {
+        'total': total,
+        'unique': len(counter),
+        'singleton_rate': singletons / len(counter) if counter else 0,
+        'top10_share': sum(c for _, c in top) / total if total else 0,
+        'ascii_rate': sum(c for t, c in counter.items() if any(ch.isascii() and ch.isalpha() for ch in t)) / total
+        if total else 0,
+        'top10': top,
+    }
+
+
+if __name__ == '__main__':
+    generator = DanmakuGenerator(seed=42)
+    sample = generator.generate(10000)
+    print(json.dumps(corpus_stats(sample), ensure_ascii=False, indent=2))
+    print(sample[:10])
+    print(len(generator.xml_response(1, 100)), '字节XML,', len(generator.protobuf_response(1, 100)), '字节protobuf')
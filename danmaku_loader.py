@@ -0,0 +1,206 @@
+"""
+弹幕缓存加载模块
+以内存映射方式打开 danmaku_cache.txt，并维护一个行偏移索引文件，
+支持惰性零拷贝遍历和按行号随机访问，大体积缓存也能即时打开
+"""
+import mmap
+import os
+import struct
+from array import array
+from typing import Iterable, Iterator, List, Optional, Union
+
+CACHE_FILENAME = 'danmaku_cache.txt'
+
+# 索引文件头: 魔数, 版本, 源文件大小, 源文件修改时间(ns), 行数
+_INDEX_MAGIC = b'DMIX'
+_INDEX_VERSION = 1
+_INDEX_HEADER = struct.Struct('<4sIQqQ')
+
+
+def find_cache_file(filename: str = CACHE_FILENAME) -> Optional[str]:
+    """
+    查找缓存文件：优先脚本所在目录，其次当前工作目录
+    """
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    for path in (os.path.join(script_dir, filename), filename):
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def save_cache(danmaku_list: Iterable[str], cache_file: str = CACHE_FILENAME):
+    """
+    逐条写入缓存文件（每行一条弹幕），并删除过期的行索引
+    """
+    with open(cache_file, 'w', encoding='utf-8') as f:
+        first = True
+        for text in danmaku_list:
+            if not first:
+                f.write('\n')
+            f.write(text)
+            first = False
+
+    index_file = cache_file + '.idx'
+    if os.path.exists(index_file):
+        os.remove(index_file)
+
+
+class DanmakuCache:
+    def __init__(self, cache_file: str = CACHE_FILENAME, index_file: Optional[str] = None):
+        self.cache_file = cache_file
+        self.index_file = index_file or cache_file + '.idx'
+        self._file = None
+        self._map = None
+        self._index_file = None
+        self._index_map = None
+        # 偏移数组视图: 第i条弹幕位于 [_offsets[2i], _offsets[2i+1])
+        self._offsets = memoryview(b'').cast('Q')
+        self._open()
+
+    def _open(self):
+        self._file = open(self.cache_file, 'rb')
+        stat = os.fstat(self._file.fileno())
+        if stat.st_size > 0:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if not self._load_index(stat):
+            self._build_index(stat)
+            self._load_index(stat)
+
+    def _load_index(self, stat) -> bool:
+        """
+        映射已有的索引文件；索引与缓存文件不匹配时返回False
+        """
+        if not os.path.exists(self.index_file):
+            return False
+
+        with open(self.index_file, 'rb') as f:
+            header = f.read(_INDEX_HEADER.size)
+        if len(header) < _INDEX_HEADER.size:
+            return False
+        magic, version, size, mtime_ns, count = _INDEX_HEADER.unpack(header)
+        if (magic != _INDEX_MAGIC or version != _INDEX_VERSION
+                or size != stat.st_size or mtime_ns != stat.st_mtime_ns):
+            return False
+
+        if count:
+            self._index_file = open(self.index_file, 'rb')
+            self._index_map = mmap.mmap(self._index_file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._offsets = memoryview(self._index_map)[_INDEX_HEADER.size:].cast('Q')
+            if len(self._offsets) != count * 2:
+                self._close_index()
+                return False
+        return True
+
+    def _build_index(self, stat):
+        """
+        扫描一遍缓存文件，记录每条非空弹幕的起止偏移
+        与原先 [line.strip() for line in f if line.strip()] 的取舍规则一致
+        """
+        print(f"正在为 {self.cache_file} 建立行索引...")
+        offsets = []
+        data = self._map
+        size = stat.st_size
+        start = 0
+        while start < size:
+            end = data.find(b'\n', start)
+            if end == -1:
+                end = size
+            raw = data[start:end]
+            stripped = raw.strip()
+            # 仅在含非ASCII字符时解码，以识别全角空格等Unicode空白
+            if stripped and (stripped.isascii() or stripped.decode('utf-8', errors='replace').strip()):
+                offsets.append(start)
+                offsets.append(end)
+            start = end + 1
+
+        body = array('Q', offsets)
+        tmp_file = self.index_file + '.tmp'
+        with open(tmp_file, 'wb') as f:
+            f.write(_INDEX_HEADER.pack(_INDEX_MAGIC, _INDEX_VERSION, stat.st_size,
+                                       stat.st_mtime_ns, len(offsets) // 2))
+            body.tofile(f)
+        os.replace(tmp_file, self.index_file)
+
+    def __len__(self) -> int:
+        return len(self._offsets) // 2
+
+    def line_bytes(self, index: int) -> memoryview:
+        """
+        返回第index条弹幕的原始UTF-8字节视图（零拷贝）
+        """
+        if index < 0:
+            index += len(self)
+        return memoryview(self._map)[self._offsets[2 * index]:self._offsets[2 * index + 1]]
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[str, List[str]]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if not -len(self) <= index < len(self):
+            raise IndexError('弹幕索引越界')
+        return str(self.line_bytes(index), 'utf-8').strip()
+
+    def iter_bytes(self) -> Iterator[memoryview]:
+        """
+        惰性遍历每条弹幕的原始字节视图
+        """
+        view = memoryview(self._map) if self._map is not None else None
+        offsets = self._offsets
+        for i in range(0, len(offsets), 2):
+            yield view[offsets[i]:offsets[i + 1]]
+
+    def __iter__(self) -> Iterator[str]:
+        """
+        惰性逐条解码弹幕
+        """
+        for raw in self.iter_bytes():
+            yield str(raw, 'utf-8').strip()
+
+    def _close_index(self):
+        self._offsets.release()
+        self._offsets = memoryview(b'').cast('Q')
+        if self._index_map is not None:
+            self._index_map.close()
+            self._index_map = None
+        if self._index_file is not None:
+            self._index_file.close()
+            self._index_file = None
+
+    def close(self):
+        """
+        释放内存映射（覆盖写入缓存文件前必须先关闭）
+        """
+        self._close_index()
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def load_cache(cache_file: Optional[str] = None) -> Optional[DanmakuCache]:
+    """
+    打开缓存文件，未找到时返回None
+    """
+    cache_file = cache_file or find_cache_file()
+    if not cache_file or not os.path.exists(cache_file):
+        return None
+    return DanmakuCache(cache_file)
+
+
+if __name__ == '__main__':
+    cache = load_cache()
+    if cache is None:
+        print(f"未找到缓存文件: {CACHE_FILENAME}")
+    else:
+        with cache:
+            print(f"{cache.cache_file}: {len(cache)} 条弹幕")
+            for i in range(min(5, len(cache))):
+                print(f"  [{i}] {cache[i]}")
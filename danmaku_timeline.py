@@ -0,0 +1,194 @@
+"""
+弹幕时间分布模块
+保存每条弹幕 p 属性中的视频内时间和发送时间戳（紧凑数值数组），
+并用NumPy一次性计算各视频的热点时段和按日期的情感趋势
+"""
+import json
+import struct
+from array import array
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List
+
+import numpy as np
+
+# B站时间戳按北京时间(UTC+8)划分日期
+_BEIJING_OFFSET = 8 * 3600
+_HEADER_SIZE = struct.Struct('<I')
+# timestamps 数组（uint32）可存放的最大时间戳
+_MAX_TIMESTAMP = 2 ** 32 - 1
+
+
+class DanmakuTimeline:
+    def __init__(self):
+        # 视频内出现时间（秒）
+        self.offsets = array('f')
+        # 发送时间（Unix时间戳，秒）
+        self.timestamps = array('I')
+        # 所属视频在 videos 中的下标
+        self.video_ids = array('I')
+        self.videos = []
+
+    def add_video(self, bvid: str) -> int:
+        """
+        登记一个视频，返回其下标
+        """
+        self.videos.append(bvid)
+        return len(self.videos) - 1
+
+    def append(self, offset: float, timestamp: int, video_id: int):
+        self.offsets.append(offset)
+        self.timestamps.append(timestamp)
+        self.video_ids.append(video_id)
+
+    def append_p(self, p: str, video_id: int):
+        """
+        解析弹幕的 p 属性: 视频内时间,模式,字号,颜色,发送时间戳,...
+        """
+        fields = p.split(',')
+        try:
+            offset = float(fields[0])
+            timestamp = int(fields[4])
+        except (IndexError, ValueError):
+            offset, timestamp = 0.0, 0
+        if not 0 <= timestamp <= _MAX_TIMESTAMP:
+            # 负数或超出uint32的时间戳无法存入数组，与无法解析的p属性一样记为0，保持与弹幕逐条对齐
+            timestamp = 0
+        self.append(offset, timestamp, video_id)
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def select(self, keep_mask: Iterable[int]) -> 'DanmakuTimeline':
+        """
+        按掩码保留对应的弹幕记录（与过滤后的弹幕列表保持对齐）
+        """
+        result = DanmakuTimeline()
+        result.videos = list(self.videos)
+        for i, keep in enumerate(keep_mask):
+            if keep:
+                result.append(self.offsets[i], self.timestamps[i], self.video_ids[i])
+        return result
+
+    def save(self, path: str):
+        """
+        保存为二进制文件：JSON头 + 三个原始数组
+        """
+        header = json.dumps({'version': 1, 'count': len(self), 'videos': self.videos}).encode('utf-8')
+        with open(path, 'wb') as f:
+            f.write(_HEADER_SIZE.pack(len(header)))
+            f.write(header)
+            self.offsets.tofile(f)
+            self.timestamps.tofile(f)
+            self.video_ids.tofile(f)
+
+    @classmethod
+    def load(cls, path: str) -> 'DanmakuTimeline':
+        timeline = cls()
+        with open(path, 'rb') as f:
+            (header_len,) = _HEADER_SIZE.unpack(f.read(_HEADER_SIZE.size))
+            header = json.loads(f.read(header_len).decode('utf-8'))
+            count = header['count']
+            timeline.videos = header['videos']
+            timeline.offsets.fromfile(f, count)
+            timeline.timestamps.fromfile(f, count)
+            timeline.video_ids.fromfile(f, count)
+        return timeline
+
+    def to_numpy(self) -> Dict[str, np.ndarray]:
+        """
+        零拷贝转换为NumPy数组
+        """
+        return {
+            'offsets': np.frombuffer(self.offsets, dtype=np.float32) if len(self) else np.zeros(0, np.float32),
+            'timestamps': np.frombuffer(self.timestamps, dtype=np.uint32) if len(self) else np.zeros(0, np.uint32),
+            'video_ids': np.frombuffer(self.video_ids, dtype=np.uint32) if len(self) else np.zeros(0, np.uint32),
+        }
+
+
+class TimelineAnalyzer:
+    def __init__(self, bucket_seconds: int = 30):
+        self.bucket_seconds = bucket_seconds
+
+    def hotspot_timelines(self, timeline: DanmakuTimeline, top_k: int = 3) -> List[Dict]:
+        """
+        计算每个视频按时间分桶的弹幕密度，返回各视频的热点时段（按弹幕数降序）
+        """
+        if not len(timeline):
+            return []
+        data = timeline.to_numpy()
+        # 异常的视频内时间（负数、NaN、极大值）归入第0个时间桶
+        offsets = data['offsets'].astype(np.float64)
+        offsets[~np.isfinite(offsets) | (offsets < 0)] = 0
+        buckets = (offsets // self.bucket_seconds).astype(np.int64)
+        video_ids = data['video_ids'].astype(np.int64)
+
+        # 只统计实际出现的 (视频, 时间桶) 组合，内存与弹幕数成正比，不受个别异常时间影响
+        num_buckets = int(buckets.max()) + 1
+        keys, counts = np.unique(video_ids * num_buckets + buckets, return_counts=True)
+        key_videos, key_buckets = keys // num_buckets, keys % num_buckets
+        totals = np.bincount(video_ids, minlength=len(timeline.videos))
+        # 各视频内按弹幕数降序（同数时时间靠前的优先）
+        order = np.lexsort((key_buckets, -counts, key_videos))
+        starts = np.searchsorted(key_videos[order], np.arange(len(timeline.videos)))
+
+        result = []
+        for vid in np.argsort(-totals, kind='stable'):
+            if totals[vid] == 0:
+                break
+            top = order[starts[vid]:starts[vid] + top_k]
+            hotspots = [(int(key_buckets[i]) * self.bucket_seconds, int(counts[i])) for i in top]
+            result.append({
+                'bvid': timeline.videos[vid],
+                'total': int(totals[vid]),
+                'hotspots': hotspots
+            })
+        return result
+
+    def daily_sentiment(self, timeline: DanmakuTimeline, labels: Iterable[int]) -> List[Dict]:
+        """
+        按发送日期统计情感分布，labels 为每条弹幕的情感标签（1积极/-1消极/0中性）
+        """
+        data = timeline.to_numpy()
+        labels = np.asarray(labels, dtype=np.int64)
+        valid = data['timestamps'] > 0
+        if not valid.any():
+            return []
+
+        # 换算为北京时间的日序号
+        days = (data['timestamps'][valid].astype(np.int64) + _BEIJING_OFFSET) // 86400
+        first_day = int(days.min())
+        num_days = int(days.max()) - first_day + 1
+        table = np.bincount((days - first_day) * 3 + (labels[valid] + 1),
+                            minlength=num_days * 3).reshape(num_days, 3)
+
+        result = []
+        for offset in np.nonzero(table.sum(axis=1))[0]:
+            negative, neutral, positive = (int(x) for x in table[offset])
+            date = datetime.fromtimestamp((first_day + int(offset)) * 86400, tz=timezone.utc)
+            result.append({
+                'date': date.strftime('%Y-%m-%d'),
+                'total': negative + neutral + positive,
+                'positive': positive,
+                'negative': negative,
+                'neutral': neutral
+            })
+        return result
+
+
+def format_offset(seconds: int) -> str:
+    """
+    将视频内秒数格式化为 mm:ss
+    """
+    return f"{seconds // 60:02d}:{seconds % 60:02d}"
+
+
+if __name__ == '__main__':
+    timeline = DanmakuTimeline()
+    vid = timeline.add_video('BV1xx411c7mD')
+    for i, p in enumerate(['12.5,1,25,16777215,1700000000,0,abc,1',
+                           '15.0,1,25,16777215,1700003600,0,abc,2',
+                           '95.3,1,25,16777215,1700090000,0,abc,3']):
+        timeline.append_p(p, vid)
+    analyzer = TimelineAnalyzer()
+    print(analyzer.hotspot_timelines(timeline))
+    print(analyzer.daily_sentiment(timeline, [1, -1, 0]))
@@ -3,9 +3,12 @@
 分析弹幕数据，生成结论
 """
 import re
+from array import array
 from collections import Counter
 from typing import Dict, List
 import jieba
+from danmaku_corpus import DanmakuCorpus, iter_weighted
+from danmaku_timeline import TimelineAnalyzer, format_offset
 
 
 class DataAnalyzer:
@@ -19,6 +22,28 @@ class DataAnalyzer:
         self.positive_keywords = ['好', '棒', '厉害', '强大', '优秀', '先进', '创新', 
                                  '进步', '革命', '改变', '未来', '希望']
         
+    def sentiment_label(self, text: str) -> int:
+        """
+        判断单条弹幕的情感倾向：1积极，-1消极，0中性
+        """
+        pos_score = sum(1 for kw in self.positive_keywords if kw in text)
+        neg_score = sum(1 for kw in self.negative_keywords if kw in text)
+        
+        if pos_score > neg_score:
+            return 1
+        elif neg_score > pos_score:
+            return -1
+        return 0
+    
+    def sentiment_labels(self, danmaku_list: List[str]) -> array:
+        """
+        逐条计算情感标签（与弹幕顺序对齐）
+        """
+        if isinstance(danmaku_list, DanmakuCorpus):
+            unique_labels = [self.sentiment_label(text) for text in danmaku_list.iter_unique_texts()]
+            return array('b', (unique_labels[uid] for uid in danmaku_list.ids()))
+        return array('b', (self.sentiment_label(text) for text in danmaku_list))
+    
     def analyze_sentiment(self, danmaku_list: List[str]) -> Dict:
         """
         分析情感倾向
@@ -27,16 +52,16 @@ class DataAnalyzer:
         negative_count = 0
         neutral_count = 0
         
-        for text in danmaku_list:
-            pos_score = sum(1 for kw in self.positive_keywords if kw in text)
-            neg_score = sum(1 for kw in self.negative_keywords if kw in text)
+        # 语料对象按不重复文本带权遍历，每个文本只判断一次
+        for text, weight in iter_weighted(danmaku_list):
+            label = self.sentiment_label(text)
             
-            if pos_score > neg_score:
-                positive_count += 1
-            elif neg_score > pos_score:
-                negative_count += 1
+            if label > 0:
+                positive_count += weight
+            elif label < 0:
+                negative_count += weight
             else:
-                neutral_count += 1
+                neutral_count += weight
         
         total = len(danmaku_list)
         return {
@@ -47,10 +72,23 @@ class DataAnalyzer:
             'negative_rate': negative_count / total if total > 0 else 0
         }
     
-    def analyze_cost_mentions(self, danmaku_list: List[str]) -> List[str]:
+    @staticmethod
+    def _index_for(danmaku_list: List[str], index):
+        """
+        只有与弹幕逐条对应的倒排索引才能替代全量扫描
+        """
+        if index is not None and len(index.corpus) == len(danmaku_list):
+            return index
+        return None
+
+    def analyze_cost_mentions(self, danmaku_list: List[str], index=None) -> List[str]:
         """
         提取与成本相关的弹幕
+        传入对应的 InvertedIndex 时由索引按原始顺序取前20条，不再扫描全部弹幕
         """
+        index = self._index_for(danmaku_list, index)
+        if index is not None:
+            return index.first_rows(self.cost_keywords, limit=20)
         cost_related = []
         for text in danmaku_list:
             if any(kw in text for kw in self.cost_keywords):
@@ -62,16 +100,20 @@ class DataAnalyzer:
         分析应用领域提及情况
         """
         application_count = {}
-        for text in danmaku_list:
+        for text, weight in iter_weighted(danmaku_list):
             for kw in self.application_keywords:
                 if kw in text:
-                    application_count[kw] = application_count.get(kw, 0) + 1
+                    application_count[kw] = application_count.get(kw, 0) + weight
         return dict(sorted(application_count.items(), key=lambda x: x[1], reverse=True)[:10])
     
-    def analyze_concerns(self, danmaku_list: List[str]) -> List[str]:
+    def analyze_concerns(self, danmaku_list: List[str], index=None) -> List[str]:
         """
         提取担忧和不利影响相关的弹幕
+        传入对应的 InvertedIndex 时由索引按原始顺序取前20条
         """
+        index = self._index_for(danmaku_list, index)
+        if index is not None:
+            return index.first_rows(self.negative_keywords, limit=20)
         concerns = []
         for text in danmaku_list:
             if any(kw in text for kw in self.negative_keywords):
@@ -83,23 +125,70 @@ class DataAnalyzer:
         提取关键话题
         """
         # 使用jieba分词和词频统计
-        all_words = []
+        counter = Counter()
         important_words = ['模型', 'AI', '人工智能', '技术', '发展', '未来', 
                           '应用', '能力', '效果', '使用', '体验']
         
-        for text in danmaku_list:
+        for text, weight in iter_weighted(danmaku_list):
             words = jieba.cut(text)
             for word in words:
                 word = word.strip()
                 if len(word) > 1 and word in important_words:
-                    all_words.append(word)
+                    counter[word] += weight
         
-        counter = Counter(all_words)
         return [word for word, count in counter.most_common(10)]
     
-    def generate_conclusion(self, danmaku_list: List[str], stats: Dict) -> str:
+    def analyze_timeline(self, danmaku_list: List[str], timeline) -> Dict:
+        """
+        基于弹幕时间信息，计算各视频的热点时段和按日期的情感趋势
+        """
+        timeline_analyzer = TimelineAnalyzer(bucket_seconds=30)
+        return {
+            'bucket_seconds': timeline_analyzer.bucket_seconds,
+            'hotspots': timeline_analyzer.hotspot_timelines(timeline, top_k=3),
+            'daily': timeline_analyzer.daily_sentiment(timeline, self.sentiment_labels(danmaku_list))
+        }
+    
+    def _format_timeline_section(self, timeline_result: Dict) -> str:
+        """
+        生成时间分布分析的报告文本
+        """
+        bucket = timeline_result['bucket_seconds']
+        section = f"""
+七、时间分布分析
+---------------
+弹幕最密集的视频及其热点时段（按{bucket}秒分段）：
+"""
+        for i, video in enumerate(timeline_result['hotspots'][:5], 1):
+            spots = '，'.join(
+                f"{format_offset(start)}-{format_offset(start + bucket)}（{count}条）"
+                for start, count in video['hotspots']
+            )
+            section += f"  {i}. {video['bvid']}（共{video['total']}条）: {spots}\n"
+        
+        daily = timeline_result['daily']
+        if daily:
+            # 展示弹幕最多的10天，按日期排序
+            busiest = sorted(sorted(daily, key=lambda d: d['total'], reverse=True)[:10],
+                             key=lambda d: d['date'])
+            section += "\n按发送日期的情感趋势（弹幕最多的10天）：\n"
+            for day in busiest:
+                section += (f"  {day['date']}: {day['total']} 条，"
+                            f"积极 {day['positive']/day['total']*100:.1f}%，"
+                            f"消极 {day['negative']/day['total']*100:.1f}%\n")
+            
+            # 消极比例最高的一天（至少20条弹幕才有参考意义）
+            candidates = [d for d in daily if d['total'] >= 20]
+            if candidates:
+                peak = max(candidates, key=lambda d: d['negative'] / d['total'])
+                section += (f"\n消极情绪峰值出现在 {peak['date']}，"
+                            f"当日消极弹幕占比 {peak['negative']/peak['total']*100:.1f}%\n")
+        return section
+    
+    def generate_conclusion(self, danmaku_list: List[str], stats: Dict, index=None) -> str:
         """
         生成分析结论
+        index: 可选的 InvertedIndex（与 danmaku_list 对应），用于提取成本和担忧相关的示例弹幕
         """
         print("\n正在进行数据分析...")
         
@@ -110,14 +199,20 @@ class DataAnalyzer:
         applications = self.analyze_application_mentions(danmaku_list)
         
         # 成本相关分析
-        cost_mentions = self.analyze_cost_mentions(danmaku_list)
+        cost_mentions = self.analyze_cost_mentions(danmaku_list, index)
         
         # 担忧分析
-        concerns = self.analyze_concerns(danmaku_list)
+        concerns = self.analyze_concerns(danmaku_list, index)
         
         # 关键话题
         topics = self.extract_key_topics(danmaku_list)
         
+        # 时间分布（需要与弹幕逐条对齐的时间信息）
+        timeline = stats.get('timeline')
+        timeline_result = None
+        if timeline is not None and len(timeline) == len(danmaku_list):
+            timeline_result = self.analyze_timeline(danmaku_list, timeline)
+        
         # 生成结论文本
         conclusion = f"""
 {'='*80}
@@ -179,8 +274,11 @@ B站用户对大语言模型技术的主流看法分析报告
         for i, topic in enumerate(topics[:8], 1):
             conclusion += f"  {i}. {topic}\n"
         
+        if timeline_result is not None:
+            conclusion += self._format_timeline_section(timeline_result)
+        
         conclusion += f"""
-七、主要结论
+{'八' if timeline_result is not None else '七'}、主要结论
 -----------
 1. 用户关注度: 大语言模型技术在B站用户中引起了广泛关注
 2. 态度倾向: {'用户整体态度积极，看好技术发展前景' if sentiment['positive_rate'] > 0.5 else '用户态度较为复杂，既有期待也有担忧'}
@@ -4,11 +4,18 @@
 """
 import re
 from collections import Counter
+from array import array
 from typing import List, Dict
+from danmaku_cluster import MinHashLSHClusterer
+from danmaku_corpus import DanmakuCorpus
+from external_counter import ExternalCounter
 
 
 class DanmakuProcessor:
-    def __init__(self):
+    def __init__(self, memory_budget: int = None):
+        # 频次统计的内存预算（字节）；设置后对普通弹幕序列使用外存计数，超出预算的部分溢写到磁盘
+        self.memory_budget = memory_budget
+        
         # 定义噪声关键词（点赞、666等）
         self.noise_patterns = [
             r'^6+$',  # 纯6
@@ -22,6 +29,9 @@ class DanmakuProcessor:
         # 关键词相关词汇
         self.keywords = ['大语言模型', '大模型', 'LLM', 'GPT', 'ChatGPT', 
                         '语言模型', 'AI模型', '人工智能模型']
+        
+        # 近似重复聚类器（'哈哈哈哈'与'哈哈哈哈哈'归为同一簇）
+        self.clusterer = MinHashLSHClusterer()
     
     def is_noise(self, text: str) -> bool:
         """
@@ -48,15 +58,20 @@ class DanmakuProcessor:
     def filter_danmaku(self, danmaku_list: List[str]) -> List[str]:
         """
         过滤噪声弹幕
+        传入 DanmakuCorpus 时每个不重复文本只判断一次，返回过滤后的语料
         """
-        filtered = []
-        noise_count = 0
-        
-        for danmaku in danmaku_list:
-            if not self.is_noise(danmaku):
-                filtered.append(danmaku)
-            else:
-                noise_count += 1
+        if isinstance(danmaku_list, DanmakuCorpus):
+            filtered = danmaku_list.filter(lambda text: not self.is_noise(text))
+            noise_count = len(danmaku_list) - len(filtered)
+        else:
+            filtered = []
+            noise_count = 0
+            
+            for danmaku in danmaku_list:
+                if not self.is_noise(danmaku):
+                    filtered.append(danmaku)
+                else:
+                    noise_count += 1
                 
         print(f"过滤前: {len(danmaku_list)} 条弹幕")
         print(f"过滤后: {len(filtered)} 条弹幕")
@@ -64,11 +79,37 @@ class DanmakuProcessor:
         
         return filtered
     
+    def keep_mask(self, danmaku_list: List[str]) -> array:
+        """
+        逐条给出是否保留（非噪声）的掩码，用于对齐弹幕的时间信息
+        """
+        if isinstance(danmaku_list, DanmakuCorpus):
+            keep_unique = [not self.is_noise(text) for text in danmaku_list.iter_unique_texts()]
+            return array('b', (keep_unique[uid] for uid in danmaku_list.ids()))
+        return array('b', (not self.is_noise(text) for text in danmaku_list))
+    
+    def frequency_counter(self, danmaku_list: List[str]) -> Counter:
+        """
+        完整的弹幕频次表（弹幕文本 -> 出现次数）
+        设置了 memory_budget 时返回 ExternalCounter（支持 most_common/items/len），可处理超出内存的弹幕流；
+        DanmakuCorpus 按 (不重复文本, 次数) 累加，同样受预算约束
+        """
+        if self.memory_budget:
+            counter = ExternalCounter(self.memory_budget)
+            if isinstance(danmaku_list, DanmakuCorpus):
+                counter.update_weighted(danmaku_list.iter_unique())
+            else:
+                counter.update(danmaku_list)
+            return counter.finalize()
+        if isinstance(danmaku_list, DanmakuCorpus):
+            return Counter(dict(danmaku_list.iter_unique()))
+        return Counter(danmaku_list)
+    
     def count_word_frequency(self, danmaku_list: List[str], top_n: int = 8) -> List[Dict]:
         """
         统计词频，返回排名前N的弹幕
         """
-        counter = Counter(danmaku_list)
+        counter = self.frequency_counter(danmaku_list)
         top_items = counter.most_common(top_n)
         
         result = []
@@ -81,19 +122,33 @@ class DanmakuProcessor:
             
         return result
     
-    def get_all_stats(self, danmaku_list: List[str]) -> Dict:
+    def count_cluster_frequency(self, danmaku_list: List[str], top_n: int = 8) -> List[Dict]:
+        """
+        按近似重复簇统计词频，返回排名前N的簇及其代表弹幕
+        """
+        return self.clusterer.count_cluster_frequency(danmaku_list, top_n)
+    
+    def get_all_stats(self, danmaku_list: List[str], timeline=None, cluster: bool = False) -> Dict:
         """
         获取所有统计数据
+        传入与弹幕逐条对齐的 DanmakuTimeline 时，一并过滤并放入 stats['timeline']
+        cluster=True 时额外做近似重复聚类（纯Python的MinHash/LSH，耗时随不重复文本数增长），
+        结果放入 stats['top_8_clusters']
         """
         filtered = self.filter_danmaku(danmaku_list)
         top_8 = self.count_word_frequency(filtered, top_n=8)
         
-        return {
+        stats = {
             'total_count': len(filtered),
             'original_count': len(danmaku_list),
             'top_8_danmaku': top_8,
             'all_danmaku': filtered
         }
+        if cluster:
+            stats['top_8_clusters'] = self.count_cluster_frequency(filtered, top_n=8)
+        if timeline is not None and len(timeline) == len(danmaku_list):
+            stats['timeline'] = timeline.select(self.keep_mask(danmaku_list))
+        return stats
 
 
 if __name__ == '__main__':
@@ -0,0 +1,185 @@
+"""
+数据过滤和关键词统计模块（向量化批处理版）
+将弹幕载入pandas字符串列，用向量化字符串操作一次性计算
+噪声掩码、长度和关键词命中标记，结果与逐条循环版本保持一致
+"""
+import re
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from danmaku_cluster import cluster_rows
+from data_processor import DanmakuProcessor
+from data_analyzer import DataAnalyzer
+
+# 优先使用Arrow字符串列（可选依赖）
+try:
+    import pyarrow  # type: ignore  # noqa: F401
+    STRING_DTYPE = 'string[pyarrow]'
+except ImportError:
+    STRING_DTYPE = 'string'
+
+
+class DanmakuBatchProcessor:
+    def __init__(self):
+        # 复用逐条版本的规则定义，保证两条路径结果一致
+        processor = DanmakuProcessor()
+        analyzer = DataAnalyzer()
+        self.keywords = processor.keywords
+        self.clusterer = processor.clusterer
+        self.cost_keywords = analyzer.cost_keywords
+        self.application_keywords = analyzer.application_keywords
+        self.negative_keywords = analyzer.negative_keywords
+        self.positive_keywords = analyzer.positive_keywords
+
+        # is_noise 逐个 re.match 噪声模式，等价于对各模式的分支做一次 match
+        self.noise_regex = '|'.join(f'(?:{p})' for p in processor.noise_patterns)
+
+    @staticmethod
+    def to_series(danmaku_list: List[str]) -> pd.Series:
+        """
+        将弹幕列表载入字符串列
+        """
+        return pd.Series(danmaku_list, dtype=STRING_DTYPE)
+
+    def keyword_flags(self, series: pd.Series, keywords: List[str]) -> pd.DataFrame:
+        """
+        计算每条弹幕对每个关键词的命中标记（行: 弹幕, 列: 关键词）
+        """
+        return pd.DataFrame({
+            kw: series.str.contains(kw, regex=False).to_numpy(dtype=bool)
+            for kw in keywords
+        })
+
+    def noise_mask(self, series: pd.Series) -> np.ndarray:
+        """
+        计算噪声掩码，与 DanmakuProcessor.is_noise 逐条判断的结果一致
+        """
+        raw_length = series.str.len().to_numpy()
+        stripped = series.str.strip()
+        length = stripped.str.len().to_numpy()
+
+        # Arrow列的正则由RE2执行：不支持\u转义，\d/\s也只匹配ASCII，与 re.match 的结果不同，
+        # 因此噪声模式在Python字符串列上用 re 匹配；其余操作仍在原字符串列上向量化执行
+        pattern_hit = stripped.astype('string[python]').str.match(
+            self.noise_regex, flags=re.IGNORECASE).to_numpy(dtype=bool)
+        has_keyword = self.keyword_flags(stripped, self.keywords).to_numpy().any(axis=1)
+
+        return (raw_length < 2) | (length == 0) | pattern_hit | ((length < 3) & ~has_keyword)
+
+    def filter_danmaku(self, danmaku_list: List[str]) -> List[str]:
+        """
+        过滤噪声弹幕（向量化版）
+        """
+        series = self.to_series(danmaku_list)
+        mask = self.noise_mask(series)
+        filtered = series[~mask].tolist()
+        noise_count = int(mask.sum())
+
+        print(f"过滤前: {len(danmaku_list)} 条弹幕")
+        print(f"过滤后: {len(filtered)} 条弹幕")
+        print(f"过滤噪声: {noise_count} 条")
+
+        return filtered
+
+    def _value_counts(self, danmaku_list: List[str]) -> pd.Series:
+        """
+        精确计数，按首次出现顺序排列（与Counter的插入顺序一致）
+        """
+        return self.to_series(danmaku_list).value_counts(sort=False)
+
+    def count_word_frequency(self, danmaku_list: List[str], top_n: int = 8) -> List[Dict]:
+        """
+        统计词频，返回排名前N的弹幕（同频次按首次出现顺序，与Counter一致）
+        """
+        counts = self._value_counts(danmaku_list)
+        counts = counts.sort_values(ascending=False, kind='stable').head(top_n)
+
+        return [
+            {
+                'rank': i,
+                'danmaku': text,
+                'count': int(count)
+            }
+            for i, (text, count) in enumerate(counts.items(), 1)
+        ]
+
+    def get_all_stats(self, danmaku_list: List[str], cluster: bool = False) -> Dict:
+        """
+        获取所有统计数据（cluster=True 时额外做近似重复聚类）
+        """
+        filtered = self.filter_danmaku(danmaku_list)
+        top_8 = self.count_word_frequency(filtered, top_n=8)
+
+        stats = {
+            'total_count': len(filtered),
+            'original_count': len(danmaku_list),
+            'top_8_danmaku': top_8,
+            'all_danmaku': filtered
+        }
+        if cluster:
+            clusters = self.clusterer.cluster(
+                (text, int(count)) for text, count in self._value_counts(filtered).items()
+            )
+            stats['top_8_clusters'] = cluster_rows(clusters, 8)
+        return stats
+
+    def analyze_sentiment(self, danmaku_list: List[str]) -> Dict:
+        """
+        分析情感倾向（向量化版，与 DataAnalyzer.analyze_sentiment 一致）
+        """
+        series = self.to_series(danmaku_list)
+        pos_score = self.keyword_flags(series, self.positive_keywords).to_numpy().sum(axis=1)
+        neg_score = self.keyword_flags(series, self.negative_keywords).to_numpy().sum(axis=1)
+
+        positive_count = int((pos_score > neg_score).sum())
+        negative_count = int((neg_score > pos_score).sum())
+        total = len(danmaku_list)
+        return {
+            'positive': positive_count,
+            'negative': negative_count,
+            'neutral': total - positive_count - negative_count,
+            'positive_rate': positive_count / total if total > 0 else 0,
+            'negative_rate': negative_count / total if total > 0 else 0
+        }
+
+    def analyze_application_mentions(self, danmaku_list: List[str]) -> Dict:
+        """
+        分析应用领域提及情况（向量化版）
+        """
+        if not danmaku_list:
+            return {}
+        flags = self.keyword_flags(self.to_series(danmaku_list), self.application_keywords)
+        counts = flags.sum(axis=0)
+        # 逐条版本的字典按关键词首次出现的位置插入，排序稳定，这里同样以首次出现位置打破平局
+        first_seen = flags.to_numpy().argmax(axis=0)
+        ranked = sorted(
+            ((kw, int(counts[kw]), int(pos)) for kw, pos in zip(flags.columns, first_seen) if counts[kw] > 0),
+            key=lambda x: (-x[1], x[2])
+        )
+        return {kw: count for kw, count, _ in ranked[:10]}
+
+    def _mentions(self, danmaku_list: List[str], keywords: List[str], limit: int = 20) -> List[str]:
+        series = self.to_series(danmaku_list)
+        mask = self.keyword_flags(series, keywords).to_numpy().any(axis=1)
+        return series[mask].head(limit).tolist()
+
+    def analyze_cost_mentions(self, danmaku_list: List[str]) -> List[str]:
+        """
+        提取与成本相关的弹幕（向量化版）
+        """
+        return self._mentions(danmaku_list, self.cost_keywords)
+
+    def analyze_concerns(self, danmaku_list: List[str]) -> List[str]:
+        """
+        提取担忧和不利影响相关的弹幕（向量化版）
+        """
+        return self._mentions(danmaku_list, self.negative_keywords)
+
+
+if __name__ == '__main__':
+    processor = DanmakuBatchProcessor()
+    test_data = ['666', '大模型真厉害', '6', '点赞', '这个模型不错', '666666']
+    stats = processor.get_all_stats(test_data)
+    print(stats)
@@ -9,6 +9,7 @@
 import re
 from collections import Counter
 from typing import List, Dict
+from danmaku_cluster import MinHashLSHClusterer
 
 
 class DanmakuProcessorOptimized:
@@ -29,6 +30,9 @@ class DanmakuProcessorOptimized:
         # 使用集合进行关键词查找（性能优化2）
         self.keywords = {'大语言模型', '大模型', 'LLM', 'GPT', 'ChatGPT', 
                         '语言模型', 'AI模型', '人工智能模型'}
+        
+        # 近似重复聚类器（'哈哈哈哈'与'哈哈哈哈哈'归为同一簇）
+        self.clusterer = MinHashLSHClusterer()
     
     def is_noise(self, text: str) -> bool:
         """
@@ -86,19 +90,28 @@ class DanmakuProcessorOptimized:
             
         return result
     
-    def get_all_stats(self, danmaku_list: List[str]) -> Dict:
+    def count_cluster_frequency(self, danmaku_list: List[str], top_n: int = 8) -> List[Dict]:
+        """
+        按近似重复簇统计词频，返回排名前N的簇及其代表弹幕
+        """
+        return self.clusterer.count_cluster_frequency(danmaku_list, top_n)
+    
+    def get_all_stats(self, danmaku_list: List[str], cluster: bool = False) -> Dict:
         """
-        获取所有统计数据
+        获取所有统计数据（cluster=True 时额外做近似重复聚类）
         """
         filtered = self.filter_danmaku(danmaku_list)
         top_8 = self.count_word_frequency(filtered, top_n=8)
         
-        return {
+        stats = {
             'total_count': len(filtered),
             'original_count': len(danmaku_list),
             'top_8_danmaku': top_8,
             'all_danmaku': filtered
         }
+        if cluster:
+            stats['top_8_clusters'] = self.count_cluster_frequency(filtered, top_n=8)
+        return stats
 
 
 if __name__ == '__main__':
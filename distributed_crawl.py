@@ -0,0 +1,91 @@
+"""
+分布式爬取命令行
+协调者搜索并入队视频，各机器上的工作节点共享同一队列领取任务，
+全部完成后由协调者汇总成 danmaku_cache.txt 和 danmaku_timeline.bin（与main.py的缓存格式一致）
+
+用法:
+    python distributed_crawl.py enqueue --queue sqlite:crawl_queue.db
+    python distributed_crawl.py worker  --queue sqlite:crawl_queue.db      # 可在多个终端/机器上同时运行
+    python distributed_crawl.py collect --queue sqlite:crawl_queue.db
+    python distributed_crawl.py status  --queue redis://10.0.0.5:6379/0
+"""
+import argparse
+import os
+import sys
+
+from crawl_queue import open_queue
+from crawl_scheduler import CrawlBudget
+from danmaku_loader import CACHE_FILENAME, save_cache
+
+DEFAULT_KEYWORDS = ['大语言模型', '大模型', 'LLM']
+TIMELINE_FILENAME = 'danmaku_timeline.bin'
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='B站弹幕分布式爬取')
+    parser.add_argument('command', choices=['enqueue', 'worker', 'collect', 'status'])
+    parser.add_argument('--queue', default='sqlite:crawl_queue.db',
+                        help='队列: sqlite:路径 或 redis://host:port/db（默认 sqlite:crawl_queue.db）')
+    parser.add_argument('--keywords', nargs='+', default=DEFAULT_KEYWORDS, help='搜索关键词（enqueue）')
+    parser.add_argument('--max-videos', type=int, default=300, help='每个关键词的最大视频数（enqueue）')
+    parser.add_argument('--threads', type=int, default=1, help='本节点的工作线程数（worker）')
+    parser.add_argument('--worker-id', default=None, help='工作节点标识（worker，默认 主机名-进程号）')
+    parser.add_argument('--metrics-file', default=None, help='写出Prometheus指标的文件（worker）')
+    parser.add_argument('--max-requests', type=int, default=None,
+                        help='本节点的请求数预算，用尽后停止领取（worker，视频按预期弹幕产出从高到低领取）')
+    parser.add_argument('--time-budget', type=float, default=None, help='本节点的时间预算（秒）（worker）')
+    parser.add_argument('--output', default=CACHE_FILENAME, help='汇总输出的缓存文件（collect）')
+    args = parser.parse_args(argv)
+
+    queue = open_queue(args.queue)
+    try:
+        if args.command == 'status':
+            print(queue.stats())
+            return 0
+
+        if args.command == 'collect':
+            stats = queue.stats()
+            if not queue.enqueue_done() or stats['claimed']:
+                print(f"队列尚未完成: {stats}")
+                return 1
+            if stats['pending']:
+                # 工作节点因预算提前停止，剩余的是预期产出最低的视频
+                print(f"{stats['pending']} 个视频未爬取，只汇总已完成部分")
+            from danmaku_crawler import collect_results
+            all_danmaku, timeline = collect_results(queue)
+            save_cache(all_danmaku, args.output)
+            # 与主程序一致，时间信息放在弹幕缓存所在目录
+            timeline_file = os.path.join(os.path.dirname(args.output) or '.', TIMELINE_FILENAME)
+            timeline.save(timeline_file)
+            print(f"已汇总 {len(all_danmaku)} 条弹幕到 {args.output}，时间信息保存到 {timeline_file}")
+            return 0
+
+        from danmaku_crawler import BilibiliDanmakuCrawler
+        crawler = BilibiliDanmakuCrawler(metrics_file=args.metrics_file)
+        if args.command == 'enqueue':
+            added = crawler.enqueue_videos(args.keywords, queue, args.max_videos)
+            print(f"共入队 {added} 个视频: {queue.stats()}")
+            return 0
+
+        budget = None
+        if args.max_requests is not None or args.time_budget is not None:
+            budget = CrawlBudget(args.max_requests, args.time_budget, crawler.requests_sent)
+        if args.threads > 1:
+            import threading
+            worker_id = args.worker_id or 'worker'
+            threads = [threading.Thread(target=crawler.run_worker, args=(queue, f"{worker_id}-{i}", 1.0, budget))
+                       for i in range(args.threads)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        else:
+            crawler.run_worker(queue, args.worker_id, budget=budget)
+        print(crawler.metrics_summary())
+        return 0
+    finally:
+        queue.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
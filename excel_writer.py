@@ -1,13 +1,20 @@
 """
 Excel数据导出模块
 将统计数据写入Excel文件
+write_full_statistics 以openpyxl只写（流式）模式逐行写出完整频次表、
+分关键词和分视频统计，不经过DataFrame，内存占用与行数无关
 """
 import pandas as pd
-from openpyxl import load_workbook
-from openpyxl.styles import Font, Alignment, PatternFill
-from typing import Dict, List
+from collections import Counter
+from openpyxl import Workbook, load_workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, Alignment, NamedStyle, PatternFill
+from typing import Dict, Iterable, List, Sequence, Tuple
 import os
 
+# Excel单个工作表的最大行数，超出部分写入续表
+MAX_SHEET_ROWS = 1048576
+
 
 class ExcelWriter:
     def __init__(self, filename: str = 'danmaku_statistics.xlsx'):
@@ -67,7 +74,185 @@ class ExcelWriter:
             worksheet[f'A{summary_row}'].font = Font(bold=True)
             worksheet[f'B{summary_row}'].font = Font(bold=True)
             worksheet[f'C{summary_row}'].font = Font(bold=True)
-        
+
+            # 近似重复弹幕聚类结果
+            if stats.get('top_8_clusters'):
+                self._write_cluster_sheet(writer, stats['top_8_clusters'], header_fill, header_font)
+
+        print(f"统计数据已保存到: {self.filename}")
+
+    def _write_cluster_sheet(self, writer, clusters: List[Dict], header_fill, header_font):
+        """
+        将近似重复聚类的排名写入单独的工作表
+        """
+        data = {
+            '排名': [c['rank'] for c in clusters],
+            '代表弹幕': [c['danmaku'] for c in clusters],
+            '簇内总次数': [c['count'] for c in clusters],
+            '变体数': [c['variant_count'] for c in clusters],
+            '变体示例': [' / '.join(c['variants']) for c in clusters]
+        }
+        pd.DataFrame(data).to_excel(writer, sheet_name='近似弹幕聚类', index=False)
+
+        worksheet = writer.sheets['近似弹幕聚类']
+        for column, width in zip('ABCDE', (10, 40, 15, 10, 80)):
+            worksheet.column_dimensions[column].width = width
+
+        for cell in worksheet[1]:
+            cell.fill = header_fill
+            cell.font = header_font
+            cell.alignment = Alignment(horizontal='center', vertical='center')
+
+        for row in worksheet.iter_rows(min_row=2, max_row=worksheet.max_row):
+            row[0].alignment = Alignment(horizontal='center')
+            row[1].alignment = Alignment(horizontal='left', wrap_text=True)
+            row[2].alignment = Alignment(horizontal='center')
+            row[3].alignment = Alignment(horizontal='center')
+            row[4].alignment = Alignment(horizontal='left', wrap_text=True)
+
+    @staticmethod
+    def _named_styles() -> List[NamedStyle]:
+        """
+        预先定义的命名样式：每个单元格只引用样式名，不再逐个创建Font/Alignment对象
+        """
+        header = NamedStyle(name='dm_header')
+        header.fill = PatternFill(start_color='4472C4', end_color='4472C4', fill_type='solid')
+        header.font = Font(bold=True, color='FFFFFF', size=12)
+        header.alignment = Alignment(horizontal='center', vertical='center')
+
+        center = NamedStyle(name='dm_center')
+        center.alignment = Alignment(horizontal='center')
+
+        text = NamedStyle(name='dm_text')
+        text.alignment = Alignment(horizontal='left', wrap_text=True)
+        return [header, center, text]
+
+    def _styled_row(self, worksheet, values: Sequence, styles: Sequence[str]) -> List:
+        """
+        只有指定了样式的列才包装成WriteOnlyCell，其余直接写值（逐格设置样式的开销约为写值的两倍）
+        """
+        if not any(styles):
+            return list(values)
+        row = []
+        for value, style in zip(values, styles):
+            if style:
+                cell = WriteOnlyCell(worksheet, value=value)
+                cell.style = style
+                row.append(cell)
+            else:
+                row.append(value)
+        return row
+
+    def _write_stream_sheet(self, workbook, title: str, columns: Sequence[Tuple[str, float, str]],
+                            rows: Iterable[Sequence]) -> int:
+        """
+        流式写出一个工作表，columns 为 (列名, 列宽, 命名样式)，样式为None的列只写值；
+        超过Excel行数上限时自动续写到 "标题(2)"、"标题(3)"...，返回写出的数据行数
+        """
+        styles = [style for _, _, style in columns]
+        written = 0
+        part = 0
+        worksheet = None
+        for values in rows:
+            if worksheet is None or sheet_rows >= MAX_SHEET_ROWS:
+                part += 1
+                worksheet = workbook.create_sheet(title if part == 1 else f"{title}({part})")
+                # 只写模式下列宽和冻结窗格必须在写入第一行之前设置
+                for index, (_, width, _) in enumerate(columns):
+                    worksheet.column_dimensions[chr(ord('A') + index)].width = width
+                worksheet.freeze_panes = 'A2'
+                worksheet.append(self._styled_row(worksheet, [name for name, _, _ in columns],
+                                                  ['dm_header'] * len(columns)))
+                sheet_rows = 1
+            worksheet.append(self._styled_row(worksheet, values, styles))
+            sheet_rows += 1
+            written += 1
+        if worksheet is None:
+            # 没有数据时也保留只有表头的工作表
+            worksheet = workbook.create_sheet(title)
+            worksheet.append(self._styled_row(worksheet, [name for name, _, _ in columns],
+                                              ['dm_header'] * len(columns)))
+        return written
+
+    @staticmethod
+    def _frequency_rows(counter: Counter, total: int) -> Iterable[Tuple]:
+        for rank, (text, count) in enumerate(counter.most_common(), 1):
+            yield rank, text, count, round(count / total * 100, 4) if total else 0.0
+
+    @staticmethod
+    def _keyword_rows(counter: Counter, keywords: Sequence[str]) -> Iterable[Tuple]:
+        for keyword in keywords:
+            matched = sorted(((text, count) for text, count in counter.items() if keyword in text),
+                             key=lambda item: item[1], reverse=True)
+            for text, count in matched:
+                yield keyword, text, count
+
+    @staticmethod
+    def _video_rows(danmaku_list: Iterable[str], timeline) -> Iterable[Tuple]:
+        """
+        按视频汇总每条弹幕的出现次数（timeline 与 danmaku_list 逐条对齐）
+        """
+        per_video = {}
+        for text, video_id in zip(danmaku_list, timeline.video_ids):
+            counter = per_video.get(video_id)
+            if counter is None:
+                counter = per_video[video_id] = Counter()
+            counter[text] += 1
+        for video_id in sorted(per_video, key=lambda vid: -sum(per_video[vid].values())):
+            bvid = timeline.videos[video_id]
+            for text, count in per_video.pop(video_id).most_common():
+                yield bvid, text, count
+
+    def write_full_statistics(self, stats: Dict, frequencies: Counter = None,
+                              keywords: Sequence[str] = None, timeline=None):
+        """
+        流式导出：排名前N、近似聚类、完整频次表、分关键词、分视频五类工作表
+        frequencies 为完整的 弹幕->次数 计数（DanmakuProcessor.frequency_counter）；
+        timeline 为与 stats['all_danmaku'] 逐条对齐的时间信息（默认取 stats['timeline']）
+        """
+        workbook = Workbook(write_only=True)
+        for style in self._named_styles():
+            workbook.add_named_style(style)
+
+        self._write_stream_sheet(
+            workbook, '弹幕统计', [('排名', 10, 'dm_center'), ('弹幕内容', 60, 'dm_text'), ('出现次数', 15, 'dm_center')],
+            [(item['rank'], item['danmaku'], item['count']) for item in stats['top_8_danmaku']] + [
+                (None, None, None),
+                ('总计', f"有效弹幕总数: {stats['total_count']}", f"原始弹幕数: {stats['original_count']}")
+            ])
+
+        if stats.get('top_8_clusters'):
+            self._write_stream_sheet(
+                workbook, '近似弹幕聚类',
+                [('排名', 10, 'dm_center'), ('代表弹幕', 40, 'dm_text'), ('簇内总次数', 15, 'dm_center'),
+                 ('变体数', 10, 'dm_center'), ('变体示例', 80, 'dm_text')],
+                ((c['rank'], c['danmaku'], c['count'], c['variant_count'], ' / '.join(c['variants']))
+                 for c in stats['top_8_clusters']))
+
+        # 以下工作表可能有数十万行，数据行不设单元格样式，只保留表头样式和列宽
+        if frequencies is not None:
+            rows = self._write_stream_sheet(
+                workbook, '完整词频',
+                [('排名', 10, None), ('弹幕内容', 60, None), ('出现次数', 15, None), ('占比(%)', 12, None)],
+                self._frequency_rows(frequencies, stats['total_count']))
+            print(f"完整词频: {rows} 行")
+
+            if keywords:
+                rows = self._write_stream_sheet(
+                    workbook, '分关键词统计',
+                    [('关键词', 16, None), ('弹幕内容', 60, None), ('出现次数', 15, None)],
+                    self._keyword_rows(frequencies, keywords))
+                print(f"分关键词统计: {rows} 行")
+
+        timeline = timeline if timeline is not None else stats.get('timeline')
+        if timeline is not None and len(timeline) == len(stats['all_danmaku']):
+            rows = self._write_stream_sheet(
+                workbook, '分视频统计',
+                [('视频BV号', 18, None), ('弹幕内容', 60, None), ('出现次数', 15, None)],
+                self._video_rows(stats['all_danmaku'], timeline))
+            print(f"分视频统计: {rows} 行")
+
+        workbook.save(self.filename)
         print(f"统计数据已保存到: {self.filename}")
 
 
@@ -0,0 +1,281 @@
+"""
+外存计数模块
+在给定内存预算内精确统计任意规模弹幕/分词结果的频次：内存中的部分计数超出预算时，
+按键的哈希分区追加写入临时文件；全部写入后逐个分区合并为按次数降序的有序段，
+再多路归并得到精确的前N名和完整频次表。内存占用只取决于预算，与不重复文本的数量无关
+
+用法:
+    python external_counter.py --cache-file danmaku_cache.txt --memory-mb 64 --top 20
+    python external_counter.py --words --memory-mb 64 --output word_freq.tsv
+"""
+import argparse
+import heapq
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import weakref
+import zlib
+from itertools import islice
+from operator import itemgetter
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+DEFAULT_MEMORY_BUDGET = 256 * 1024 * 1024
+# 每个分区文件另占64KB读写缓冲，不计入内存预算
+DEFAULT_PARTITIONS = 64
+# 记录: 键的UTF-8字节数, 次数，后接键本身
+_RECORD = struct.Struct('<IQ')
+# 每个不重复键在dict中的大致额外开销（哈希表槽位、计数int对象）
+_ENTRY_OVERHEAD = 100
+# 分区合并后仍超出预算时按新的哈希种子继续细分的最大层数
+_MAX_DEPTH = 4
+
+
+def _partition_of(key: bytes, partitions: int, depth: int) -> int:
+    return zlib.crc32(key, depth) % partitions
+
+
+def _write_records(f, items: Iterable[Tuple[str, int]]):
+    for key, count in items:
+        data = key.encode('utf-8')
+        f.write(_RECORD.pack(len(data), count))
+        f.write(data)
+
+
+def _read_records(path: str) -> Iterator[Tuple[str, int]]:
+    with open(path, 'rb', buffering=1 << 16) as f:
+        while True:
+            header = f.read(_RECORD.size)
+            if len(header) < _RECORD.size:
+                return
+            length, count = _RECORD.unpack(header)
+            yield f.read(length).decode('utf-8'), count
+
+
+class ExternalCounter:
+    def __init__(self, memory_budget: int = DEFAULT_MEMORY_BUDGET, partitions: int = DEFAULT_PARTITIONS,
+                 temp_dir: Optional[str] = None):
+        self.memory_budget = memory_budget
+        self.partitions = partitions
+        self.temp_dir = temp_dir
+        self.spills = 0
+        self.total = 0
+        self._counts = {}
+        self._bytes = 0
+        self._dir = None
+        self._partition_files = None
+        # finalize() 之后：外存时为按次数降序的有序段文件，不重复键数为 _distinct
+        self._runs = None
+        self._distinct = 0
+        self._cleanup = None
+
+    def _ensure_dir(self):
+        if self._dir is None:
+            self._dir = tempfile.mkdtemp(prefix='danmaku_count_', dir=self.temp_dir)
+            # 对象被回收或解释器退出时删除临时文件
+            self._cleanup = weakref.finalize(self, shutil.rmtree, self._dir, True)
+        return self._dir
+
+    def add(self, key: str, count: int = 1):
+        if self._runs is not None:
+            raise RuntimeError("计数已合并完成，不能再添加")
+        counts = self._counts
+        self.total += count
+        if key in counts:
+            counts[key] += count
+            return
+        counts[key] = count
+        self._bytes += sys.getsizeof(key) + _ENTRY_OVERHEAD
+        if self._bytes > self.memory_budget:
+            self._spill()
+
+    def update(self, keys: Iterable[str]):
+        for key in keys:
+            self.add(key)
+
+    def update_weighted(self, items: Iterable[Tuple[str, int]]):
+        for key, count in items:
+            self.add(key, count)
+
+    def _spill(self):
+        """
+        把内存中的部分计数按哈希分区追加到临时文件，然后清空
+        """
+        if self._partition_files is None:
+            directory = self._ensure_dir()
+            self._partition_files = [open(os.path.join(directory, f"part_{i:03d}.bin"), 'ab', buffering=1 << 16)
+                                     for i in range(self.partitions)]
+        buckets = [[] for _ in range(self.partitions)]
+        for key, count in self._counts.items():
+            buckets[_partition_of(key.encode('utf-8'), self.partitions, 0)].append((key, count))
+        for f, items in zip(self._partition_files, buckets):
+            _write_records(f, items)
+        self._counts = {}
+        self._bytes = 0
+        self.spills += 1
+
+    def finalize(self) -> 'ExternalCounter':
+        """
+        合并各分区的部分计数；没有发生过溢写时结果全部留在内存中
+        """
+        if self._runs is not None:
+            return self
+        if self._partition_files is None:
+            self._runs = []
+            self._distinct = len(self._counts)
+            return self
+        self._spill()
+        for f in self._partition_files:
+            f.close()
+        paths = [f.name for f in self._partition_files]
+        self._partition_files = None
+        self._runs = []
+        for path in paths:
+            self._merge_partition(path, 1)
+        return self
+
+    def _merge_partition(self, path: str, depth: int):
+        """
+        合并一个分区文件为按次数降序的有序段；
+        分布倾斜导致该分区的不重复键超出预算时，按新的哈希种子细分后递归合并
+        """
+        counts = {}
+        used = 0
+        for key, count in _read_records(path):
+            if key in counts:
+                counts[key] += count
+                continue
+            counts[key] = count
+            used += sys.getsizeof(key) + _ENTRY_OVERHEAD
+            if used > self.memory_budget and depth < _MAX_DEPTH:
+                counts = None
+                break
+        if counts is None:
+            sub_paths = self._split(path, depth)
+            os.remove(path)
+            for sub_path in sub_paths:
+                self._merge_partition(sub_path, depth + 1)
+            return
+        os.remove(path)
+        if not counts:
+            return
+        run_path = f"{path}.run"
+        with open(run_path, 'wb', buffering=1 << 20) as f:
+            _write_records(f, sorted(counts.items(), key=lambda item: (-item[1], item[0])))
+        self._distinct += len(counts)
+        self._runs.append(run_path)
+
+    def _split(self, path: str, depth: int) -> List[str]:
+        files = [open(f"{path}.{i:03d}", 'wb', buffering=1 << 16) for i in range(self.partitions)]
+        try:
+            for key, count in _read_records(path):
+                data = key.encode('utf-8')
+                f = files[_partition_of(data, self.partitions, depth)]
+                f.write(_RECORD.pack(len(data), count))
+                f.write(data)
+        finally:
+            for f in files:
+                f.close()
+        return [f.name for f in files]
+
+    def __len__(self) -> int:
+        """
+        不重复键的数量
+        """
+        self.finalize()
+        return self._distinct
+
+    def items(self) -> Iterator[Tuple[str, int]]:
+        """
+        逐个产出 (键, 次数)，外存时每个分区内按次数降序
+        """
+        self.finalize()
+        if not self._runs:
+            return iter(self._counts.items())
+        return (item for path in self._runs for item in _read_records(path))
+
+    def most_common(self, n: Optional[int] = None):
+        """
+        与 Counter.most_common 相同：给定n时返回前n名的列表；
+        n为None时返回按次数降序的完整频次表迭代器（外存时多路归并各有序段，不整体载入内存）
+        """
+        self.finalize()
+        if not self._runs:
+            if n is None:
+                return iter(sorted(self._counts.items(), key=itemgetter(1), reverse=True))
+            return heapq.nlargest(n, self._counts.items(), key=itemgetter(1))
+        merged = heapq.merge(*(_read_records(path) for path in self._runs), key=lambda item: -item[1])
+        return merged if n is None else list(islice(merged, n))
+
+    def close(self):
+        """
+        删除临时文件
+        """
+        if self._partition_files is not None:
+            for f in self._partition_files:
+                f.close()
+            self._partition_files = None
+        if self._cleanup is not None:
+            self._cleanup()
+
+    def __getstate__(self):
+        """
+        合并完成后可pickle（送入流水线的子进程）；副本只读取有序段文件，不负责删除
+        """
+        self.finalize()
+        state = self.__dict__.copy()
+        state['_cleanup'] = None
+        return state
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def main(argv=None) -> int:
+    import time
+    from danmaku_loader import CACHE_FILENAME, load_cache
+    from data_processor import DanmakuProcessor
+
+    parser = argparse.ArgumentParser(description='在内存预算内精确统计弹幕/分词频次')
+    parser.add_argument('--cache-file', default=CACHE_FILENAME)
+    parser.add_argument('--memory-mb', type=float, default=DEFAULT_MEMORY_BUDGET / 1024 / 1024,
+                        help='计数可用的内存预算（MB）')
+    parser.add_argument('--words', action='store_true', help='统计分词后的词频（默认统计整条弹幕）')
+    parser.add_argument('--raw', action='store_true', help='不过滤噪声弹幕')
+    parser.add_argument('--top', type=int, default=20, help='输出前N名')
+    parser.add_argument('--output', default=None, help='把完整频次表（按次数降序）写入TSV文件')
+    args = parser.parse_args(argv)
+
+    cache = load_cache(args.cache_file)
+    if cache is None:
+        print(f"缓存文件不存在: {args.cache_file}")
+        return 1
+    budget = int(args.memory_mb * 1024 * 1024)
+    processor = DanmakuProcessor()
+    start = time.perf_counter()
+    with cache:
+        danmaku = iter(cache) if args.raw else (text for text in cache if not processor.is_noise(text))
+        if args.words:
+            from visualizer import Visualizer
+            counter = Visualizer(memory_budget=budget).count_words(danmaku)
+        else:
+            counter = DanmakuProcessor(memory_budget=budget).frequency_counter(danmaku)
+    with counter:
+        print(f"共 {counter.total:,} 条，{len(counter):,} 个不重复项，"
+              f"溢写 {counter.spills} 次，耗时 {time.perf_counter() - start:.1f} 秒")
+        for rank, (key, count) in enumerate(counter.most_common(args.top), 1):
+            print(f"  {rank}. {key}: {count}")
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                for key, count in counter.most_common():
+                    f.write(f"{key}\t{count}\n")
+            print(f"完整频次表已保存到: {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,344 @@
+"""
+弹幕倒排索引模块
+以不重复文本id为文档，为字符1-gram/2-gram和jieba分词结果建立有序倒排表，一次构建后保存到磁盘。
+子串查询（与 `kw in text` 语义一致）由2-gram倒排表求交得到候选再校验；
+布尔查询按id递增惰性产出结果，取满前N条即停止，不再全量扫描
+
+查询语法（query / parse_query）:
+    大模型 成本|价格 -免费     空格分隔的各组同时满足（AND），组内 | 为或（OR），- 开头为排除（NOT）
+    =模型                      以 = 开头表示jieba分词后的完整词，而不是子串
+
+用法:
+    python inverted_index.py build --cache-file danmaku_cache.txt
+    python inverted_index.py query "大模型 成本|价格" -n 20
+"""
+import argparse
+import hashlib
+import heapq
+import json
+import os
+import struct
+import time
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from danmaku_corpus import DanmakuCorpus
+
+INDEX_FILENAME = 'danmaku_index.bin'
+# 文件头: 魔数, 版本, JSON头长度
+_INDEX_MAGIC = b'DMII'
+_INDEX_VERSION = 1
+_FILE_HEADER = struct.Struct('<4sIQ')
+_NGRAM_PREFIX = 'c:'
+_TOKEN_PREFIX = 'w:'
+# first_rows 在行id数组中分块查找命中行的初始/最大块大小
+_FIRST_ROWS_CHUNK = 256
+_FIRST_ROWS_MAX_CHUNK = 1 << 20
+
+
+def corpus_digest(corpus: DanmakuCorpus) -> str:
+    """
+    语料的内容指纹（不重复文本及顺序、各自次数），用于判断磁盘上的索引是否对应当前语料
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for text, count in corpus.iter_unique():
+        digest.update(text.encode('utf-8'))
+        digest.update(b'\x00%d\x00' % count)
+    digest.update(b'%d' % len(corpus))
+    return digest.hexdigest()
+
+
+def _ngrams(text: str) -> set:
+    grams = set(text)
+    grams.update(text[i:i + 2] for i in range(len(text) - 1))
+    return grams
+
+
+def parse_query(query: str) -> Tuple[List[List[str]], List[str]]:
+    """
+    '大模型 成本|价格 -免费' -> ([['大模型'], ['成本', '价格']], ['免费'])
+    """
+    groups, excluded = [], []
+    for clause in query.split():
+        if clause.startswith('-') and len(clause) > 1:
+            excluded.append(clause[1:])
+        else:
+            terms = [term for term in clause.split('|') if term]
+            if terms:
+                groups.append(terms)
+    return groups, excluded
+
+
+class InvertedIndex:
+    def __init__(self, corpus: DanmakuCorpus, postings: Dict[str, Sequence[int]], has_tokens: bool,
+                 digest: str = None):
+        self.corpus = corpus
+        self.has_tokens = has_tokens
+        self.digest = digest
+        self._postings = postings
+        self._empty = array('I')
+
+    @classmethod
+    def build(cls, danmaku_list: Iterable[str], tokens: bool = True) -> 'InvertedIndex':
+        """
+        为语料建立索引；tokens=False 时只建字符n-gram（不需要jieba，构建更快）
+        """
+        corpus = danmaku_list if isinstance(danmaku_list, DanmakuCorpus) else DanmakuCorpus.from_iterable(danmaku_list)
+        lists = defaultdict(lambda: array('I'))
+        cut = None
+        if tokens:
+            import jieba
+            cut = jieba.cut
+        # 按id递增追加，倒排表天然有序
+        for uid, text in enumerate(corpus.iter_unique_texts()):
+            for gram in _ngrams(text):
+                lists[_NGRAM_PREFIX + gram].append(uid)
+            if cut is not None:
+                words = {word.strip() for word in cut(text)}
+                words.discard('')
+                for word in words:
+                    lists[_TOKEN_PREFIX + word].append(uid)
+        return cls(corpus, dict(lists), tokens, corpus_digest(corpus))
+
+    def save(self, path: str = INDEX_FILENAME):
+        terms = {}
+        offset = 0
+        for term, postings in self._postings.items():
+            terms[term] = [offset, len(postings)]
+            offset += len(postings)
+        header = json.dumps({'count': len(self.corpus), 'unique_count': self.corpus.unique_count,
+                             'digest': self.digest, 'tokens': self.has_tokens, 'terms': terms},
+                            ensure_ascii=False).encode('utf-8')
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(_FILE_HEADER.pack(_INDEX_MAGIC, _INDEX_VERSION, len(header)))
+            f.write(header)
+            for postings in self._postings.values():
+                array('I', postings).tofile(f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, corpus: DanmakuCorpus, check_digest: bool = True) -> Optional['InvertedIndex']:
+        """
+        读取索引；文件不存在、格式不符或与语料内容不一致时返回None
+        """
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'rb') as f:
+                magic, version, header_len = _FILE_HEADER.unpack(f.read(_FILE_HEADER.size))
+                if magic != _INDEX_MAGIC or version != _INDEX_VERSION:
+                    return None
+                header = json.loads(f.read(header_len).decode('utf-8'))
+                if header['count'] != len(corpus) or header['unique_count'] != corpus.unique_count:
+                    return None
+                if check_digest and header['digest'] != corpus_digest(corpus):
+                    return None
+                data = array('I')
+                total = sum(length for _, length in header['terms'].values())
+                data.fromfile(f, total)
+            view = memoryview(data)
+            postings = {term: view[offset:offset + length] for term, (offset, length) in header['terms'].items()}
+        except (struct.error, EOFError, ValueError, KeyError, TypeError):
+            # 文件被截断或损坏（写入中途被中断等），按不存在处理
+            return None
+        return cls(corpus, postings, header['tokens'], header['digest'])
+
+    @classmethod
+    def load_or_build(cls, path: str, corpus: DanmakuCorpus, tokens: bool = True) -> 'InvertedIndex':
+        index = cls.load(path, corpus)
+        if index is None:
+            index = cls.build(corpus, tokens)
+            index.save(path)
+        return index
+
+    @property
+    def term_count(self) -> int:
+        return len(self._postings)
+
+    def _gram_postings(self, gram: str) -> Sequence[int]:
+        return self._postings.get(_NGRAM_PREFIX + gram, self._empty)
+
+    def _term_postings(self, term: str) -> Tuple[List[Sequence[int]], bool]:
+        """
+        返回 (需要求交的倒排表, 是否还需逐条校验子串)
+        """
+        if term.startswith('='):
+            if not self.has_tokens:
+                raise ValueError("索引构建时未包含分词结果，不能使用 = 完整词查询")
+            return [self._postings.get(_TOKEN_PREFIX + term[1:], self._empty)], False
+        if len(term) <= 2:
+            return [self._gram_postings(term)], False
+        grams = {term[i:i + 2] for i in range(len(term) - 1)}
+        return sorted((self._gram_postings(gram) for gram in grams), key=len), True
+
+    def estimate(self, term: str) -> int:
+        """
+        命中数上限（用于挑选最稀疏的条件先遍历）
+        """
+        lists, _ = self._term_postings(term)
+        return len(lists[0])
+
+    @staticmethod
+    def _contains(postings: Sequence[int], uid: int) -> bool:
+        i = bisect_left(postings, uid)
+        return i < len(postings) and postings[i] == uid
+
+    def matches(self, term: str, uid: int) -> bool:
+        lists, verify = self._term_postings(term)
+        if verify:
+            return term in self.corpus.text(uid)
+        return self._contains(lists[0], uid)
+
+    def iter_term(self, term: str) -> Iterator[int]:
+        """
+        按id递增产出包含该词的不重复文本id
+        """
+        lists, verify = self._term_postings(term)
+        smallest, others = lists[0], lists[1:]
+        text = self.corpus.text
+        for uid in smallest:
+            if all(self._contains(postings, uid) for postings in others) and (not verify or term in text(uid)):
+                yield uid
+
+    def _iter_group(self, terms: Sequence[str]) -> Iterator[int]:
+        if len(terms) == 1:
+            yield from self.iter_term(terms[0])
+            return
+        last = -1
+        for uid in heapq.merge(*(self.iter_term(term) for term in terms)):
+            if uid != last:
+                yield uid
+                last = uid
+
+    def search(self, groups: Sequence[Sequence[str]] = (), excluded: Sequence[str] = (),
+               limit: Optional[int] = None) -> Iterator[int]:
+        """
+        布尔查询：每组至少命中一个词（组间AND、组内OR），且不含 excluded 中的任何词
+        从命中数最少的组开始遍历，其余条件逐个id校验，产出满 limit 个即停止
+        """
+        groups = [list(group) for group in groups if group]
+        if groups:
+            groups.sort(key=lambda group: sum(self.estimate(term) for term in group))
+            candidates = self._iter_group(groups[0])
+            rest = groups[1:]
+        else:
+            candidates = iter(range(self.corpus.unique_count))
+            rest = []
+        if limit is not None and limit <= 0:
+            return
+        found = 0
+        for uid in candidates:
+            if all(any(self.matches(term, uid) for term in group) for group in rest) and \
+                    not any(self.matches(term, uid) for term in excluded):
+                yield uid
+                found += 1
+                if limit is not None and found >= limit:
+                    return
+
+    def query(self, query: str, limit: Optional[int] = 20) -> List[str]:
+        """
+        按查询语法返回命中的不重复弹幕文本
+        """
+        groups, excluded = parse_query(query)
+        return [self.corpus.text(uid) for uid in self.search(groups, excluded, limit)]
+
+    def first_rows(self, any_of: Sequence[str], limit: int = 20) -> List[str]:
+        """
+        按原始弹幕顺序返回前 limit 条包含任一关键词的弹幕（含重复，与逐条扫描后切片的结果一致）
+        不重复文本id按首次出现顺序分配，前k行中的id都小于k，因此分块扫描行id数组时，
+        只需从倒排表（按id递增）中取出不超过当前块最大id的命中，找满 limit 条即停止
+        """
+        if limit <= 0:
+            return []
+        hit_iter = self._iter_group(list(any_of))
+        next_hit = next(hit_iter, None)
+        if next_hit is None:
+            return []
+        import numpy as np
+        rows = np.frombuffer(self.corpus.ids(), dtype=np.uintc)
+        text = self.corpus.text
+        hits = []
+        targets = None
+        result = []
+        start, chunk = 0, _FIRST_ROWS_CHUNK
+        while start < len(rows) and len(result) < limit:
+            block = rows[start:start + chunk]
+            start += chunk
+            # 命中靠前时只看第一块；命中稀少时块逐步加大，减少逐块调用的开销
+            chunk = min(chunk * 4, _FIRST_ROWS_MAX_CHUNK)
+            max_uid = int(block.max())
+            if next_hit is not None and next_hit <= max_uid:
+                while next_hit is not None and next_hit <= max_uid:
+                    hits.append(next_hit)
+                    next_hit = next(hit_iter, None)
+                targets = np.array(hits, dtype=np.uintc)
+            if targets is None:
+                continue
+            for uid in block[np.isin(block, targets)][:limit - len(result)]:
+                result.append(text(int(uid)))
+        return result
+
+    def count(self, query: str) -> int:
+        """
+        命中查询的弹幕总条数（按出现次数计）
+        """
+        groups, excluded = parse_query(query)
+        counts = self.corpus.counts()
+        return sum(counts[uid] for uid in self.search(groups, excluded))
+
+
+def _load_filtered_corpus(cache_file: str, raw: bool) -> DanmakuCorpus:
+    from danmaku_loader import load_cache
+    cache = load_cache(cache_file)
+    if cache is None:
+        raise SystemExit(f"缓存文件不存在: {cache_file}")
+    corpus = DanmakuCorpus.from_iterable(cache)
+    corpus.freeze()
+    cache.close()
+    if raw:
+        return corpus
+    # 与主程序的分析阶段使用同一份过滤后的语料，索引可被 DataAnalyzer 直接复用
+    from data_processor import DanmakuProcessor
+    return DanmakuProcessor().filter_danmaku(corpus)
+
+
+def main(argv=None) -> int:
+    from danmaku_loader import CACHE_FILENAME
+
+    parser = argparse.ArgumentParser(description='弹幕倒排索引')
+    parser.add_argument('command', choices=['build', 'query'])
+    parser.add_argument('query', nargs='?', default='', help='查询（query），如 "大模型 成本|价格 -免费"')
+    parser.add_argument('--cache-file', default=CACHE_FILENAME)
+    parser.add_argument('--index-file', default=INDEX_FILENAME)
+    parser.add_argument('--raw', action='store_true', help='对未过滤的原始弹幕建索引（默认过滤噪声后建索引）')
+    parser.add_argument('--no-tokens', action='store_true', help='不建jieba分词索引，只建字符n-gram')
+    parser.add_argument('-n', type=int, default=20, help='最多返回的条数（query）')
+    args = parser.parse_args(argv)
+
+    corpus = _load_filtered_corpus(args.cache_file, args.raw)
+    if args.command == 'build':
+        start = time.perf_counter()
+        index = InvertedIndex.build(corpus, tokens=not args.no_tokens)
+        index.save(args.index_file)
+        print(f"已为 {corpus.unique_count} 条不重复弹幕建立 {index.term_count} 个词项的索引，"
+              f"耗时 {time.perf_counter() - start:.1f} 秒，保存到 {args.index_file}")
+        return 0
+
+    index = InvertedIndex.load(args.index_file, corpus)
+    if index is None:
+        print(f"索引 {args.index_file} 不存在或与缓存不一致，请先运行 build")
+        return 1
+    start = time.perf_counter()
+    results = index.query(args.query, args.n)
+    elapsed = (time.perf_counter() - start) * 1000
+    for i, text in enumerate(results, 1):
+        print(f"  {i}. {text}")
+    print(f"共 {len(results)} 条，耗时 {elapsed:.2f} ms")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
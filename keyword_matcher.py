@@ -0,0 +1,77 @@
+"""
+多关键词匹配模块
+Aho-Corasick 自动机：一次扫描文本即可找出所有命中的关键词，
+替代对每个关键词分别执行 `kw in text` 的做法（关键词越多收益越大）
+"""
+from collections import deque
+from typing import Dict, Iterable, List, Set
+
+
+class KeywordAutomaton:
+    def __init__(self, keywords: Iterable[str]):
+        # 去重并保持顺序，关键词id即在 self.keywords 中的下标
+        self.keywords: List[str] = list(dict.fromkeys(kw for kw in keywords if kw))
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # 每个状态结束的关键词id（含经失败链可达的后缀关键词）
+        self._output: List[List[int]] = [[]]
+        for keyword_id, keyword in enumerate(self.keywords):
+            self._insert(keyword, keyword_id)
+        self._build_fail_links()
+
+    def _insert(self, keyword: str, keyword_id: int):
+        state = 0
+        for char in keyword:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+        self._output[state].append(keyword_id)
+
+    def _build_fail_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def match_ids(self, text: str) -> Set[int]:
+        """
+        文本中出现的关键词id集合（每个关键词只计一次，与 `kw in text` 的语义一致）
+        """
+        found = set()
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found.update(output[state])
+        return found
+
+    def matches(self, text: str) -> List[str]:
+        """
+        文本中出现的关键词（按关键词定义顺序）
+        """
+        return [self.keywords[i] for i in sorted(self.match_ids(text))]
+
+    def __len__(self) -> int:
+        return len(self.keywords)
+
+
+if __name__ == '__main__':
+    automaton = KeywordAutomaton(['大模型', '大语言模型', '模型', 'GPT', 'ChatGPT'])
+    print(automaton.matches('ChatGPT这种大语言模型真厉害'))
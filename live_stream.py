@@ -0,0 +1,603 @@
+"""
+直播弹幕实时统计模块
+按B站直播间的WebSocket协议接收弹幕（数据包头16字节: 包长、头长、协议版本、操作码、序号；
+正文为JSON或zlib/brotli压缩的多个数据包），在滑动时间窗口内实时维护弹幕数、噪声率、
+情感分布和高频弹幕，并定期输出快照
+
+每条弹幕的更新是O(1)的：噪声和情感判断复用 DanmakuProcessor.is_noise / DataAnalyzer.sentiment_label
+（按文本缓存），计数记入当前时间桶，时间桶滑出窗口时整体扣减；只有输出快照时才取前K条
+
+LiveStubServer 是本机的直播弹幕替身服务器（按设定速率推送合成弹幕），用于离线测试和压测
+
+用法:
+    python live_stream.py --stub --rate 5000 --duration 10            # 连接本机替身服务器
+    python live_stream.py --url wss://broadcastlv.chat.bilibili.com/sub --room-id 123 --token ...
+"""
+import argparse
+import base64
+import hashlib
+import heapq
+import json
+import os
+import select
+import socket
+import socketserver
+import ssl
+import struct
+import threading
+import time
+import zlib
+from collections import Counter
+from operator import itemgetter
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from data_analyzer import DataAnalyzer
+from data_processor import DanmakuProcessor
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+# 数据包头: 包总长度, 头长度(16), 协议版本, 操作码, 序号（大端）
+PACKET_HEADER = struct.Struct('>IHHII')
+OP_HEARTBEAT = 2
+OP_HEARTBEAT_REPLY = 3
+OP_MESSAGE = 5
+OP_AUTH = 7
+OP_AUTH_REPLY = 8
+# 协议版本: 0 JSON正文, 1 心跳/认证, 2 zlib压缩的数据包, 3 brotli压缩的数据包
+PROTO_JSON = 0
+PROTO_HEARTBEAT = 1
+PROTO_ZLIB = 2
+PROTO_BROTLI = 3
+HEARTBEAT_INTERVAL = 30
+
+_WS_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+_WS_BINARY = 0x2
+_WS_CLOSE = 0x8
+_WS_PING = 0x9
+_WS_PONG = 0xA
+
+
+def encode_packet(op: int, body: bytes = b'', protover: int = PROTO_HEARTBEAT, seq: int = 1) -> bytes:
+    return PACKET_HEADER.pack(PACKET_HEADER.size + len(body), PACKET_HEADER.size, protover, op, seq) + body
+
+
+def decode_packets(data: bytes) -> Iterator[Tuple[int, bytes]]:
+    """
+    拆分一段数据中首尾相接的数据包，压缩包递归解压，产出 (操作码, 正文)
+    """
+    offset = 0
+    while offset + PACKET_HEADER.size <= len(data):
+        length, header_len, protover, op, _ = PACKET_HEADER.unpack_from(data, offset)
+        # 头长度小于16或包长度为0时offset不会前进，越界的长度说明数据被截断，均视为损坏的数据包
+        if header_len < PACKET_HEADER.size or length < header_len or offset + length > len(data):
+            raise ValueError(f"数据包长度异常: 包长度 {length}, 头长度 {header_len}, 剩余 {len(data) - offset} 字节")
+        body = data[offset + header_len:offset + length]
+        offset += length
+        if op == OP_MESSAGE and protover == PROTO_ZLIB:
+            yield from decode_packets(zlib.decompress(body))
+        elif op == OP_MESSAGE and protover == PROTO_BROTLI:
+            if not BROTLI_AVAILABLE:
+                raise RuntimeError("收到brotli压缩的数据包，但brotli未安装，可以运行 'pip install brotli' 来安装")
+            yield from decode_packets(brotli.decompress(body))
+        else:
+            yield op, body
+
+
+def parse_danmu(message: Dict) -> Optional[Tuple[str, float]]:
+    """
+    从 DANMU_MSG 消息中取出 (弹幕文本, 发送时间戳秒)；其他消息返回None
+    cmd 可能带后缀（如 DANMU_MSG:4:0:2:2:2:0），info[0][4] 为毫秒时间戳，info[1] 为文本
+    """
+    cmd = message.get('cmd', '')
+    if not cmd.startswith('DANMU_MSG'):
+        return None
+    info = message.get('info') or []
+    if len(info) < 2 or not isinstance(info[1], str):
+        return None
+    try:
+        timestamp = info[0][4] / 1000
+    except (IndexError, TypeError):
+        timestamp = time.time()
+    return info[1], timestamp
+
+
+# ---- 最小的WebSocket实现（RFC 6455，只用到二进制帧） ----
+
+def _ws_mask(payload: bytes, key: bytes) -> bytes:
+    if not payload:
+        return payload
+    repeated = (key * (len(payload) // 4 + 1))[:len(payload)]
+    return (int.from_bytes(payload, 'big') ^ int.from_bytes(repeated, 'big')).to_bytes(len(payload), 'big')
+
+
+def _ws_frame(payload: bytes, opcode: int = _WS_BINARY, mask: bool = True) -> bytes:
+    """
+    客户端发出的帧必须加掩码，服务端发出的帧不加
+    """
+    length = len(payload)
+    if length < 126:
+        header = struct.pack('>BB', 0x80 | opcode, (0x80 if mask else 0) | length)
+    elif length < 65536:
+        header = struct.pack('>BBH', 0x80 | opcode, (0x80 if mask else 0) | 126, length)
+    else:
+        header = struct.pack('>BBQ', 0x80 | opcode, (0x80 if mask else 0) | 127, length)
+    if not mask:
+        return header + payload
+    key = os.urandom(4)
+    return header + key + _ws_mask(payload, key)
+
+
+class _SocketReader:
+    """
+    带缓冲的套接字读取；与 socket.makefile 不同，等待超时不会使其不可用
+    """
+    def __init__(self, sock):
+        self.sock = sock
+        self._buffer = bytearray()
+
+    def buffered(self) -> bool:
+        return bool(self._buffer) or (hasattr(self.sock, 'pending') and self.sock.pending() > 0)
+
+    def _fill(self) -> bool:
+        chunk = self.sock.recv(65536)
+        self._buffer += chunk
+        return bool(chunk)
+
+    def read(self, size: int) -> bytes:
+        while len(self._buffer) < size:
+            if not self._fill():
+                break
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+    def readline(self) -> bytes:
+        while b'\n' not in self._buffer:
+            if not self._fill():
+                break
+        end = self._buffer.find(b'\n') + 1 or len(self._buffer)
+        return self.read(end)
+
+
+def _read_exact(reader, size: int) -> bytes:
+    data = reader.read(size)
+    if len(data) < size:
+        raise ConnectionError("连接已关闭")
+    return data
+
+
+def _ws_read_message(reader) -> Tuple[int, bytes]:
+    """
+    读取一条完整消息（合并分片），返回 (opcode, 内容)
+    """
+    opcode, chunks = None, []
+    while True:
+        first, second = _read_exact(reader, 2)
+        length = second & 0x7F
+        if length == 126:
+            (length,) = struct.unpack('>H', _read_exact(reader, 2))
+        elif length == 127:
+            (length,) = struct.unpack('>Q', _read_exact(reader, 8))
+        key = _read_exact(reader, 4) if second & 0x80 else None
+        payload = _read_exact(reader, length)
+        if key is not None:
+            payload = _ws_mask(payload, key)
+        frame_opcode = first & 0x0F
+        if frame_opcode >= 0x8:
+            # 控制帧可以插在分片之间，单独返回
+            return frame_opcode, payload
+        if frame_opcode:
+            opcode = frame_opcode
+        chunks.append(payload)
+        if first & 0x80:
+            return opcode, b''.join(chunks)
+
+
+class LiveDanmakuClient:
+    def __init__(self, url: str, room_id: int, token: str = '', uid: int = 0,
+                 heartbeat_interval: float = HEARTBEAT_INTERVAL, timeout: float = 1.0):
+        self.url = url
+        self.room_id = room_id
+        self.token = token
+        self.uid = uid
+        self.heartbeat_interval = heartbeat_interval
+        self.timeout = timeout
+        self.popularity = 0
+        self._sock = None
+        self._reader = None
+        self._send_lock = threading.Lock()
+        self._closed = threading.Event()
+
+    def connect(self):
+        """
+        建立WebSocket连接并发送认证包，等待认证回复后启动心跳线程
+        """
+        url = urlparse(self.url)
+        secure = url.scheme == 'wss'
+        port = url.port or (443 if secure else 80)
+        sock = socket.create_connection((url.hostname, port), timeout=10)
+        if secure:
+            sock = ssl.create_default_context().wrap_socket(sock, server_hostname=url.hostname)
+        key = base64.b64encode(os.urandom(16)).decode('ascii')
+        request = (f"GET {url.path or '/'} HTTP/1.1\r\nHost: {url.hostname}:{port}\r\n"
+                   f"Upgrade: websocket\r\nConnection: Upgrade\r\nSec-WebSocket-Key: {key}\r\n"
+                   f"Sec-WebSocket-Version: 13\r\n\r\n")
+        sock.sendall(request.encode('ascii'))
+        reader = _SocketReader(sock)
+        status = reader.readline().decode('latin-1')
+        headers = {}
+        while True:
+            line = reader.readline().decode('latin-1').strip()
+            if not line:
+                break
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+        accept = base64.b64encode(hashlib.sha1((key + _WS_GUID).encode('ascii')).digest()).decode('ascii')
+        if ' 101 ' not in status or headers.get('sec-websocket-accept') != accept:
+            sock.close()
+            raise ConnectionError(f"WebSocket握手失败: {status.strip()}")
+        self._sock, self._reader = sock, reader
+
+        auth = {'uid': self.uid, 'roomid': self.room_id, 'protover': PROTO_BROTLI if BROTLI_AVAILABLE else PROTO_ZLIB,
+                'platform': 'web', 'type': 2, 'key': self.token}
+        self._send(encode_packet(OP_AUTH, json.dumps(auth).encode('utf-8')))
+        opcode, payload = _ws_read_message(self._reader)
+        replies = [json.loads(body) for op, body in decode_packets(payload) if op == OP_AUTH_REPLY]
+        if not replies or replies[0].get('code', 0) != 0:
+            self.close()
+            raise ConnectionError(f"直播间认证失败: {replies}")
+        sock.settimeout(None)
+        threading.Thread(target=self._heartbeat_loop, daemon=True).start()
+
+    def _send(self, packet: bytes):
+        with self._send_lock:
+            self._sock.sendall(_ws_frame(packet))
+
+    def _heartbeat_loop(self):
+        while not self._closed.wait(self.heartbeat_interval):
+            try:
+                self._send(encode_packet(OP_HEARTBEAT, b'[object Object]'))
+            except OSError:
+                return
+
+    def batches(self) -> Iterator[List[Tuple[str, float]]]:
+        """
+        逐个WebSocket消息产出其中的弹幕列表 [(文本, 时间戳), ...]；
+        超时未收到数据时产出空列表，调用方可借此按时输出快照
+        """
+        while not self._closed.is_set():
+            if not self._reader.buffered() and not select.select([self._sock], [], [], self.timeout)[0]:
+                yield []
+                continue
+            try:
+                opcode, payload = _ws_read_message(self._reader)
+            except (ConnectionError, OSError, ValueError):
+                if self._closed.is_set():
+                    return
+                raise
+            if opcode == _WS_CLOSE:
+                return
+            if opcode == _WS_PING:
+                with self._send_lock:
+                    self._sock.sendall(_ws_frame(payload, _WS_PONG))
+                continue
+            batch = []
+            for op, body in decode_packets(payload):
+                if op == OP_MESSAGE:
+                    danmu = parse_danmu(json.loads(body))
+                    if danmu is not None:
+                        batch.append(danmu)
+                elif op == OP_HEARTBEAT_REPLY and len(body) >= 4:
+                    # 心跳回复正文为4字节的人气值
+                    (self.popularity,) = struct.unpack('>I', body[:4])
+            yield batch
+
+    def close(self):
+        self._closed.set()
+        if self._sock is not None:
+            try:
+                self._sock.sendall(_ws_frame(b'', _WS_CLOSE))
+            except OSError:
+                pass
+            self._sock.close()
+
+
+class _Bucket:
+    def __init__(self):
+        self.reset(-1)
+
+    def reset(self, slot: int):
+        self.slot = slot
+        self.total = 0
+        self.noise = 0
+        self.positive = 0
+        self.negative = 0
+        # 本时间桶内有效弹幕（非噪声）的文本计数
+        self.texts = Counter()
+
+
+class SlidingWindowStats:
+    def __init__(self, window_seconds: float = 60, bucket_seconds: float = 1.0,
+                 processor: DanmakuProcessor = None, analyzer: DataAnalyzer = None, cache_size: int = 200000):
+        self.window_seconds = window_seconds
+        self.bucket_seconds = bucket_seconds
+        self.processor = processor or DanmakuProcessor()
+        self.analyzer = analyzer or DataAnalyzer()
+        self.cache_size = cache_size
+        self._buckets = [_Bucket() for _ in range(max(1, int(round(window_seconds / bucket_seconds))))]
+        self._slot = None
+        # 窗口内的合计，与各时间桶之和保持一致
+        self.total = 0
+        self.noise = 0
+        self.positive = 0
+        self.negative = 0
+        self.counts = Counter()
+        self.lifetime_total = 0
+        # 文本 -> (是否噪声, 情感标签)；直播中重复弹幕极多，超过上限时整体清空
+        self._labels: Dict[str, Tuple[bool, int]] = {}
+
+    def _classify(self, text: str) -> Tuple[bool, int]:
+        labels = self._labels.get(text)
+        if labels is None:
+            if len(self._labels) >= self.cache_size:
+                self._labels.clear()
+            noise = self.processor.is_noise(text)
+            labels = self._labels[text] = (noise, 0 if noise else self.analyzer.sentiment_label(text))
+        return labels
+
+    def _expire(self, bucket: _Bucket):
+        self.total -= bucket.total
+        self.noise -= bucket.noise
+        self.positive -= bucket.positive
+        self.negative -= bucket.negative
+        counts = self.counts
+        for text, count in bucket.texts.items():
+            remaining = counts[text] - count
+            if remaining:
+                counts[text] = remaining
+            else:
+                del counts[text]
+
+    def advance(self, now: float) -> _Bucket:
+        """
+        把窗口推进到 now，滑出窗口的时间桶整体扣减（每条弹幕只被扣减一次，均摊O(1)）
+        """
+        slot = int(now // self.bucket_seconds)
+        buckets = self._buckets
+        if self._slot is None or slot > self._slot:
+            start = slot - len(buckets) + 1 if self._slot is None else max(self._slot + 1, slot - len(buckets) + 1)
+            for s in range(start, slot + 1):
+                bucket = buckets[s % len(buckets)]
+                if bucket.slot >= 0:
+                    self._expire(bucket)
+                bucket.reset(s)
+            self._slot = slot
+        bucket = buckets[slot % len(buckets)]
+        # 早于窗口当前位置的延迟消息计入最新的时间桶
+        return bucket if bucket.slot == slot else buckets[self._slot % len(buckets)]
+
+    def add(self, text: str, now: float = None):
+        bucket = self.advance(time.time() if now is None else now)
+        noise, label = self._classify(text)
+        bucket.total += 1
+        self.total += 1
+        self.lifetime_total += 1
+        if noise:
+            bucket.noise += 1
+            self.noise += 1
+            return
+        bucket.texts[text] += 1
+        self.counts[text] += 1
+        if label > 0:
+            bucket.positive += 1
+            self.positive += 1
+        elif label < 0:
+            bucket.negative += 1
+            self.negative += 1
+
+    def snapshot(self, now: float = None, top_k: int = 10) -> Dict:
+        """
+        当前窗口的统计快照；情感占比以有效（非噪声）弹幕为分母，与离线分析一致
+        """
+        now = time.time() if now is None else now
+        self.advance(now)
+        valid = self.total - self.noise
+        return {
+            'time': now,
+            'window_seconds': self.window_seconds,
+            'total': self.total,
+            'rate_per_sec': self.total / self.window_seconds,
+            'noise_rate': self.noise / self.total if self.total else 0,
+            'positive_rate': self.positive / valid if valid else 0,
+            'negative_rate': self.negative / valid if valid else 0,
+            'top': heapq.nlargest(top_k, self.counts.items(), key=itemgetter(1)),
+            'lifetime_total': self.lifetime_total,
+        }
+
+
+def format_snapshot(snapshot: Dict, top_k: int = 5) -> str:
+    top = '，'.join(f"{text}({count})" for text, count in snapshot['top'][:top_k])
+    return (f"[{time.strftime('%H:%M:%S', time.localtime(snapshot['time']))}] "
+            f"近{snapshot['window_seconds']:g}秒 {snapshot['total']} 条（{snapshot['rate_per_sec']:.0f} 条/秒），"
+            f"噪声 {snapshot['noise_rate']*100:.1f}%，积极 {snapshot['positive_rate']*100:.1f}%，"
+            f"消极 {snapshot['negative_rate']*100:.1f}% | 热门: {top}")
+
+
+def run_live(client: LiveDanmakuClient, stats: SlidingWindowStats, interval: float = 5.0,
+             duration: Optional[float] = None, on_snapshot: Callable[[Dict], None] = None) -> Dict:
+    """
+    持续接收弹幕并更新窗口统计，每 interval 秒输出一次快照；duration 为空时一直运行
+    弹幕按到达时间计入窗口（直播弹幕的发送时间只精确到秒且可能与本机时钟不一致）
+    """
+    on_snapshot = on_snapshot or (lambda snapshot: print(format_snapshot(snapshot)))
+    start = time.time()
+    next_snapshot = start + interval
+    for batch in client.batches():
+        now = time.time()
+        for text, _ in batch:
+            stats.add(text, now)
+        if now >= next_snapshot:
+            on_snapshot(stats.snapshot(now))
+            next_snapshot += interval * (1 + int((now - next_snapshot) // interval))
+        if duration is not None and now - start >= duration:
+            break
+    return stats.snapshot()
+
+
+# ---- 本机直播弹幕替身服务器 ----
+
+class _LiveStubHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        server = self.server
+        headers = {}
+        self.rfile.readline()
+        while True:
+            line = self.rfile.readline().decode('latin-1').strip()
+            if not line:
+                break
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+        key = headers.get('sec-websocket-key', '')
+        accept = base64.b64encode(hashlib.sha1((key + _WS_GUID).encode('ascii')).digest()).decode('ascii')
+        self.wfile.write((f"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                          f"Sec-WebSocket-Accept: {accept}\r\n\r\n").encode('ascii'))
+
+        opcode, payload = _ws_read_message(self.rfile)
+        auth = next((json.loads(body) for op, body in decode_packets(payload) if op == OP_AUTH), None)
+        if auth is None:
+            return
+        self.request.sendall(_ws_frame(encode_packet(OP_AUTH_REPLY, b'{"code":0}'), mask=False))
+
+        stop = threading.Event()
+        send_lock = threading.Lock()
+        threading.Thread(target=self._push, args=(stop, send_lock), daemon=True).start()
+        try:
+            while not server.stopping.is_set():
+                opcode, payload = _ws_read_message(self.rfile)
+                if opcode == _WS_CLOSE:
+                    break
+                if any(op == OP_HEARTBEAT for op, _ in decode_packets(payload)):
+                    reply = encode_packet(OP_HEARTBEAT_REPLY, struct.pack('>I', server.sent))
+                    with send_lock:
+                        self.request.sendall(_ws_frame(reply, mask=False))
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            stop.set()
+
+    def _push(self, stop: threading.Event, send_lock: threading.Lock):
+        """
+        每10毫秒把一批DANMU_MSG打包为一个zlib压缩的数据包推送，平均速率为 server.rate 条/秒
+        """
+        server = self.server
+        messages = server.generator.iter_danmaku(10 ** 12, seed_offset=server.connections)
+        tick = 0.01
+        next_tick = time.perf_counter()
+        carry = 0.0
+        try:
+            while not stop.is_set() and not server.stopping.is_set():
+                carry += server.rate * tick
+                count, carry = int(carry), carry - int(carry)
+                if count:
+                    now_ms = int(time.time() * 1000)
+                    body = b''.join(
+                        encode_packet(OP_MESSAGE, json.dumps(
+                            {'cmd': 'DANMU_MSG', 'info': [[0, 1, 25, 16777215, now_ms, 0, 0, '', 0],
+                                                          next(messages), [0, 'stub', 0]]},
+                            ensure_ascii=False).encode('utf-8'), PROTO_JSON)
+                        for _ in range(count))
+                    frame = _ws_frame(encode_packet(OP_MESSAGE, zlib.compress(body), PROTO_ZLIB), mask=False)
+                    with send_lock:
+                        self.request.sendall(frame)
+                    server.sent += count
+                next_tick += tick
+                time.sleep(max(0.0, next_tick - time.perf_counter()))
+        except OSError:
+            pass
+
+
+class LiveStubServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, rate: float = 1000, generator=None):
+        from danmaku_generator import DanmakuGenerator
+        super().__init__((host, port), _LiveStubHandler)
+        self.rate = rate
+        self.generator = generator or DanmakuGenerator()
+        self.sent = 0
+        self.connections = 0
+        self.stopping = threading.Event()
+        self._thread = None
+
+    def process_request(self, request, client_address):
+        self.connections += 1
+        super().process_request(request, client_address)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"ws://{host}:{port}/sub"
+
+    def start(self) -> 'LiveStubServer':
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.stopping.set()
+        self.shutdown()
+        self.server_close()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='直播弹幕实时滑动窗口统计')
+    parser.add_argument('--url', default=None, help='直播弹幕服务器地址（如 wss://broadcastlv.chat.bilibili.com/sub）')
+    parser.add_argument('--room-id', type=int, default=0, help='直播间真实房间号')
+    parser.add_argument('--token', default='', help='getDanmuInfo 接口返回的 token')
+    parser.add_argument('--stub', action='store_true', help='启动本机替身服务器并连接（离线测试）')
+    parser.add_argument('--rate', type=float, default=2000, help='替身服务器每秒推送的弹幕数')
+    parser.add_argument('--window', type=float, default=60, help='滑动窗口长度（秒）')
+    parser.add_argument('--interval', type=float, default=5, help='快照输出间隔（秒）')
+    parser.add_argument('--duration', type=float, default=None, help='运行时长（秒），默认一直运行')
+    parser.add_argument('--snapshot-file', default=None, help='把每次快照以JSON行追加到该文件')
+    args = parser.parse_args(argv)
+    if not args.stub and not args.url:
+        parser.error("需要指定 --url 或 --stub")
+
+    stub = LiveStubServer(rate=args.rate).start() if args.stub else None
+    client = LiveDanmakuClient(stub.url if stub else args.url, args.room_id, args.token)
+    stats = SlidingWindowStats(window_seconds=args.window)
+    snapshot_file = open(args.snapshot_file, 'a', encoding='utf-8') if args.snapshot_file else None
+
+    def on_snapshot(snapshot):
+        print(format_snapshot(snapshot))
+        if snapshot_file is not None:
+            snapshot_file.write(json.dumps(snapshot, ensure_ascii=False) + '\n')
+            snapshot_file.flush()
+
+    start = time.time()
+    try:
+        client.connect()
+        print(f"已连接 {client.url}，窗口 {args.window:g} 秒，每 {args.interval:g} 秒输出快照（Ctrl+C 退出）")
+        run_live(client, stats, args.interval, args.duration, on_snapshot)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        client.close()
+        if stub is not None:
+            stub.stop()
+        if snapshot_file is not None:
+            snapshot_file.close()
+    elapsed = time.time() - start
+    print(f"共处理 {stats.lifetime_total} 条弹幕，平均 {stats.lifetime_total / max(elapsed, 1e-9):.0f} 条/秒")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
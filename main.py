@@ -1,135 +1,498 @@
 """
 主程序
 整合所有功能模块
+各阶段的输入指纹记录在 .build_cache.json 中，输入未变化的阶段直接跳过；
+较重的模块（爬虫、pandas、jieba、matplotlib）只在对应阶段真正需要运行时才导入；
+统计完成后的导出、词云和分析阶段互不依赖，由 StageDAG 在进程池中并行执行
+
+用法:
+    python main.py                                   # 交互运行（有缓存时询问是否使用）
+    python main.py --cache use --stages stats excel  # 只用缓存重新统计并导出Excel
+    python main.py --keywords GPT LLM --max-videos 50 --cache refresh --output-dir out/gpt
+    python main.py --config batch.json               # JSON配置文件，键名与命令行参数一致
+
+退出码: 0 成功；1 运行出错或有阶段失败；2 参数/配置错误；3 没有可用的弹幕数据；130 被中断
 """
+import argparse
+import json
 import os
 import sys
-from danmaku_crawler import BilibiliDanmakuCrawler
-from data_processor import DanmakuProcessor
-from excel_writer import ExcelWriter
-from visualizer import Visualizer
-from data_analyzer import DataAnalyzer
+from build_cache import BUILD_CACHE_FILENAME, BuildCache
+from pipeline_dag import StageDAG
+from danmaku_corpus import DanmakuCorpus
+from danmaku_loader import CACHE_FILENAME, load_cache, save_cache
+from danmaku_timeline import DanmakuTimeline
+from stage_metrics import StageRecorder
+
+SOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+TIMELINE_FILE = 'danmaku_timeline.bin'
+EXCEL_FILE = 'danmaku_statistics.xlsx'
+WORDCLOUD_FILE = 'wordcloud.png'
+ADVANCED_WORDCLOUD_FILE = 'wordcloud_advanced.png'
+CONCLUSION_FILE = 'analysis_conclusion.txt'
+PARQUET_DIR = 'danmaku_parquet'
+METRICS_FILE = 'crawler_metrics.prom'
+
+DEFAULT_KEYWORDS = ['大语言模型', '大模型', 'LLM']
+STAGES = ['crawl', 'stats', 'excel', 'parquet', 'wordcloud', 'analyze']
+CACHE_POLICIES = ['prompt', 'auto', 'use', 'refresh']
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+EXIT_NO_DATA = 3
+EXIT_INTERRUPTED = 130
+
+
+def _sources(*names):
+    """
+    阶段实现所在的源码文件，代码或其中的配置（关键词、词云参数等）改动后指纹随之变化
+    """
+    return [os.path.join(SOURCE_DIR, name) for name in names]
+
+
+def _output_paths(output_dir: str) -> dict:
+    return {
+        'excel': os.path.join(output_dir, EXCEL_FILE),
+        'parquet': os.path.join(output_dir, PARQUET_DIR),
+        'wordcloud': os.path.join(output_dir, WORDCLOUD_FILE),
+        'wordcloud_advanced': os.path.join(output_dir, ADVANCED_WORDCLOUD_FILE),
+        'analyze': os.path.join(output_dir, CONCLUSION_FILE),
+    }
+
+
+def _stage_fingerprints(build: BuildCache, input_files, outputs: dict, approximate=None, cluster=False,
+                        memory_budget=None):
+    """
+    各阶段指纹：统计阶段依赖弹幕缓存，下游阶段依赖统计阶段的指纹和自身实现
+    approximate: 近似分析参数（None表示精确分析），参数不同时需要重新生成分析结论
+    cluster: 是否做近似重复聚类，开关变化时需要重新统计
+    memory_budget: 频次统计的内存预算（外存计数时同频次的排列顺序可能不同）
+    """
+    stats_fp = build.fingerprint(
+        list(input_files) + _sources('data_processor.py', 'danmaku_cluster.py', 'danmaku_corpus.py',
+                                     'danmaku_timeline.py', 'external_counter.py'),
+        cluster=cluster, memory_budget=memory_budget)
+    return {
+        'stats': stats_fp,
+        'excel': build.fingerprint(_sources('excel_writer.py'), stats=stats_fp, output=outputs['excel']),
+        'parquet': build.fingerprint(_sources('columnar_export.py', 'data_analyzer.py'),
+                                     stats=stats_fp, output=outputs['parquet']),
+        'wordcloud': build.fingerprint(_sources('visualizer.py'), stats=stats_fp, output=outputs['wordcloud']),
+        'wordcloud_advanced': build.fingerprint(_sources('visualizer.py'), stats=stats_fp,
+                                                output=outputs['wordcloud_advanced']),
+        'analyze': build.fingerprint(_sources('data_analyzer.py', 'danmaku_timeline.py', 'approximate_analysis.py'),
+                                     stats=stats_fp, output=outputs['analyze'], approximate=approximate),
+    }
+
+
+def _stats_summary(stats):
+    """
+    可写入构建缓存的统计摘要（不含弹幕语料本身）
+    """
+    return {key: stats[key] for key in ('total_count', 'original_count', 'top_8_danmaku', 'top_8_clusters')
+            if key in stats}
+
+
+def _print_stats(stats):
+    print(f"\n词频排名前8的弹幕:")
+    for item in stats['top_8_danmaku']:
+        print(f"  {item['rank']}. {item['danmaku']}: {item['count']} 次")
+
+    if 'top_8_clusters' not in stats:
+        return
+    print(f"\n近似重复聚类后排名前8的弹幕:")
+    for item in stats['top_8_clusters']:
+        print(f"  {item['rank']}. {item['danmaku']}: {item['count']} 次（{item['variant_count']} 种变体）")
+
+
+def _print_conclusion(conclusion_file):
+    if os.path.exists(conclusion_file):
+        with open(conclusion_file, 'r', encoding='utf-8') as f:
+            print(f.read())
+        print(f"\n结论已保存到: {conclusion_file}")
+
+
+def _decide_use_cache(cache, cache_file: str, policy: str, allow_crawl: bool) -> bool:
+    """
+    根据缓存策略决定是否使用已有缓存
+    prompt: 交互询问（标准输入不是终端时按auto处理）；auto: 有非空缓存就用；
+    use: 必须使用缓存；refresh: 总是重新爬取
+    """
+    if cache is None or len(cache) == 0:
+        if cache is not None:
+            print(f"发现缓存文件 {cache_file}，但文件为空")
+        return False
+    print(f"发现缓存文件 {cache_file}，包含 {len(cache)} 条弹幕")
+    if policy == 'refresh' and allow_crawl:
+        return False
+    if policy == 'prompt' and allow_crawl and sys.stdin.isatty():
+        while True:
+            try:
+                user_input = input("是否使用缓存？(y/n，默认y): ").strip().lower()
+            except EOFError:
+                return True
+            if user_input == '' or user_input == 'y':
+                return True
+            elif user_input == 'n':
+                return False
+            else:
+                print("请输入 y 或 n")
+    return True
 
 
-def main():
+def run_pipeline(recorder: StageRecorder, build: BuildCache, args) -> int:
     print("="*80)
     print("B站大语言模型相关视频弹幕数据采集与分析系统")
     print("="*80)
-    
+    stages = set(args.stages)
+    if 'wordcloud' in stages:
+        stages.add('wordcloud_advanced')
+    downstream = [name for name in ('excel', 'parquet', 'wordcloud', 'wordcloud_advanced', 'analyze')
+                  if name in stages]
+    outputs = _output_paths(args.output_dir)
+
     # 步骤1: 数据获取
     print("\n【步骤1】开始数据获取...")
-    crawler = BilibiliDanmakuCrawler()
-    keywords = ['大语言模型', '大模型', 'LLM']
-    
-    # 检查是否已有缓存数据
-    cache_file = 'danmaku_cache.txt'
-    if os.path.exists(cache_file):
-        # 先检查缓存文件是否为空
-        with open(cache_file, 'r', encoding='utf-8') as f:
-            cached_lines = [line.strip() for line in f if line.strip()]
-        
-        if cached_lines:
-            print(f"发现缓存文件 {cache_file}，包含 {len(cached_lines)} 条弹幕")
-            while True:
-                user_input = input("是否使用缓存？(y/n，默认y): ").strip().lower()
-                if user_input == '' or user_input == 'y':
-                    use_cache = True
-                    break
-                elif user_input == 'n':
-                    use_cache = False
-                    break
-                else:
-                    print("请输入 y 或 n")
-            
-            if use_cache:
-                all_danmaku = cached_lines
-                print(f"从缓存加载 {len(all_danmaku)} 条弹幕")
-            else:
-                print("开始爬取数据（这可能需要较长时间）...")
-                all_danmaku = crawler.crawl_danmaku(keywords, max_videos=300)
-                # 保存缓存
-                if all_danmaku:
-                    with open(cache_file, 'w', encoding='utf-8') as f:
-                        f.write('\n'.join(all_danmaku))
-                    print(f"数据已缓存到 {cache_file}")
-        else:
-            print(f"发现缓存文件 {cache_file}，但文件为空")
-            print("将重新爬取数据...")
-            all_danmaku = crawler.crawl_danmaku(keywords, max_videos=300)
+
+    # 检查是否已有缓存数据（内存映射打开，只读取行索引）
+    cache_file = args.cache_file
+    timeline_file = os.path.join(os.path.dirname(cache_file), TIMELINE_FILE)
+    cache = load_cache(cache_file)
+    timeline = None
+    allow_crawl = 'crawl' in stages
+    use_cache = _decide_use_cache(cache, cache_file, args.cache, allow_crawl)
+
+    if use_cache:
+        all_danmaku = cache
+    elif not allow_crawl or args.cache == 'use':
+        print(f"错误: 没有可用的缓存文件 {cache_file}，且未选择 crawl 阶段或缓存策略为 use")
+        return EXIT_NO_DATA
+    else:
+        if cache is not None:
+            # 覆盖写入前释放内存映射
+            cache.close()
+            cache = None
+        with recorder.stage('init_crawler'):
+            from danmaku_crawler import BilibiliDanmakuCrawler
+            crawler = BilibiliDanmakuCrawler(metrics_file=os.path.join(args.output_dir, METRICS_FILE))
+        with recorder.stage('crawl') as record:
+            print(f"开始爬取数据（关键词: {', '.join(args.keywords)}，这可能需要较长时间）...")
+            all_danmaku = crawler.crawl_danmaku(args.keywords, max_videos=args.max_videos,
+                                                workers=args.workers, max_requests=args.max_requests,
+                                                time_budget=args.time_budget)
+            print(crawler.metrics_summary())
             # 保存缓存
             if all_danmaku:
-                with open(cache_file, 'w', encoding='utf-8') as f:
-                    f.write('\n'.join(all_danmaku))
+                save_cache(all_danmaku, cache_file)
+                timeline = crawler.timeline
+                timeline.save(timeline_file)
                 print(f"数据已缓存到 {cache_file}")
-    else:
-        print("开始爬取数据（这可能需要较长时间）...")
-        all_danmaku = crawler.crawl_danmaku(keywords, max_videos=300)
-        # 保存缓存
-        if all_danmaku:
-            with open(cache_file, 'w', encoding='utf-8') as f:
-                f.write('\n'.join(all_danmaku))
-            print(f"数据已缓存到 {cache_file}")
-    
+            record['danmaku'] = len(all_danmaku)
+
     if not all_danmaku:
         print("错误: 未获取到任何弹幕数据！")
-        return
-    
-    print(f"\n总共获取 {len(all_danmaku)} 条原始弹幕")
-    
+        return EXIT_NO_DATA
+    if 'stats' not in stages and not downstream:
+        if cache is not None:
+            cache.close()
+        print(f"\n已获取 {len(all_danmaku)} 条弹幕，未选择后续阶段")
+        return EXIT_OK
+
+    # 输入指纹：弹幕缓存和时间信息文件的内容哈希（大小和修改时间未变时不重新读取）
+    with recorder.stage('fingerprint'):
+        input_files = [path for path in (cache_file, timeline_file) if os.path.exists(path)]
+        fingerprints = _stage_fingerprints(build, input_files, outputs, _approximate_options(args),
+                                           cluster=args.cluster, memory_budget=_memory_budget(args))
+    cached_stats = build.value('stats') if build.is_fresh('stats', fingerprints['stats']) else None
+    pending = [name for name in downstream if not build.is_fresh(name, fingerprints[name])]
+
+    if cached_stats is not None and not pending:
+        # 所选阶段的输出都是最新的：不构建语料、不重新统计
+        if cache is not None:
+            cache.close()
+        for name in ['stats'] + downstream:
+            with recorder.stage(name, status='cached'):
+                pass
+        print(f"\n弹幕缓存与各阶段配置均未变化，沿用上次的输出（使用 --force 可强制重新生成）")
+        _print_stats(cached_stats)
+        if 'analyze' in stages:
+            _print_conclusion(outputs['analyze'])
+        _print_outputs(cache_file, timeline_file, outputs, downstream)
+        return EXIT_OK
+
+    if use_cache:
+        with recorder.stage('load_cache') as record:
+            print(f"从缓存加载 {len(all_danmaku)} 条弹幕")
+            if os.path.exists(timeline_file):
+                timeline = DanmakuTimeline.load(timeline_file)
+                if len(timeline) != len(all_danmaku):
+                    print(f"时间信息文件 {timeline_file} 与缓存不一致，跳过时间分布分析")
+                    timeline = None
+            record['danmaku'] = len(all_danmaku)
+
+    # 转为紧凑语料：唯一文本驻留在同一缓冲区，每条弹幕只保留整数id
+    with recorder.stage('build_corpus') as record:
+        all_danmaku = DanmakuCorpus.from_iterable(all_danmaku)
+        all_danmaku.freeze()
+        if cache is not None:
+            cache.close()
+        record['unique'] = all_danmaku.unique_count
+    print(f"\n总共获取 {len(all_danmaku)} 条原始弹幕（{all_danmaku.unique_count} 条不重复）")
+
     # 步骤2: 数据统计
     print("\n【步骤2】开始数据统计...")
-    processor = DanmakuProcessor()
-    stats = processor.get_all_stats(all_danmaku)
-    
-    print(f"\n词频排名前8的弹幕:")
-    for item in stats['top_8_danmaku']:
-        print(f"  {item['rank']}. {item['danmaku']}: {item['count']} 次")
-    
-    # 导出Excel
-    print("\n【步骤2.1】导出Excel统计表...")
-    excel_writer = ExcelWriter('danmaku_statistics.xlsx')
-    excel_writer.write_statistics(stats)
-    
-    # 步骤3: 数据可视化
-    print("\n【步骤3】生成词云图...")
-    visualizer = Visualizer()
-    visualizer.create_wordcloud(stats['all_danmaku'], 'wordcloud.png')
-    visualizer.create_advanced_wordcloud(stats['all_danmaku'], 'wordcloud_advanced.png')
-    
+    with recorder.stage('stats') as record:
+        from data_processor import DanmakuProcessor
+        processor = DanmakuProcessor(memory_budget=_memory_budget(args))
+        stats = processor.get_all_stats(all_danmaku, timeline, cluster=args.cluster)
+        record['filtered'] = stats['total_count']
+        build.record('stats', fingerprints['stats'], value=_stats_summary(stats))
+
+    _print_stats(stats)
+    if not downstream:
+        return EXIT_OK
+
+    # 步骤3: Excel/Parquet导出、词云和分析结论都只依赖统计结果，作为DAG并行执行
+    print("\n【步骤3】并行导出统计表、生成词云图和分析结论...")
+    frequencies = processor.frequency_counter(stats['all_danmaku'])
+    dag = StageDAG()
+    stage_specs = {
+        'excel': (_excel_stage, (stats, frequencies, processor.keywords, outputs['excel'])),
+        'parquet': (_parquet_stage, (stats, all_danmaku, frequencies, outputs['parquet'])),
+        'wordcloud': (_wordcloud_stage, ('create_wordcloud', stats['all_danmaku'], outputs['wordcloud'],
+                                         _memory_budget(args))),
+        'wordcloud_advanced': (_wordcloud_stage, ('create_advanced_wordcloud', stats['all_danmaku'],
+                                                  outputs['wordcloud_advanced'], _memory_budget(args))),
+        'analyze': (_analyze_stage, (stats, outputs['analyze'], _approximate_options(args))),
+    }
+    for name in downstream:
+        if name in pending:
+            func, stage_args = stage_specs[name]
+            dag.add(name, func, *stage_args)
+        else:
+            print(f"{outputs[name]} 已是最新，跳过")
+    exit_code = EXIT_OK
+    if dag.stages:
+        results = dag.run(max_workers=args.stage_workers)
+        dag.record_to(recorder)
+        print("\n各导出/分析阶段的执行时间线:")
+        print(dag.report())
+        for name, info in results.items():
+            if info['status'] != 'ok':
+                print(f"阶段 {name} 未完成: {info.get('error')}")
+                exit_code = EXIT_FAILED
+            elif info['result']:
+                build.record(name, fingerprints[name], info['result'])
+
     # 步骤4: 数据结论
-    print("\n【步骤4】生成分析结论...")
-    analyzer = DataAnalyzer()
-    conclusion = analyzer.generate_conclusion(stats['all_danmaku'], stats)
-    
-    # 保存结论到文件
-    conclusion_file = 'analysis_conclusion.txt'
-    with open(conclusion_file, 'w', encoding='utf-8') as f:
+    if 'analyze' in stages:
+        print("\n【步骤4】分析结论:")
+        _print_conclusion(outputs['analyze'])
+
+    _print_outputs(cache_file, timeline_file, outputs, downstream)
+    return exit_code
+
+
+def _excel_stage(stats, frequencies, keywords, output):
+    from excel_writer import ExcelWriter
+    ExcelWriter(output).write_full_statistics(stats, frequencies, keywords)
+    return [output]
+
+
+def _parquet_stage(stats, raw_danmaku, frequencies, output_dir):
+    """
+    导出列式文件（需要pyarrow，供下游工具直接读取），返回写出的文件列表
+    """
+    from columnar_export import ColumnarExporter
+    from data_analyzer import DataAnalyzer
+    from data_processor import DanmakuProcessor
+    return ColumnarExporter(output_dir).export_all(stats, DanmakuProcessor(), DataAnalyzer(),
+                                                   raw_danmaku=raw_danmaku, frequencies=frequencies)
+
+
+def _wordcloud_stage(method, danmaku_list, output, memory_budget=None):
+    from visualizer import Visualizer
+    getattr(Visualizer(memory_budget=memory_budget), method)(danmaku_list, output)
+    return [output]
+
+
+def _approximate_options(args):
+    """
+    近似分析参数；未开启 --approximate 时返回None（精确分析）
+    """
+    if not args.approximate:
+        return None
+    return {'target_error': args.target_error, 'confidence': args.confidence, 'seed': args.seed}
+
+
+def _memory_budget(args):
+    """
+    --memory-budget（MB）换算为字节；未设置时返回None（计数全部在内存中）
+    """
+    if args.memory_budget is None:
+        return None
+    return int(args.memory_budget * 1024 * 1024)
+
+
+def _analyze_stage(stats, output, approximate=None):
+    from data_analyzer import DataAnalyzer
+    from inverted_index import INDEX_FILENAME, InvertedIndex
+    # 已用 inverted_index.py build 建好且与当前语料一致的索引可直接用于提取示例弹幕
+    index = InvertedIndex.load(os.path.join(os.path.dirname(output), INDEX_FILENAME), stats['all_danmaku'])
+    if approximate is not None:
+        # 抽样估计：样本量由目标误差决定，与语料规模无关
+        from approximate_analysis import ApproximateAnalyzer
+        analyzer = ApproximateAnalyzer(DataAnalyzer(), **approximate)
+    else:
+        analyzer = DataAnalyzer()
+    conclusion = analyzer.generate_conclusion(stats['all_danmaku'], stats, index)
+    with open(output, 'w', encoding='utf-8') as f:
         f.write(conclusion)
-    
-    print(conclusion)
-    print(f"\n结论已保存到: {conclusion_file}")
-    
+    return [output]
+
+
+def _print_outputs(cache_file, timeline_file, outputs, downstream):
+    descriptions = {
+        'excel': '统计数据表',
+        'parquet': 'Parquet列式数据（弹幕、频次表、噪声标签、分析统计）',
+        'wordcloud': '词云图（基础版）',
+        'wordcloud_advanced': '词云图（高级版）',
+        'analyze': '分析结论报告',
+    }
     print("\n" + "="*80)
     print("所有任务完成！")
     print("="*80)
     print("\n生成的文件:")
     print(f"  1. {cache_file} - 原始弹幕数据")
-    print(f"  2. danmaku_statistics.xlsx - 统计数据表")
-    print(f"  3. wordcloud.png - 词云图（基础版）")
-    print(f"  4. wordcloud_advanced.png - 词云图（高级版）")
-    print(f"  5. {conclusion_file} - 分析结论报告")
+    print(f"  2. {timeline_file} - 弹幕时间信息")
+    for i, name in enumerate(downstream, 3):
+        print(f"  {i}. {outputs[name]}{'/' if name == 'parquet' else ''} - {descriptions[name]}")
     print("="*80)
 
 
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description='B站大语言模型相关视频弹幕数据采集与分析')
+    parser.add_argument('--config', default=None,
+                        help='JSON配置文件，键名与参数名一致（如 "max_videos"），命令行参数优先')
+    parser.add_argument('--keywords', nargs='+', default=DEFAULT_KEYWORDS, help='搜索关键词')
+    parser.add_argument('--max-videos', type=int, default=300, help='每个关键词的最大视频数')
+    parser.add_argument('--max-requests', type=int, default=None, help='爬取的请求数预算')
+    parser.add_argument('--time-budget', type=float, default=None, help='爬取的时间预算（秒）')
+    parser.add_argument('--workers', type=int, default=1, help='爬取并发线程数')
+    parser.add_argument('--stage-workers', type=int, default=None,
+                        help='导出/词云/分析阶段的并行进程数（默认按CPU核数）')
+    parser.add_argument('--cache', choices=CACHE_POLICIES, default='prompt',
+                        help='缓存策略: prompt 交互询问（非终端时同auto）、auto 有缓存就用、'
+                             'use 只用缓存、refresh 重新爬取（默认 prompt）')
+    parser.add_argument('--cache-file', default=None,
+                        help=f'弹幕缓存文件（默认 输出目录/{CACHE_FILENAME}）')
+    parser.add_argument('--output-dir', default='.', help='输出目录（默认当前目录）')
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES,
+                        help='要运行的阶段（默认全部）；不含crawl时只使用缓存')
+    parser.add_argument('--force', action='store_true', help='忽略增量构建记录，重新生成所选阶段的输出')
+    parser.add_argument('--memory-budget', type=float, default=None,
+                        help='频次/词频统计的内存预算（MB），超出时溢写到临时文件做外存计数（默认全部在内存中）')
+    parser.add_argument('--track-memory', action='store_true',
+                        help='用tracemalloc统计各阶段内存峰值（会明显拖慢分词等分配密集的阶段，仅用于排查内存）')
+    parser.add_argument('--cluster', action='store_true',
+                        help='统计时做近似重复弹幕聚类（MinHash/LSH，纯Python实现，不重复弹幕多时较慢）')
+    parser.add_argument('--approximate', action='store_true',
+                        help='近似分析：抽样估计情感占比和各项排名并给出置信区间（适合超大语料）')
+    parser.add_argument('--target-error', type=float, default=0.01, help='近似分析的目标误差（默认0.01，即±1%%）')
+    parser.add_argument('--confidence', type=float, default=0.95, help='近似分析的置信水平（默认0.95）')
+    parser.add_argument('--seed', type=int, default=None, help='近似分析的随机种子（固定后结果可复现）')
+    return parser
+
+
+def _config_value(parser, action, value):
+    """
+    按对应参数的 type/nargs/choices 转换并校验配置文件中的值，与命令行传入时一致，失败时退出码为2
+    """
+    name = action.option_strings[-1] if action.option_strings else action.dest
+    if action.nargs == 0:
+        # store_true 一类的开关
+        if not isinstance(value, bool):
+            parser.error(f"配置项 {name} 应为 true 或 false，实际为 {value!r}")
+        return value
+    if value is None:
+        return None
+    multiple = action.nargs in ('+', '*')
+    items = value if multiple and isinstance(value, list) else [value]
+    converted = []
+    for item in items:
+        if isinstance(item, bool) or not isinstance(item, (str, int, float)):
+            parser.error(f"配置项 {name} 的值无效: {value!r}")
+        try:
+            item = (action.type or str)(str(item))
+        except (TypeError, ValueError, argparse.ArgumentTypeError):
+            parser.error(f"配置项 {name} 的值无效: {value!r}")
+        if action.choices is not None and item not in action.choices:
+            parser.error(f"配置项 {name} 的值 {item!r} 不在可选范围内（可选 {', '.join(map(str, action.choices))}）")
+        converted.append(item)
+    return converted if multiple else converted[0]
+
+
+def parse_args(argv=None):
+    """
+    先读取 --config 指定的JSON配置作为默认值，再解析命令行参数
+    """
+    parser = build_parser()
+    pre_args, _ = parser.parse_known_args(argv)
+    if pre_args.config:
+        try:
+            with open(pre_args.config, 'r', encoding='utf-8') as f:
+                config = json.load(f)
+        except (OSError, ValueError) as e:
+            parser.error(f"无法读取配置文件 {pre_args.config}: {e}")
+        if not isinstance(config, dict):
+            parser.error(f"配置文件 {pre_args.config} 的顶层必须是JSON对象")
+        actions = {action.dest: action for action in parser._actions}
+        unknown = sorted(key for key in (k.replace('-', '_') for k in config) if key not in actions)
+        if unknown:
+            parser.error(f"配置文件中有未知的键: {', '.join(unknown)}")
+        parser.set_defaults(**{key.replace('-', '_'): _config_value(parser, actions[key.replace('-', '_')], value)
+                               for key, value in config.items()})
+    args = parser.parse_args(argv)
+    if args.cache_file is None:
+        args.cache_file = os.path.join(args.output_dir, CACHE_FILENAME)
+    if args.max_videos <= 0 or args.workers <= 0 or (args.stage_workers is not None and args.stage_workers <= 0):
+        parser.error("--max-videos、--workers、--stage-workers 必须为正整数")
+    if args.memory_budget is not None and args.memory_budget <= 0:
+        parser.error("--memory-budget 必须为正数")
+    if not 0 < args.target_error < 1 or not 0 < args.confidence < 1:
+        parser.error("--target-error 和 --confidence 必须在 0 和 1 之间")
+    invalid = sorted(set(args.stages) - set(STAGES))
+    if invalid:
+        parser.error(f"未知的阶段: {', '.join(invalid)}（可选 {', '.join(STAGES)}）")
+    return args
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    os.makedirs(args.output_dir, exist_ok=True)
+    recorder = StageRecorder(track_memory=args.track_memory)
+    build = BuildCache(os.path.join(args.output_dir, BUILD_CACHE_FILENAME), enabled=not args.force)
+    try:
+        return run_pipeline(recorder, build, args)
+    finally:
+        # 只记录成功完成的阶段，中途出错时已完成的阶段下次仍可跳过
+        build.save()
+        # 无论成功与否都输出各阶段耗时，并保存JSON运行报告
+        if recorder.records:
+            print("\n各阶段耗时与内存:" if args.track_memory else "\n各阶段耗时:")
+            print(recorder.summary())
+            print(f"运行报告已保存到: {recorder.save_report(os.path.join(args.output_dir, 'run_reports'))}")
+
+
 if __name__ == '__main__':
     try:
-        main()
+        sys.exit(main())
     except KeyboardInterrupt:
         print("\n\n程序被用户中断")
-        sys.exit(0)
+        sys.exit(EXIT_INTERRUPTED)
     except Exception as e:
         print(f"\n\n程序运行出错: {e}")
         import traceback
         traceback.print_exc()
-        sys.exit(1)
-
+        sys.exit(EXIT_FAILED)
@@ -5,6 +5,7 @@
 import time
 from data_processor import DanmakuProcessor
 from data_processor_optimized import DanmakuProcessorOptimized
+from danmaku_loader import load_cache
 
 # 尝试导入matplotlib（可选依赖）
 try:
@@ -24,21 +25,11 @@ except ImportError:
 
 def load_test_data():
     """加载测试数据"""
-    import os
-    
-    # 获取脚本所在目录
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    cache_file = os.path.join(script_dir, 'danmaku_cache.txt')
-    
-    # 如果当前目录找不到，尝试在脚本目录查找
-    if not os.path.exists(cache_file):
-        # 尝试当前工作目录
-        cache_file = 'danmaku_cache.txt'
-    
-    if os.path.exists(cache_file):
-        with open(cache_file, 'r', encoding='utf-8') as f:
-            return [line.strip() for line in f if line.strip()]
-    return []
+    cache = load_cache()
+    if cache is None:
+        return []
+    with cache:
+        return list(cache)
 
 
 def benchmark_function(func, *args, iterations=5):
@@ -218,6 +209,64 @@ def visualize_comparison(results):
     plt.close()
 
 
+def compare_batch_performance():
+    """对比逐条循环版本和向量化批处理版本的性能，并校验结果一致"""
+    from data_analyzer import DataAnalyzer
+    from data_processor_batch import DanmakuBatchProcessor
+
+    print("="*80)
+    print("逐条循环 vs 向量化批处理 性能对比")
+    print("="*80)
+
+    danmaku_list = load_test_data()
+    if not danmaku_list:
+        print("未找到测试数据，请先运行主程序")
+        return
+
+    print(f"\n测试数据量: {len(danmaku_list)} 条弹幕\n")
+
+    processor = DanmakuProcessor()
+    analyzer = DataAnalyzer()
+    batch = DanmakuBatchProcessor()
+    filtered = processor.filter_danmaku(danmaku_list)
+
+    cases = {
+        'filter_danmaku': (processor.filter_danmaku, batch.filter_danmaku, danmaku_list),
+        'count_word_frequency': (processor.count_word_frequency, batch.count_word_frequency, filtered),
+        'analyze_sentiment': (analyzer.analyze_sentiment, batch.analyze_sentiment, filtered),
+        'analyze_application_mentions': (analyzer.analyze_application_mentions,
+                                         batch.analyze_application_mentions, filtered),
+        'analyze_concerns': (analyzer.analyze_concerns, batch.analyze_concerns, filtered),
+    }
+
+    results = {}
+    for name, (loop_func, batch_func, data) in cases.items():
+        print(f"测试 {name} 函数...")
+        loop_result, loop_time, loop_std = benchmark_function(loop_func, data)
+        batch_result, batch_time, batch_std = benchmark_function(batch_func, data)
+        results[name] = {
+            'original': loop_time,
+            'optimized': batch_time,
+            'improvement': ((loop_time - batch_time) / loop_time * 100)
+        }
+        print(f"  逐条版本: {loop_time:.2f} ± {loop_std:.2f} ms")
+        print(f"  批处理版本: {batch_time:.2f} ± {batch_std:.2f} ms")
+        print(f"  提升: {results[name]['improvement']:.1f}%")
+        print(f"  结果一致: {'是' if loop_result == batch_result else '否'}\n")
+
+    print("="*80)
+    print("批处理对比总结")
+    print("="*80)
+    print(f"{'函数名':<30} {'逐条版本 (ms)':<15} {'批处理版本 (ms)':<15} {'提升 (%)':<10}")
+    print("-"*80)
+    for func_name, data in results.items():
+        print(f"{func_name:<30} {data['original']:<15.2f} {data['optimized']:<15.2f} {data['improvement']:<10.1f}")
+    print("="*80)
+
+    return results
+
+
 if __name__ == '__main__':
     compare_performance()
+    compare_batch_performance()
 
@@ -1,13 +1,17 @@
 """
 性能分析工具
-用于分析数据统计接口的性能
+用于分析数据统计接口及整条流水线（爬虫、数据处理、分析、可视化）的性能
+支持cProfile确定性分析和低开销的统计采样分析（可导出火焰图折叠栈）
 """
 import cProfile
 import pstats
+import sys
+import threading
 import time
 import io
+from collections import Counter
 from functools import wraps
-from typing import List, Dict
+from typing import Callable, List, Dict
 
 # 尝试导入matplotlib（可选依赖）
 try:
@@ -44,42 +48,147 @@ def timing_decorator(func):
     return wrapper
 
 
+class SamplingProfiler:
+    """统计采样分析器：后台线程定期抓取目标线程的调用栈，开销与调用次数无关"""
+    
+    def __init__(self, interval: float = 0.001, all_threads: bool = False):
+        self.interval = interval
+        self.all_threads = all_threads
+        self.samples = Counter()
+        self._target_ids = set()
+        self._stop_event = threading.Event()
+        self._thread = None
+    
+    @staticmethod
+    def _frame_label(frame) -> str:
+        code = frame.f_code
+        filename = code.co_filename.replace('\\', '/').rsplit('/', 1)[-1]
+        return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+    
+    def _sample_loop(self):
+        own_id = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                if not self.all_threads and thread_id not in self._target_ids:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(self._frame_label(frame))
+                    frame = frame.f_back
+                # 折叠栈格式要求从根到叶
+                self.samples[';'.join(reversed(stack))] += 1
+    
+    def start(self):
+        """开始采样调用线程（all_threads=True时采样全部线程）"""
+        self._target_ids.add(threading.get_ident())
+        if self._thread is None:
+            self._stop_event.clear()
+            # 默认线程切换间隔为5ms，调小以保证采样线程能按间隔获得GIL
+            self._old_switch_interval = sys.getswitchinterval()
+            sys.setswitchinterval(min(self._old_switch_interval, self.interval))
+            self._thread = threading.Thread(target=self._sample_loop, daemon=True)
+            self._thread.start()
+    
+    def stop(self):
+        """停止采样"""
+        if self._thread is not None:
+            self._stop_event.set()
+            self._thread.join()
+            self._thread = None
+            sys.setswitchinterval(self._old_switch_interval)
+        self._target_ids.discard(threading.get_ident())
+    
+    def collapsed_stacks(self) -> List[str]:
+        """返回火焰图工具（flamegraph.pl / speedscope）可直接读取的折叠栈行"""
+        return [f"{stack} {count}" for stack, count in self.samples.most_common()]
+    
+    def save_collapsed(self, filename='performance_stacks.txt'):
+        """保存折叠栈文件"""
+        with open(filename, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(self.collapsed_stacks()))
+            f.write('\n')
+        print(f"折叠栈已保存到: {filename}（可用 flamegraph.pl 或 speedscope 生成火焰图）")
+    
+    def top_functions(self, top_n=20) -> str:
+        """按自身采样数（栈顶）和累计采样数汇总函数"""
+        total = sum(self.samples.values())
+        self_counts = Counter()
+        cumulative_counts = Counter()
+        for stack, count in self.samples.items():
+            frames = stack.split(';')
+            self_counts[frames[-1]] += count
+            for frame in set(frames):
+                cumulative_counts[frame] += count
+        
+        lines = [f"总采样数: {total}（采样间隔 {self.interval*1000:.1f} ms）", '',
+                 f"{'自身占比':>8} {'累计占比':>8}  函数"]
+        for frame, count in self_counts.most_common(top_n):
+            lines.append(f"{count/total*100:>7.1f}% {cumulative_counts[frame]/total*100:>7.1f}%  {frame}")
+        return '\n'.join(lines)
+
+
 class PerformanceProfiler:
     """性能分析器"""
     
-    def __init__(self):
+    def __init__(self, mode: str = 'cprofile', sample_interval: float = 0.001):
+        if mode not in ('cprofile', 'sampling'):
+            raise ValueError(f"未知的分析模式: {mode}（可选 cprofile / sampling）")
+        self.mode = mode
         self.timings = {}
         self.profiler = cProfile.Profile()
+        self.sampler = SamplingProfiler(interval=sample_interval)
         
     def profile_function(self, func, *args, **kwargs):
         """分析函数性能"""
-        # 使用cProfile进行详细分析
-        self.profiler.enable()
+        if self.mode == 'sampling':
+            # 统计采样，不给每次函数调用增加额外开销
+            self.sampler.start()
+        else:
+            # 使用cProfile进行详细分析
+            self.profiler.enable()
         start_time = time.perf_counter()
-        result = func(*args, **kwargs)
-        end_time = time.perf_counter()
-        self.profiler.disable()
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            end_time = time.perf_counter()
+            if self.mode == 'sampling':
+                self.sampler.stop()
+            else:
+                self.profiler.disable()
         
         elapsed_time = (end_time - start_time) * 1000  # 毫秒
         return result, elapsed_time
     
+    def profile_stage(self, name: str, func: Callable, *args, **kwargs):
+        """分析一个流水线阶段，并把耗时记入 timings[name]"""
+        print(f"分析 {name} ...")
+        result, elapsed_time = self.profile_function(func, *args, **kwargs)
+        self.timings[name] = elapsed_time
+        return result
+    
     def get_profile_stats(self, sort_by='cumulative', top_n=20):
         """获取性能统计信息"""
+        if self.mode == 'sampling':
+            return self.sampler.top_functions(top_n)
         s = io.StringIO()
         ps = pstats.Stats(self.profiler, stream=s)
         ps.sort_stats(sort_by)
         ps.print_stats(top_n)
         return s.getvalue()
     
-    def save_profile_report(self, filename='performance_report.txt'):
-        """保存性能报告"""
+    def save_profile_report(self, filename='performance_report.txt', title='数据统计接口性能分析报告'):
+        """保存性能报告（采样模式下同时导出折叠栈）"""
         stats = self.get_profile_stats()
         with open(filename, 'w', encoding='utf-8') as f:
             f.write("="*80 + "\n")
-            f.write("数据统计接口性能分析报告\n")
+            f.write(f"{title}（{'统计采样' if self.mode == 'sampling' else 'cProfile'}）\n")
             f.write("="*80 + "\n\n")
             f.write(stats)
         print(f"性能报告已保存到: {filename}")
+        if self.mode == 'sampling':
+            self.sampler.save_collapsed(filename.rsplit('.', 1)[0] + '_stacks.txt')
     
     def visualize_performance(self, timings: Dict[str, float], output_path='performance_chart.png'):
         """可视化性能数据"""
@@ -136,13 +245,13 @@ class PerformanceProfiler:
         plt.close()
 
 
-def analyze_data_processor_performance(danmaku_list: List[str]):
+def analyze_data_processor_performance(danmaku_list: List[str], mode: str = 'cprofile'):
     """分析数据处理器性能"""
     print("\n" + "="*80)
     print("开始性能分析...")
     print("="*80 + "\n")
     
-    profiler = PerformanceProfiler()
+    profiler = PerformanceProfiler(mode=mode)
     processor = DanmakuProcessor()
     
     # 分析各个函数的性能
@@ -201,33 +310,95 @@ def analyze_data_processor_performance(danmaku_list: List[str]):
     return timings, profiler
 
 
+def analyze_pipeline_performance(danmaku_list: List[str], mode: str = 'sampling',
+                                 crawl_videos: int = 20, danmaku_per_video: int = 1000):
+    """
+    分析整条流水线的性能：爬虫（对接本地替身服务器，不访问真实网络）、
+    数据处理、分析和可视化分词，各阶段计时并汇总到同一份报告
+    """
+    from data_analyzer import DataAnalyzer
+    from danmaku_crawler import BilibiliDanmakuCrawler
+    from stub_server import StubBilibiliServer
+    from visualizer import Visualizer
+    
+    print("\n" + "="*80)
+    print(f"开始流水线性能分析（{mode}）...")
+    print("="*80 + "\n")
+    
+    profiler = PerformanceProfiler(mode=mode)
+    
+    # 1. 爬虫：搜索、分P、XML解析全部走本地替身服务器
+    with StubBilibiliServer(danmaku_per_video=danmaku_per_video) as server:
+        crawler = BilibiliDanmakuCrawler(base_url=server.url, api_url=server.url,
+                                         request_delay=(0, 0), video_delay=0, credentials_file=None)
+        crawled = profiler.profile_stage(
+            f'crawl_danmaku ({crawl_videos}个视频)', crawler.crawl_danmaku, ['大模型'], max_videos=crawl_videos
+        )
+    
+    # 2. 数据处理
+    processor = DanmakuProcessor()
+    filtered = profiler.profile_stage('filter_danmaku', processor.filter_danmaku, danmaku_list)
+    profiler.profile_stage('count_word_frequency', processor.count_word_frequency, filtered, 8)
+    stats = profiler.profile_stage('get_all_stats', processor.get_all_stats, danmaku_list)
+    
+    # 3. 数据分析
+    analyzer = DataAnalyzer()
+    profiler.profile_stage('analyze_sentiment', analyzer.analyze_sentiment, filtered)
+    profiler.profile_stage('extract_key_topics', analyzer.extract_key_topics, filtered)
+    profiler.profile_stage('generate_conclusion', analyzer.generate_conclusion, filtered, stats)
+    
+    # 4. 可视化分词（词云渲染本身由wordcloud完成，这里只分析本项目的分词与计数）
+    visualizer = Visualizer()
+    profiler.profile_stage('count_words', visualizer.count_words, filtered)
+    profiler.profile_stage('process_text', visualizer.process_text, filtered)
+    
+    profiler.save_profile_report('pipeline_performance_report.txt', title='流水线性能分析报告')
+    profiler.visualize_performance(profiler.timings, 'pipeline_performance_chart.png')
+    
+    print("\n" + "="*80)
+    print("流水线性能分析总结")
+    print("="*80)
+    print(f"数据量: {len(danmaku_list)} 条弹幕，爬取: {len(crawled)} 条弹幕")
+    print("\n各阶段执行时间:")
+    for stage_name, exec_time in sorted(profiler.timings.items(), key=lambda x: x[1], reverse=True):
+        print(f"  {stage_name:30s}: {exec_time:8.2f} ms")
+    print("="*80 + "\n")
+    
+    return profiler.timings, profiler
+
+
 if __name__ == '__main__':
     # 从缓存文件加载数据
+    import argparse
     import os
+    from danmaku_loader import CACHE_FILENAME, load_cache
     
-    # 获取脚本所在目录
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    cache_file = os.path.join(script_dir, 'danmaku_cache.txt')
-    
-    # 如果当前目录找不到，尝试在脚本目录查找
-    if not os.path.exists(cache_file):
-        # 尝试当前工作目录
-        cache_file = 'danmaku_cache.txt'
+    parser = argparse.ArgumentParser(description='弹幕分析性能分析工具')
+    parser.add_argument('--mode', choices=['cprofile', 'sampling'], default='cprofile',
+                        help='cprofile为确定性分析，sampling为低开销统计采样（输出折叠栈）')
+    parser.add_argument('--pipeline', action='store_true',
+                        help='分析整条流水线（爬虫对接本地替身服务器）而不仅是数据统计接口')
+    parser.add_argument('--crawl-videos', type=int, default=20, help='流水线模式下爬取的视频数')
+    args = parser.parse_args()
     
-    if os.path.exists(cache_file):
-        print(f"正在加载数据文件: {cache_file}")
-        with open(cache_file, 'r', encoding='utf-8') as f:
-            danmaku_list = [line.strip() for line in f if line.strip()]
+    cache = load_cache()
+    if cache is not None:
+        print(f"正在加载数据文件: {cache.cache_file}")
+        with cache:
+            danmaku_list = list(cache)
         
-        if danmaku_list:
+        if not danmaku_list:
+            print("缓存文件为空，无法进行性能分析")
+        elif args.pipeline:
             print(f"成功加载 {len(danmaku_list)} 条弹幕数据\n")
-            analyze_data_processor_performance(danmaku_list)
+            analyze_pipeline_performance(danmaku_list, mode=args.mode, crawl_videos=args.crawl_videos)
         else:
-            print("缓存文件为空，无法进行性能分析")
+            print(f"成功加载 {len(danmaku_list)} 条弹幕数据\n")
+            analyze_data_processor_performance(danmaku_list, mode=args.mode)
     else:
-        print(f"未找到缓存文件: {cache_file}")
+        script_dir = os.path.dirname(os.path.abspath(__file__))
+        print(f"未找到缓存文件: {CACHE_FILENAME}")
         print("请先运行主程序 (python main.py) 获取数据")
-        print(f"或者将 danmaku_cache.txt 放在以下位置之一:")
+        print(f"或者将 {CACHE_FILENAME} 放在以下位置之一:")
         print(f"  1. 当前工作目录: {os.getcwd()}")
         print(f"  2. 脚本所在目录: {script_dir}")
-
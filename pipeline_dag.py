@@ -0,0 +1,176 @@
+"""
+流水线阶段DAG调度模块
+把流水线阶段声明为有向无环图，依赖都已完成的阶段立即提交到进程池并行执行，
+运行结束后给出每个阶段的起止时间和关键路径（决定端到端耗时的最长依赖链）
+
+阶段函数和参数会被pickle后送入子进程，因此必须是模块级函数、参数可序列化
+"""
+import os
+import time
+import traceback
+import tracemalloc
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, List, Optional
+
+
+def _run_stage(func: Callable, args: tuple, kwargs: dict):
+    """
+    在工作进程中执行一个阶段，返回 (结果, 开始时间戳, 墙钟秒数, CPU秒数)
+    """
+    # fork出的工作进程会继承父进程的tracemalloc，子进程的内存本就不统计，关掉以免拖慢阶段
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+    started_at = time.time()
+    start_wall = time.perf_counter()
+    start_cpu = time.process_time()
+    result = func(*args, **kwargs)
+    return result, started_at, time.perf_counter() - start_wall, time.process_time() - start_cpu
+
+
+class StageDAG:
+    def __init__(self):
+        self.stages: Dict[str, Dict] = {}
+
+    def add(self, name: str, func: Callable, *args, deps: Iterable[str] = (), **kwargs) -> 'StageDAG':
+        """
+        添加阶段；deps 中的阶段全部成功后才会开始执行
+        """
+        if name in self.stages:
+            raise ValueError(f"阶段重复: {name}")
+        self.stages[name] = {'func': func, 'args': args, 'kwargs': kwargs, 'deps': list(deps)}
+        return self
+
+    def topological_order(self) -> List[str]:
+        """
+        按依赖关系排序（同层保持添加顺序），检查缺失依赖和环
+        """
+        for name, stage in self.stages.items():
+            missing = [dep for dep in stage['deps'] if dep not in self.stages]
+            if missing:
+                raise ValueError(f"阶段 {name} 依赖不存在的阶段: {', '.join(missing)}")
+        order = []
+        done = set()
+        remaining = list(self.stages)
+        while remaining:
+            ready = [name for name in remaining if all(dep in done for dep in self.stages[name]['deps'])]
+            if not ready:
+                raise ValueError(f"阶段依赖存在环: {', '.join(remaining)}")
+            order.extend(ready)
+            done.update(ready)
+            remaining = [name for name in remaining if name not in done]
+        return order
+
+    def run(self, max_workers: Optional[int] = None, executor: str = 'process') -> Dict[str, Dict]:
+        """
+        执行全部阶段，返回 阶段名 -> {'status', 'result', 'start', 'wall', 'cpu', 'error'}
+        executor: 'process'（多进程，绕开GIL）、'thread' 或 'serial'（在当前进程中按拓扑顺序执行）
+        某个阶段失败时，依赖它的阶段标记为 skipped，其余阶段照常执行
+        """
+        order = self.topological_order()
+        self.results: Dict[str, Dict] = {}
+        self._run_start = time.time()
+        max_workers = max_workers or min(len(order), os.cpu_count() or 1)
+        if executor == 'serial' or max_workers == 1 or len(order) <= 1:
+            # 单核机器上多进程只会增加序列化开销
+            for name in order:
+                self._run_serial(name)
+            return self.results
+
+        pool_class = ProcessPoolExecutor if executor == 'process' else ThreadPoolExecutor
+        with pool_class(max_workers=max_workers) as pool:
+            running = {}
+            while len(self.results) < len(order):
+                for name in order:
+                    if name in self.results or name in running.values():
+                        continue
+                    deps = self.stages[name]['deps']
+                    if any(self.results.get(dep, {}).get('status') in ('error', 'skipped') for dep in deps):
+                        self.results[name] = {'status': 'skipped', 'error': '依赖的阶段失败'}
+                    elif all(self.results.get(dep, {}).get('status') == 'ok' for dep in deps):
+                        stage = self.stages[name]
+                        future = pool.submit(_run_stage, stage['func'], stage['args'], stage['kwargs'])
+                        running[future] = name
+                if not running:
+                    continue
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    self._collect(running.pop(future), future)
+        return self.results
+
+    def _run_serial(self, name: str):
+        stage = self.stages[name]
+        if any(self.results[dep]['status'] != 'ok' for dep in stage['deps']):
+            self.results[name] = {'status': 'skipped', 'error': '依赖的阶段失败'}
+            return
+        try:
+            result, start, wall, cpu = _run_stage(stage['func'], stage['args'], stage['kwargs'])
+            self.results[name] = {'status': 'ok', 'result': result, 'start': start, 'wall': wall, 'cpu': cpu}
+        except Exception as e:
+            traceback.print_exc()
+            self.results[name] = {'status': 'error', 'error': f"{type(e).__name__}: {e}"}
+
+    def _collect(self, name: str, future):
+        try:
+            result, start, wall, cpu = future.result()
+            self.results[name] = {'status': 'ok', 'result': result, 'start': start, 'wall': wall, 'cpu': cpu}
+        except Exception as e:
+            print(f"阶段 {name} 执行失败: {type(e).__name__}: {e}")
+            self.results[name] = {'status': 'error', 'error': f"{type(e).__name__}: {e}"}
+
+    def critical_path(self) -> List[str]:
+        """
+        按实测墙钟时间计算的最长依赖链
+        """
+        finish = {}
+        previous = {}
+        for name in self.topological_order():
+            own = self.results.get(name, {}).get('wall', 0.0)
+            best_dep = max(self.stages[name]['deps'], key=lambda dep: finish[dep], default=None)
+            finish[name] = own + (finish[best_dep] if best_dep else 0.0)
+            previous[name] = best_dep
+        if not finish:
+            return []
+        path = [max(finish, key=finish.get)]
+        while previous[path[-1]]:
+            path.append(previous[path[-1]])
+        return path[::-1]
+
+    def record_to(self, recorder):
+        """
+        把各阶段的实测时间追加到 StageRecorder（子进程中的内存峰值无法统计）
+        """
+        for name in self.topological_order():
+            info = self.results.get(name)
+            if info is None:
+                continue
+            record = {'stage': name, 'status': info['status'],
+                      'wall_ms': round(info.get('wall', 0.0) * 1000, 3),
+                      'cpu_ms': round(info.get('cpu', 0.0) * 1000, 3)}
+            if 'error' in info:
+                record['error'] = info['error']
+            recorder.records.append(record)
+
+    def report(self) -> str:
+        """
+        各阶段相对开始时间的起止、总耗时与关键路径
+        """
+        lines = [f"{'阶段':<24} {'开始(s)':>8} {'结束(s)':>8} {'耗时(s)':>8}  状态"]
+        total_work = 0.0
+        makespan = 0.0
+        for name in self.topological_order():
+            info = self.results.get(name, {})
+            if 'start' in info:
+                offset = info['start'] - self._run_start
+                makespan = max(makespan, offset + info['wall'])
+                total_work += info['wall']
+                lines.append(f"{name:<24} {offset:>8.2f} {offset + info['wall']:>8.2f} "
+                             f"{info['wall']:>8.2f}  {info['status']}")
+            else:
+                lines.append(f"{name:<24} {'-':>8} {'-':>8} {'-':>8}  {info.get('status', '-')}")
+        path = self.critical_path()
+        path_time = sum(self.results.get(name, {}).get('wall', 0.0) for name in path)
+        lines.append(f"关键路径: {' -> '.join(path)}（{path_time:.2f} 秒）")
+        if makespan > 0:
+            lines.append(f"端到端 {makespan:.2f} 秒，各阶段串行合计 {total_work:.2f} 秒，"
+                         f"并行加速 {total_work / makespan:.2f}x")
+        return '\n'.join(lines)
@@ -0,0 +1,131 @@
+"""
+流水线阶段计时模块
+以上下文管理器/装饰器的形式包裹各阶段，记录墙钟时间、CPU时间和
+（可选的）tracemalloc内存峰值，运行结束后输出JSON运行报告，便于比较不同批次的运行
+
+tracemalloc会让分配密集的阶段慢一个数量级，因此内存统计默认关闭，只在排查内存时开启
+"""
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+from typing import Dict, List, Optional
+
+REPORT_DIR = 'run_reports'
+
+
+class StageRecorder:
+    def __init__(self, track_memory: bool = False):
+        self.track_memory = track_memory
+        self.records: List[Dict] = []
+        self.started_at = datetime.now()
+        self._start_wall = time.perf_counter()
+        # 每个进行中阶段（含嵌套）各自已观测到的内存峰值
+        self._peak_stack: List[int] = []
+
+    def _start_tracing(self):
+        if self.track_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def _collect_peak(self):
+        """
+        读取并重置tracemalloc峰值，把它计入所有进行中的阶段
+        """
+        _, peak = tracemalloc.get_traced_memory()
+        if hasattr(tracemalloc, 'reset_peak'):
+            tracemalloc.reset_peak()
+        for i, value in enumerate(self._peak_stack):
+            self._peak_stack[i] = max(value, peak)
+
+    @contextmanager
+    def stage(self, name: str, **meta):
+        """
+        记录一个阶段: with recorder.stage('excel'): ...
+        yield 的字典可在阶段内补充自定义字段（如处理条数）
+        """
+        record = {'stage': name, 'status': 'ok'}
+        record.update(meta)
+
+        if self.track_memory:
+            self._start_tracing()
+            self._collect_peak()
+            start_mem, _ = tracemalloc.get_traced_memory()
+            self._peak_stack.append(start_mem)
+
+        start_wall = time.perf_counter()
+        start_cpu = time.process_time()
+        try:
+            yield record
+        except BaseException as e:
+            record['status'] = 'error'
+            record['error'] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            record['wall_ms'] = round((time.perf_counter() - start_wall) * 1000, 3)
+            record['cpu_ms'] = round((time.process_time() - start_cpu) * 1000, 3)
+            if self.track_memory:
+                self._collect_peak()
+                peak = self._peak_stack.pop()
+                # 峰值为绝对值；增量为相对阶段开始时已分配内存的增长
+                record['peak_mem_kb'] = round(peak / 1024, 1)
+                record['peak_delta_kb'] = round((peak - start_mem) / 1024, 1)
+            self.records.append(record)
+
+    def timed(self, name: Optional[str] = None):
+        """
+        装饰器形式，返回值保持不变（与 timing_decorator 不同，计时结果写入 records）
+        """
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.stage(name or func.__name__):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def summary(self) -> str:
+        lines = [f"{'阶段':<24} {'墙钟(ms)':>12} {'CPU(ms)':>12} {'内存增量峰值(KB)':>14}  状态"]
+        for r in self.records:
+            peak = f"{r['peak_delta_kb']:.1f}" if 'peak_delta_kb' in r else '-'
+            lines.append(f"{r['stage']:<24} {r['wall_ms']:>12.1f} {r['cpu_ms']:>12.1f} {peak:>14}  {r['status']}")
+        return '\n'.join(lines)
+
+    def report(self, **extra) -> Dict:
+        report = {
+            'started_at': self.started_at.isoformat(timespec='seconds'),
+            'finished_at': datetime.now().isoformat(timespec='seconds'),
+            'total_wall_ms': round((time.perf_counter() - self._start_wall) * 1000, 3),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'stages': self.records,
+        }
+        report.update(extra)
+        return report
+
+    def save_report(self, report_dir: str = REPORT_DIR, **extra) -> str:
+        """
+        将运行报告写入 report_dir/run_YYYYmmdd_HHMMSS.json，返回文件路径
+        """
+        os.makedirs(report_dir, exist_ok=True)
+        path = os.path.join(report_dir, f"run_{self.started_at.strftime('%Y%m%d_%H%M%S')}.json")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(**extra), f, ensure_ascii=False, indent=2)
+        if self.track_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        return path
+
+
+if __name__ == '__main__':
+    recorder = StageRecorder(track_memory=True)
+    with recorder.stage('build_list') as record:
+        data = [str(i) * 10 for i in range(100000)]
+        record['items'] = len(data)
+    with recorder.stage('sort'):
+        data.sort()
+    print(recorder.summary())
+    print(f"运行报告已保存到: {recorder.save_report()}")
@@ -0,0 +1,164 @@
+"""
+本地B站接口替身服务器
+基于 DanmakuGenerator 在本机提供搜索、分P、XML/protobuf弹幕接口，
+用于在不访问真实网络的情况下对爬虫做性能分析和基准测试
+"""
+import json
+import threading
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs, urlparse
+
+from bili_credentials import sign_wbi_params
+from danmaku_generator import DanmakuGenerator
+
+# 替身服务器的WBI密钥（/x/web-interface/nav 返回，WBI接口按此校验签名）
+STUB_IMG_KEY = '7cd084941338484aae1ad9425b84077c'
+STUB_SUB_KEY = '4932caff0ff746eab6f01bf08b70ac45'
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        # 屏蔽默认的逐请求日志
+        pass
+
+    def _send(self, status: int, body: bytes, content_type: str, extra_headers: Optional[dict] = None):
+        compress = self.server.compress and 'deflate' in self.headers.get('Accept-Encoding', '')
+        if compress:
+            body = zlib.compress(body)
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        if compress:
+            self.send_header('Content-Encoding', 'deflate')
+        for key, value in (extra_headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, data: dict):
+        self._send(200, json.dumps(data, ensure_ascii=False).encode('utf-8'), 'application/json; charset=utf-8')
+
+    def _wbi_valid(self, query: dict) -> bool:
+        """
+        与B站一致：去掉w_rid后重新签名比较，并要求带有buvid3 cookie
+        """
+        if 'buvid3=' not in self.headers.get('Cookie', ''):
+            return False
+        params = {k: v for k, v in query.items() if k not in ('w_rid', 'wts')}
+        if 'w_rid' not in query or 'wts' not in query:
+            return False
+        expected = sign_wbi_params(params, STUB_IMG_KEY, STUB_SUB_KEY, wts=int(query['wts']))
+        return expected['w_rid'] == query['w_rid']
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.request_count += 1
+            count = server.request_count
+
+        # 按配置周期性返回412，模拟B站风控
+        if server.throttle_every and count % server.throttle_every == 0:
+            self._send(412, b'{"code":-412,"message":"request was banned"}', 'application/json')
+            return
+
+        url = urlparse(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        generator = server.generator
+
+        if url.path in ('/', ''):
+            self._send(200, b'<html><body>stub</body></html>', 'text/html; charset=utf-8',
+                       {'Set-Cookie': 'buvid3=STUB-BUVID3; Path=/'})
+        elif url.path == '/x/frontend/finger/spi':
+            with server.lock:
+                server.credential_requests += 1
+            self._send_json({'code': 0, 'message': 'ok',
+                             'data': {'b_3': 'STUB-BUVID3-infoc', 'b_4': 'STUB-BUVID4-infoc'}})
+        elif url.path == '/x/web-interface/nav':
+            with server.lock:
+                server.credential_requests += 1
+            self._send_json({'code': -101, 'message': '账号未登录', 'data': {
+                'isLogin': False,
+                'wbi_img': {'img_url': f'https://i0.hdslb.com/bfs/wbi/{STUB_IMG_KEY}.png',
+                            'sub_url': f'https://i0.hdslb.com/bfs/wbi/{STUB_SUB_KEY}.png'}}})
+        elif url.path in ('/x/web-interface/search/type', '/x/web-interface/wbi/search/type'):
+            if url.path.startswith('/x/web-interface/wbi/') and not self._wbi_valid(query):
+                self._send_json({'code': -352, 'message': '风控校验失败'})
+                return
+            self._send_json(generator.search_response(
+                query.get('keyword', ''), int(query.get('page', 1)),
+                int(query.get('pagesize', 20)), server.total_videos))
+        elif url.path == '/x/player/pagelist':
+            self._send_json(generator.pagelist_response(query.get('bvid', '')))
+        elif url.path == '/x/v1/dm/list.so':
+            body = generator.xml_response(int(query.get('oid', 0)), server.danmaku_per_video)
+            self._send(200, body, 'text/xml; charset=utf-8')
+        elif url.path == '/x/v2/dm/web/seg.so':
+            body = generator.protobuf_response(int(query.get('oid', 0)), server.danmaku_per_video)
+            self._send(200, body, 'application/octet-stream')
+        else:
+            self._send(404, b'{"code":-404,"message":"not found"}', 'application/json')
+
+
+class StubBilibiliServer:
+    def __init__(self, generator: DanmakuGenerator = None, host: str = '127.0.0.1', port: int = 0,
+                 danmaku_per_video: int = 1000, total_videos: int = 1000,
+                 throttle_every: int = 0, compress: bool = True):
+        self._httpd = ThreadingHTTPServer((host, port), _StubHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.generator = generator or DanmakuGenerator()
+        self._httpd.danmaku_per_video = danmaku_per_video
+        self._httpd.total_videos = total_videos
+        self._httpd.throttle_every = throttle_every
+        self._httpd.compress = compress
+        self._httpd.request_count = 0
+        self._httpd.credential_requests = 0
+        self._httpd.lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def request_count(self) -> int:
+        return self._httpd.request_count
+
+    @property
+    def credential_requests(self) -> int:
+        """
+        buvid/WBI密钥接口被请求的次数（用于确认凭据缓存生效）
+        """
+        return self._httpd.credential_requests
+
+    def start(self) -> 'StubBilibiliServer':
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+
+if __name__ == '__main__':
+    import time
+    with StubBilibiliServer(port=8765) as server:
+        print(f"替身服务器已启动: {server.url} （Ctrl+C 退出）")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,109 @@
+"""
+常驻分析服务与离线统计（DanmakuProcessor / DataAnalyzer）的对照测试
+运行: python -m pytest -q test_analysis_server.py
+"""
+import io
+import json
+import urllib.error
+import urllib.request
+from collections import Counter
+from contextlib import redirect_stdout
+
+import pytest
+
+from analysis_server import AnalysisServer, AnalysisState
+from danmaku_generator import DanmakuGenerator
+from data_analyzer import DataAnalyzer
+from data_processor import DanmakuProcessor
+
+VIDEOS = ['BV1', 'BV2', 'BV3']
+# 足以取回全部候选的 k
+MAX_ITEMS = 10000
+
+
+@pytest.fixture(scope='module')
+def batches():
+    generator = DanmakuGenerator(seed=21)
+    return {bvid: generator.generate(2000) for bvid in VIDEOS}
+
+
+@pytest.fixture(scope='module')
+def state(batches):
+    state = AnalysisState()
+    for bvid, texts in batches.items():
+        # 分两次导入，覆盖增量导入时已有文本的复用
+        state.ingest(texts[:1500], bvid)
+        state.ingest(texts[1500:], bvid)
+    return state
+
+
+def _filtered(texts):
+    with redirect_stdout(io.StringIO()):
+        return DanmakuProcessor().filter_danmaku(texts)
+
+
+def test_sentiment_totals_match_data_analyzer(state, batches):
+    analyzer = DataAnalyzer()
+    everything = [text for texts in batches.values() for text in texts]
+    expected = analyzer.analyze_sentiment(_filtered(everything))
+    breakdown = state.sentiment_breakdown()
+    for key in ('positive', 'negative', 'neutral', 'positive_rate', 'negative_rate'):
+        assert breakdown[key] == pytest.approx(expected[key])
+    assert breakdown['total'] == len(_filtered(everything))
+
+    per_video = analyzer.analyze_sentiment(_filtered(batches['BV2']))
+    breakdown = state.sentiment_breakdown(video='BV2')
+    assert (breakdown['positive'], breakdown['negative']) == (per_video['positive'], per_video['negative'])
+
+
+def test_topk_matches_count_word_frequency(state, batches):
+    everything = [text for texts in batches.values() for text in texts]
+    filtered = _filtered(everything)
+    expected = DanmakuProcessor().count_word_frequency(filtered, 8)
+    assert [{key: item[key] for key in ('rank', 'danmaku', 'count')} for item in state.topk(k=8)] == expected
+    summary = state.summary()
+    assert summary['total'] == len(everything) and summary['kept'] == len(filtered)
+    assert summary['videos'] == len(VIDEOS)
+
+
+def test_keyword_and_video_queries_match_full_scan(state, batches):
+    filtered = _filtered(batches['BV3'])
+    for keyword in ('大模型', 'GPT', '成本', '不在语料中的词'):
+        expected = Counter(text for text in filtered if keyword in text)
+        items = state.topk(keyword=keyword, video='BV3', k=MAX_ITEMS)
+        assert {item['danmaku']: item['count'] for item in items} == dict(expected)
+    assert state.topk(video='BV-missing') == []
+    assert state.samples(video='BV-missing') == []
+
+
+def test_samples_filter_by_sentiment(state):
+    analyzer = DataAnalyzer()
+    samples = state.samples(keyword='大模型', sentiment='negative', n=5)
+    assert 0 < len(samples) <= 5
+    assert all('大模型' in text and analyzer.sentiment_label(text) == -1 for text in samples)
+    assert state.samples(n=0) == []
+
+
+def _request(url, body=None):
+    data = body if body is None or isinstance(body, bytes) else json.dumps(body).encode('utf-8')
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, data=data), timeout=5) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def test_http_ingest_and_queries():
+    with AnalysisServer(port=0) as server:
+        status, result = _request(server.url + '/ingest', {'bvid': 'BV9', 'danmaku': ['大模型真厉害', '666', '大模型真厉害']})
+        assert status == 200 and (result['added'], result['noise']) == (3, 1)
+        status, result = _request(server.url + '/topk?video=BV9')
+        assert result['items'][0]['danmaku'] == '大模型真厉害' and result['items'][0]['count'] == 2
+        assert _request(server.url + '/samples?n=0')[1]['items'] == []
+
+        for bad in (b'not json', b'[]', {'danmaku': '一条'}, {'danmaku': [1]}, {'bvid': 1, 'danmaku': []}, {}):
+            assert _request(server.url + '/ingest', bad)[0] == 400
+        assert _request(server.url + '/topk?k=abc')[0] == 400
+        assert _request(server.url + '/samples?sentiment=angry')[0] == 400
+        assert _request(server.url + '/missing')[0] == 404
+        assert _request(server.url + '/summary')[1]['total'] == 3
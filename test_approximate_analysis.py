@@ -0,0 +1,132 @@
+"""
+抽样估计与精确统计的对照测试：置信区间覆盖率、样本量公式和蓄水池抽样的均匀性
+运行: python -m pytest -q test_approximate_analysis.py
+"""
+import random
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from approximate_analysis import (ApproximateAnalyzer, _allocate, required_sample_size, reservoir_sample,
+                                  wilson_interval, z_score)
+from danmaku_generator import DanmakuGenerator
+from danmaku_timeline import DanmakuTimeline
+from data_analyzer import DataAnalyzer
+
+TRIALS = 300
+
+
+@pytest.fixture(scope='module')
+def danmaku():
+    return DanmakuGenerator(seed=17).generate(20000)
+
+
+@pytest.fixture(scope='module')
+def exact(danmaku):
+    analyzer = DataAnalyzer()
+    sentiment = analyzer.analyze_sentiment(danmaku)
+    cost = sum(1 for text in danmaku if any(kw in text for kw in analyzer.cost_keywords)) / len(danmaku)
+    return {'positive': sentiment['positive_rate'], 'negative': sentiment['negative_rate'], 'cost': cost}
+
+
+@pytest.fixture(scope='module')
+def timeline(danmaku):
+    # 各视频弹幕数差异较大，覆盖按比例分配样本量
+    rng = random.Random(5)
+    timeline = DanmakuTimeline()
+    for v in range(12):
+        timeline.add_video(f'BV{v}')
+    for _ in danmaku:
+        timeline.append(0.0, 0, min(int(rng.expovariate(0.3)), 11))
+    return timeline
+
+
+def _coverage(danmaku, exact, timeline=None):
+    analyzer = ApproximateAnalyzer(target_error=0.05, seed=123)
+    keywords = analyzer.analyzer.cost_keywords
+    hits = Counter()
+    for _ in range(TRIALS):
+        sample = analyzer.sample(danmaku, timeline)
+        sentiment = analyzer.analyze_sentiment(sample)
+        estimates = {'positive': sentiment['positive'], 'negative': sentiment['negative'],
+                     'cost': analyzer.analyze_keyword_share(sample, keywords)}
+        for name, estimate in estimates.items():
+            hits[name] += estimate['low'] <= exact[name] <= estimate['high']
+    return sample['method'], {name: hits[name] / TRIALS for name in exact}
+
+
+def test_random_sample_intervals_cover_exact_rate(danmaku, exact):
+    method, coverage = _coverage(danmaku, exact)
+    assert method == 'random'
+    for name, rate in coverage.items():
+        assert 0.90 <= rate <= 0.995, (name, rate)
+
+
+def test_stratified_sample_intervals_cover_exact_rate(danmaku, exact, timeline):
+    method, coverage = _coverage(danmaku, exact, timeline)
+    assert method == 'stratified'
+    for name, rate in coverage.items():
+        assert 0.90 <= rate <= 0.995, (name, rate)
+
+
+def test_reservoir_sample_interval_covers_exact_rate(danmaku, exact):
+    analyzer = ApproximateAnalyzer(target_error=0.05, seed=7)
+    hits = 0
+    for _ in range(100):
+        sample = analyzer.sample(iter(danmaku))
+        assert sample['method'] == 'reservoir' and sample['population'] == len(danmaku)
+        estimate = analyzer.analyze_sentiment(sample)['positive']
+        hits += estimate['low'] <= exact['positive'] <= estimate['high']
+    assert hits >= 88
+
+
+def test_full_population_sample_is_exact(exact, danmaku):
+    small = danmaku[:50]
+    analyzer = ApproximateAnalyzer(target_error=0.01, seed=1)
+    sample = analyzer.sample(small)
+    assert sample['size'] == len(small)
+    positive = analyzer.analyze_sentiment(sample)['positive']
+    expected = DataAnalyzer().analyze_sentiment(small)['positive_rate']
+    assert positive['low'] == positive['high'] == pytest.approx(expected)
+
+
+def test_required_sample_size_formula():
+    z = z_score(0.95)
+    assert z == pytest.approx(1.959964, abs=1e-6)
+    assert required_sample_size(0.01) == 9604
+    assert required_sample_size(0.05) == 385
+    n0 = z * z * 0.25 / 0.01 ** 2
+    assert required_sample_size(0.01, population=1000) == int(np.ceil(n0 / (1 + (n0 - 1) / 1000)))
+    assert required_sample_size(0.01, population=50) == 50
+    with pytest.raises(ValueError):
+        required_sample_size(0)
+
+
+def test_wilson_interval_bounds():
+    assert wilson_interval(0.0, 100)[0] == 0.0
+    assert wilson_interval(1.0, 100)[1] == 1.0
+    low, high = wilson_interval(0.3, 1000)
+    assert low < 0.3 < high and high - low < 0.06
+    assert wilson_interval(0.5, 0) == (0.0, 1.0)
+
+
+def test_reservoir_sample_is_uniform():
+    rng = random.Random(11)
+    counts = Counter()
+    runs = 4000
+    for _ in range(runs):
+        sample, seen = reservoir_sample(range(40), 5, rng)
+        assert seen == 40 and len(set(sample)) == 5
+        counts.update(sample)
+    expected = runs * 5 / 40
+    assert all(abs(counts[i] - expected) < 0.15 * expected for i in range(40))
+    assert reservoir_sample(range(3), 5, rng) == ([0, 1, 2], 3)
+
+
+def test_allocate_is_proportional():
+    sizes = np.array([1000, 10, 1, 0, 500])
+    alloc = _allocate(sizes, 100)
+    assert alloc.tolist()[3] == 0 and all(alloc[sizes > 0] >= 1)
+    assert all(alloc <= sizes)
+    assert abs(int(alloc.sum()) - 100) <= 2
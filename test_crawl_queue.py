@@ -0,0 +1,197 @@
+"""
+crawl_queue 的崩溃与租约过期测试
+运行: python -m pytest -q test_crawl_queue.py
+"""
+import time
+
+import pytest
+
+from crawl_queue import (STATUS_CLAIMED, STATUS_DONE, STATUS_FAILED, STATUS_PENDING, InMemoryRedis,
+                         RedisWorkQueue, SQLiteWorkQueue, WorkQueue)
+
+RESULT = {'status': 'ok', 'danmaku': ['弹幕'], 'p': ['1,1']}
+
+
+def _tasks(*bvids, priority=0):
+    return [{'bvid': bvid, 'title': bvid, 'priority': priority} for bvid in bvids]
+
+
+@pytest.fixture(params=['redis', 'sqlite'])
+def queue(request, tmp_path):
+    if request.param == 'redis':
+        q = RedisWorkQueue(InMemoryRedis())
+    else:
+        q = SQLiteWorkQueue(str(tmp_path / 'queue.db'))
+    yield q
+    q.close()
+
+
+def test_base_class_is_abstract():
+    with pytest.raises(TypeError):
+        WorkQueue()
+
+
+def test_expired_lease_is_reclaimed(queue):
+    queue.enqueue(_tasks('BV1'))
+    queue.mark_enqueue_done()
+    # 工作节点领取后崩溃，既不complete也不fail
+    assert queue.claim('crashed', lease_seconds=0.05)['bvid'] == 'BV1'
+    assert queue.claim('other') is None
+    assert not queue.is_drained()
+
+    time.sleep(0.1)
+    task = queue.claim('other')
+    assert task['bvid'] == 'BV1'
+    assert queue.stats()[STATUS_CLAIMED] == 1
+    queue.complete('BV1', RESULT)
+    assert queue.is_drained()
+    assert [(t['bvid'], r) for t, r in queue.results()] == [('BV1', RESULT)]
+
+
+def test_reclaimed_attempts_count_towards_failure(queue):
+    queue.enqueue(_tasks('BV1'))
+    queue.claim('crashed', lease_seconds=0.01)
+    time.sleep(0.05)
+    queue.claim('w1', lease_seconds=0.01)
+    time.sleep(0.05)
+    queue.claim('w2')
+    queue.fail('BV1', 'boom', max_attempts=3)
+    stats = queue.stats()
+    assert stats[STATUS_FAILED] == 1 and stats[STATUS_PENDING] == 0
+
+
+def test_fail_requeues_until_max_attempts(queue):
+    queue.enqueue(_tasks('BV1'))
+    queue.claim('w')
+    queue.fail('BV1', 'timeout', max_attempts=2)
+    assert queue.stats()[STATUS_PENDING] == 1
+    queue.claim('w')
+    queue.fail('BV1', 'timeout', max_attempts=2)
+    assert queue.stats()[STATUS_FAILED] == 1
+    assert queue.claim('w') is None
+
+
+def test_sqlite_lease_survives_reopen(tmp_path):
+    path = str(tmp_path / 'queue.db')
+    q = SQLiteWorkQueue(path)
+    q.enqueue(_tasks('BV1', 'BV2'))
+    q.claim('crashed', lease_seconds=0.05)
+    # 模拟进程崩溃：连接直接关闭，由另一个进程重新打开同一文件
+    q.close()
+
+    q = SQLiteWorkQueue(path)
+    assert q.claim('other')['bvid'] == 'BV2'
+    time.sleep(0.1)
+    assert q.claim('other')['bvid'] == 'BV1'
+    q.close()
+
+
+def test_redis_crash_before_exec_keeps_task_pending(monkeypatch):
+    client = InMemoryRedis()
+    queue = RedisWorkQueue(client)
+    queue.enqueue(_tasks('BV1'))
+    queue.mark_enqueue_done()
+
+    original = client.pipeline
+
+    def crashing_pipeline(*args, **kwargs):
+        pipe = original(*args, **kwargs)
+
+        def execute():
+            pipe.reset()
+            raise ConnectionError("连接在EXEC之前断开")
+        pipe.execute = execute
+        return pipe
+
+    monkeypatch.setattr(client, 'pipeline', crashing_pipeline)
+    with pytest.raises(ConnectionError):
+        queue.claim('crashed')
+    monkeypatch.setattr(client, 'pipeline', original)
+
+    # 事务未提交：任务仍在待领取集合中，没有留下状态与集合不一致的中间态
+    assert queue.stats()[STATUS_PENDING] == 1
+    assert client.hgetall(queue._key('leases')) == {}
+    assert queue.claim('other')['bvid'] == 'BV1'
+    queue.complete('BV1', RESULT)
+    assert queue.is_drained()
+
+
+def test_redis_concurrent_claim_retries_on_watch_conflict():
+    client = InMemoryRedis()
+    queue = RedisWorkQueue(client)
+    queue.enqueue(_tasks('BV1', 'BV2'))
+
+    # 在第一个事务 WATCH 之后、EXEC 之前插入另一个节点的领取
+    original = client.zrevrange
+    interfered = []
+
+    def zrevrange(key, start, end):
+        result = original(key, start, end)
+        if not interfered:
+            client.zrevrange = original
+            interfered.append(RedisWorkQueue(client).claim('fast')['bvid'])
+            assert interfered == result
+        return result
+
+    client.zrevrange = zrevrange
+    task = queue.claim('slow')
+    assert {task['bvid'], interfered[0]} == {'BV1', 'BV2'}
+    assert client.hget(queue._key('attempts'), 'BV1') == '1'
+    assert client.hget(queue._key('attempts'), 'BV2') == '1'
+    assert queue.stats()[STATUS_CLAIMED] == 2
+
+
+def test_in_memory_zpopmax_breaks_ties_like_redis():
+    client = InMemoryRedis()
+    client.zadd('z', {'b': 1, 'a': 1, 'c': 1, 'low': 0, 'high': 2})
+    assert client.zrevrange('z', 0, -1) == ['high', 'c', 'b', 'a', 'low']
+    assert client.zpopmax('z', 4) == [('high', 2.0), ('c', 1.0), ('b', 1.0), ('a', 1.0)]
+    client.zadd('z', {'low': 5})
+    assert client.zpopmax('z') == [('low', 5.0)]
+    assert client.zcard('z') == 0
+
+
+def test_priority_order(queue):
+    queue.enqueue(_tasks('BV_a', 'BV_b') + _tasks('BV_top', priority=10))
+    assert queue.claim('w')['bvid'] == 'BV_top'
+    queue.complete('BV_top', RESULT)
+    assert queue.stats()[STATUS_DONE] == 1
+
+
+def test_stale_worker_cannot_complete_or_fail(queue):
+    queue.enqueue(_tasks('BV1'))
+    queue.claim('stale', lease_seconds=0.01)
+    time.sleep(0.05)
+    assert queue.claim('owner')['bvid'] == 'BV1'
+    # 租约过期的旧节点的结果和失败都不会覆盖新持有者
+    assert not queue.complete('BV1', {'status': 'ok', 'danmaku': ['旧'], 'p': ['']}, worker_id='stale')
+    assert not queue.fail('BV1', 'late error', worker_id='stale')
+    assert queue.stats()[STATUS_CLAIMED] == 1
+    assert queue.complete('BV1', RESULT, worker_id='owner')
+    assert [r for _, r in queue.results()] == [RESULT]
+    assert not queue.complete('BV1', RESULT, worker_id='owner')
+
+
+def test_redis_enqueue_crash_before_exec_leaves_no_trace(monkeypatch):
+    client = InMemoryRedis()
+    queue = RedisWorkQueue(client)
+    original = client.pipeline
+
+    def crashing_pipeline(*args, **kwargs):
+        pipe = original(*args, **kwargs)
+
+        def execute():
+            pipe.reset()
+            raise ConnectionError("连接在EXEC之前断开")
+        pipe.execute = execute
+        return pipe
+
+    monkeypatch.setattr(client, 'pipeline', crashing_pipeline)
+    with pytest.raises(ConnectionError):
+        queue.enqueue(_tasks('BV1'))
+    monkeypatch.setattr(client, 'pipeline', original)
+
+    # 去重集合中没有残留，重新入队即可完整写入
+    assert queue.stats()['total'] == 0
+    assert queue.enqueue(_tasks('BV1', 'BV1')) == 1
+    assert queue.claim('w')['seq'] == 1
@@ -0,0 +1,75 @@
+"""
+紧凑语料与普通弹幕列表的等价性测试
+运行: python -m pytest -q test_danmaku_corpus.py
+"""
+import io
+from collections import Counter
+from contextlib import redirect_stdout
+
+import pytest
+
+from danmaku_corpus import DanmakuCorpus, iter_weighted
+from danmaku_generator import DanmakuGenerator
+from data_processor import DanmakuProcessor
+
+# 空串、多字节字符和emoji都要在字节缓冲区中原样往返
+EDGE_CASES = ['', '6', '666', '大模型', '大模型', 'emoji😀', '换\n行', '', 'ＧＰＴ']
+
+
+@pytest.fixture(scope='module')
+def danmaku():
+    return DanmakuGenerator(seed=11).generate(5000) + EDGE_CASES
+
+
+def test_round_trip_matches_list(danmaku):
+    corpus = DanmakuCorpus.from_iterable(danmaku)
+    assert len(corpus) == len(danmaku)
+    assert list(corpus) == danmaku
+    assert corpus[3] == danmaku[3] and corpus[-1] == danmaku[-1]
+    assert corpus[10:20] == danmaku[10:20]
+
+
+def test_unique_counts_match_counter(danmaku):
+    corpus = DanmakuCorpus.from_iterable(danmaku)
+    expected = Counter(danmaku)
+    assert corpus.unique_count == len(expected)
+    assert dict(corpus.iter_unique()) == dict(expected)
+    assert list(corpus.iter_unique_texts()) == list(expected)
+
+    weighted = Counter()
+    for text, weight in iter_weighted(danmaku):
+        weighted[text] += weight
+    assert dict(iter_weighted(corpus)) == dict(weighted)
+
+
+def test_filter_matches_list_comprehension(danmaku):
+    corpus = DanmakuCorpus.from_iterable(danmaku)
+    calls = Counter()
+
+    def predicate(text):
+        calls[text] += 1
+        return '模型' in text
+
+    filtered = corpus.filter(predicate)
+    assert list(filtered) == [text for text in danmaku if '模型' in text]
+    # 谓词对每个唯一文本只调用一次
+    assert set(calls.values()) == {1}
+
+
+def test_append_after_freeze_reuses_ids():
+    corpus = DanmakuCorpus.from_iterable(['a', 'b', 'a'])
+    corpus.freeze()
+    assert corpus.append('b') == 1
+    assert corpus.append('c') == 2
+    assert list(corpus) == ['a', 'b', 'a', 'b', 'c']
+    assert list(corpus.counts()) == [2, 2, 1]
+
+
+def test_processor_stats_match_list(danmaku):
+    processor = DanmakuProcessor()
+    with redirect_stdout(io.StringIO()):
+        expected = processor.get_all_stats(danmaku)
+        stats = processor.get_all_stats(DanmakuCorpus.from_iterable(danmaku))
+    assert stats['top_8_danmaku'] == expected['top_8_danmaku']
+    assert stats['total_count'] == expected['total_count']
+    assert list(stats['all_danmaku']) == list(expected['all_danmaku'])
@@ -0,0 +1,79 @@
+"""
+内存映射缓存加载器与逐行读取的等价性测试
+运行: python -m pytest -q test_danmaku_loader.py
+"""
+import os
+
+import pytest
+
+from danmaku_generator import DanmakuGenerator
+from danmaku_loader import DanmakuCache, load_cache, save_cache
+
+# 空行、仅空白行（含全角空格）、首尾空白和Windows换行
+EDGE_CASES = ['', '  ', '　　', ' 前后空格 ', 'emoji😀', '末尾回车\r', '\t制表符', '666']
+
+
+def _reference(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+@pytest.fixture
+def cache_file(tmp_path):
+    path = str(tmp_path / 'danmaku_cache.txt')
+    save_cache(DanmakuGenerator(seed=5).generate(3000) + EDGE_CASES, path)
+    return path
+
+
+def test_iteration_matches_line_reader(cache_file):
+    expected = _reference(cache_file)
+    with DanmakuCache(cache_file) as cache:
+        assert len(cache) == len(expected)
+        assert list(cache) == expected
+        assert [str(raw, 'utf-8').strip() for raw in cache.iter_bytes()] == expected
+
+
+def test_random_access(cache_file):
+    expected = _reference(cache_file)
+    with DanmakuCache(cache_file) as cache:
+        for i in (0, 1, len(expected) // 2, len(expected) - 1, -1, -len(expected)):
+            assert cache[i] == expected[i]
+        assert cache[5:15] == expected[5:15]
+        assert cache[::500] == expected[::500]
+        with pytest.raises(IndexError):
+            cache[len(expected)]
+
+
+def test_index_is_reused_until_cache_changes(cache_file, capsys):
+    DanmakuCache(cache_file).close()
+    assert '建立行索引' in capsys.readouterr().out
+    DanmakuCache(cache_file).close()
+    assert '建立行索引' not in capsys.readouterr().out
+
+    save_cache(['新弹幕', '', '第二条'], cache_file)
+    with DanmakuCache(cache_file) as cache:
+        assert list(cache) == ['新弹幕', '第二条']
+
+
+def test_mismatched_or_truncated_index_is_rebuilt(cache_file):
+    expected = _reference(cache_file)
+    DanmakuCache(cache_file).close()
+    index_file = cache_file + '.idx'
+    with open(index_file, 'r+b') as f:
+        f.truncate(os.path.getsize(index_file) - 8)
+    with DanmakuCache(cache_file) as cache:
+        assert list(cache) == expected
+
+    # 文件头魔数损坏时同样重建
+    with open(index_file, 'r+b') as f:
+        f.write(b'XXXX')
+    with DanmakuCache(cache_file) as cache:
+        assert list(cache) == expected
+
+
+def test_empty_and_missing_cache(tmp_path):
+    path = str(tmp_path / 'empty.txt')
+    save_cache([], path)
+    with DanmakuCache(path) as cache:
+        assert len(cache) == 0 and list(cache) == []
+    assert load_cache(str(tmp_path / 'missing.txt')) is None
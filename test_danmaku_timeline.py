@@ -0,0 +1,104 @@
+"""
+弹幕时间分布的NumPy实现与逐条Python参考实现的对照测试
+运行: python -m pytest -q test_danmaku_timeline.py
+"""
+import math
+import random
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from danmaku_timeline import DanmakuTimeline, TimelineAnalyzer
+
+BEIJING = timezone(timedelta(hours=8))
+
+
+@pytest.fixture(scope='module')
+def timeline():
+    rng = random.Random(3)
+    timeline = DanmakuTimeline()
+    for v in range(6):
+        vid = timeline.add_video(f'BV{v}')
+        for _ in range(rng.randint(0, 400)):
+            offset = rng.choice([rng.uniform(0, 900), -1.0, float('nan'), 1e9])
+            timestamp = rng.choice([0, rng.randint(1_600_000_000, 1_700_000_000)])
+            timeline.append_p(f'{offset},1,25,16777215,{timestamp},0,abc,1', vid)
+    return timeline
+
+
+def _reference_hotspots(timeline, bucket_seconds, top_k):
+    buckets = defaultdict(Counter)
+    for offset, vid in zip(timeline.offsets, timeline.video_ids):
+        if not math.isfinite(offset) or offset < 0:
+            offset = 0
+        buckets[vid][int(offset // bucket_seconds)] += 1
+    totals = [sum(buckets[vid].values()) for vid in range(len(timeline.videos))]
+    result = []
+    for vid in sorted(range(len(totals)), key=lambda v: -totals[v]):
+        if totals[vid] == 0:
+            break
+        top = sorted(buckets[vid].items(), key=lambda item: (-item[1], item[0]))[:top_k]
+        result.append({
+            'bvid': timeline.videos[vid],
+            'total': totals[vid],
+            'hotspots': [(bucket * bucket_seconds, count) for bucket, count in top]
+        })
+    return result
+
+
+def _reference_daily(timeline, labels):
+    days = defaultdict(Counter)
+    for timestamp, label in zip(timeline.timestamps, labels):
+        if timestamp > 0:
+            date = datetime.fromtimestamp(timestamp, tz=BEIJING).strftime('%Y-%m-%d')
+            days[date][label] += 1
+    return [
+        {'date': date, 'total': sum(c.values()), 'positive': c[1], 'negative': c[-1], 'neutral': c[0]}
+        for date, c in sorted(days.items())
+    ]
+
+
+@pytest.mark.parametrize('bucket_seconds,top_k', [(30, 3), (7, 5), (600, 1)])
+def test_hotspots_match_reference(timeline, bucket_seconds, top_k):
+    analyzer = TimelineAnalyzer(bucket_seconds)
+    assert analyzer.hotspot_timelines(timeline, top_k) == _reference_hotspots(timeline, bucket_seconds, top_k)
+
+
+def test_daily_sentiment_matches_reference(timeline):
+    rng = random.Random(9)
+    labels = [rng.choice([1, -1, 0]) for _ in range(len(timeline))]
+    assert TimelineAnalyzer().daily_sentiment(timeline, labels) == _reference_daily(timeline, labels)
+
+
+def test_save_load_and_select_round_trip(timeline, tmp_path):
+    path = str(tmp_path / 'timeline.bin')
+    timeline.save(path)
+    loaded = DanmakuTimeline.load(path)
+    assert loaded.videos == timeline.videos
+    assert loaded.timestamps == timeline.timestamps and loaded.video_ids == timeline.video_ids
+    assert [x for x in loaded.offsets if x == x] == [x for x in timeline.offsets if x == x]
+
+    mask = [i % 3 == 0 for i in range(len(timeline))]
+    selected = timeline.select(mask)
+    assert list(selected.timestamps) == [t for t, keep in zip(timeline.timestamps, mask) if keep]
+
+
+@pytest.mark.parametrize('p,expected', [
+    ('12.5,1,25,16777215,1700000000,0,abc,1', (12.5, 1700000000)),
+    ('12.5,1,25,16777215,-5,0,abc,1', (12.5, 0)),
+    ('12.5,1,25,16777215,4294967296,0,abc,1', (12.5, 0)),
+    ('bad', (0.0, 0)),
+    ('', (0.0, 0)),
+])
+def test_append_p_keeps_alignment(p, expected):
+    timeline = DanmakuTimeline()
+    timeline.append_p(p, timeline.add_video('BV1'))
+    assert (timeline.offsets[0], timeline.timestamps[0]) == expected
+    assert len(timeline) == 1
+
+
+def test_empty_timeline():
+    analyzer = TimelineAnalyzer()
+    assert analyzer.hotspot_timelines(DanmakuTimeline()) == []
+    assert analyzer.daily_sentiment(DanmakuTimeline(), []) == []
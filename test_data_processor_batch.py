@@ -0,0 +1,59 @@
+"""
+向量化批处理版与逐条循环版的等价性测试
+运行: python -m pytest -q test_data_processor_batch.py
+"""
+import io
+from contextlib import redirect_stdout
+
+import pytest
+
+from danmaku_generator import DanmakuGenerator
+from data_analyzer import DataAnalyzer
+from data_processor import DanmakuProcessor
+from data_processor_batch import DanmakuBatchProcessor
+
+# 覆盖各噪声模式、全角数字/空白、短弹幕和关键词的边界输入
+EDGE_CASES = [
+    '', ' ', 'a', '6', '666', '6666 ', '123 456', '１２３', '　　', 'hello world', 'GPT', 'AI',
+    'LLM', '大模型', '好', '好的', '哈哈哈', '点赞了', '求三连', 'Ok大模型', ' 大模型很强 ', 'ChatGPT yyds',
+    'abc!', '！！！', '大\n模型', '模型', '人工智能模型真贵', 'emoji😀', '😀😀', 'ＧＰＴ好用',
+]
+
+
+@pytest.fixture(scope='module')
+def corpus():
+    return DanmakuGenerator(seed=7).generate(20000) + EDGE_CASES
+
+
+def _quiet(func, *args):
+    with redirect_stdout(io.StringIO()):
+        return func(*args)
+
+
+def test_noise_mask_matches_is_noise(corpus):
+    processor = DanmakuProcessor()
+    batch = DanmakuBatchProcessor()
+    mask = batch.noise_mask(batch.to_series(corpus))
+    assert mask.tolist() == [processor.is_noise(text) for text in corpus]
+
+
+def test_filter_and_stats_match_loop_version(corpus):
+    processor = DanmakuProcessor()
+    batch = DanmakuBatchProcessor()
+    filtered = _quiet(processor.filter_danmaku, corpus)
+    assert _quiet(batch.filter_danmaku, corpus) == filtered
+    assert batch.count_word_frequency(filtered, 8) == processor.count_word_frequency(filtered, 8)
+    stats = _quiet(batch.get_all_stats, corpus)
+    expected = _quiet(processor.get_all_stats, corpus)
+    assert stats['top_8_danmaku'] == expected['top_8_danmaku']
+    assert stats['total_count'] == expected['total_count']
+
+
+def test_analysis_matches_data_analyzer(corpus):
+    analyzer = DataAnalyzer()
+    batch = DanmakuBatchProcessor()
+    filtered = _quiet(DanmakuProcessor().filter_danmaku, corpus)
+    assert batch.analyze_sentiment(filtered) == analyzer.analyze_sentiment(filtered)
+    assert batch.analyze_application_mentions(filtered) == analyzer.analyze_application_mentions(filtered)
+    assert batch.analyze_cost_mentions(filtered) == analyzer.analyze_cost_mentions(filtered)
+    assert batch.analyze_concerns(filtered) == analyzer.analyze_concerns(filtered)
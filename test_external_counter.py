@@ -0,0 +1,96 @@
+"""
+外存计数与 collections.Counter 的对照测试
+运行: python -m pytest -q test_external_counter.py
+"""
+import os
+import pickle
+import random
+from collections import Counter
+
+import pytest
+
+from danmaku_generator import DanmakuGenerator
+from data_processor import DanmakuProcessor
+from external_counter import ExternalCounter
+from visualizer import Visualizer
+
+
+@pytest.fixture(scope='module')
+def keys():
+    # 合成弹幕（高频重复）加上大量只出现一次的长尾
+    rng = random.Random(19)
+    return DanmakuGenerator(seed=19).generate(20000) + [f'长尾{rng.randrange(10 ** 6)}' for _ in range(5000)]
+
+
+def _check_against_counter(counter: ExternalCounter, expected: Counter):
+    assert dict(counter.items()) == dict(expected)
+    assert len(counter) == len(expected)
+    assert counter.total == sum(expected.values())
+    full = list(counter.most_common())
+    assert sorted(full) == sorted(expected.items())
+    assert [count for _, count in full] == sorted(expected.values(), reverse=True)
+    # 并列时顺序可能与Counter不同，只比较次数，且每个键的次数都正确
+    top = counter.most_common(10)
+    assert [count for _, count in top] == [count for _, count in expected.most_common(10)]
+    assert all(expected[key] == count for key, count in top)
+
+
+@pytest.mark.parametrize('memory_budget', [10 ** 9, 64 * 1024, 4 * 1024])
+def test_matches_counter(keys, memory_budget):
+    with ExternalCounter(memory_budget, partitions=8) as counter:
+        counter.update(keys)
+        counter.finalize()
+        assert (counter.spills > 0) == (memory_budget < 10 ** 9)
+        _check_against_counter(counter, Counter(keys))
+
+
+def test_skewed_partition_is_split_recursively(keys):
+    # 预算远小于单个分区的不重复键，触发按新哈希种子细分
+    with ExternalCounter(2 * 1024, partitions=2) as counter:
+        counter.update(keys)
+        _check_against_counter(counter.finalize(), Counter(keys))
+
+
+def test_weighted_updates(keys):
+    weighted = Counter()
+    rng = random.Random(4)
+    with ExternalCounter(16 * 1024, partitions=4) as counter:
+        for key in keys[:3000]:
+            weight = rng.randint(1, 1000)
+            counter.add(key, weight)
+            weighted[key] += weight
+        _check_against_counter(counter.finalize(), weighted)
+
+
+def test_pickled_copy_reads_the_same_runs(keys):
+    counter = ExternalCounter(8 * 1024, partitions=4)
+    counter.update(keys)
+    copy = pickle.loads(pickle.dumps(counter))
+    assert dict(copy.items()) == dict(counter.items())
+    directory = counter._dir
+    assert os.path.isdir(directory)
+    # 副本不负责删除，原对象关闭后临时目录被删除
+    del copy
+    assert os.path.isdir(directory)
+    counter.close()
+    assert not os.path.exists(directory)
+
+
+def test_add_after_finalize_raises():
+    counter = ExternalCounter(1024)
+    counter.add('a')
+    counter.finalize()
+    with pytest.raises(RuntimeError):
+        counter.add('b')
+    assert counter.most_common(5) == [('a', 1)]
+
+
+def test_processor_and_visualizer_match_in_memory(keys):
+    small = keys[:5000]
+    in_memory = DanmakuProcessor().frequency_counter(small)
+    external = DanmakuProcessor(memory_budget=8 * 1024).frequency_counter(small)
+    assert dict(external.items()) == dict(in_memory)
+
+    words = Visualizer().count_words(small[:2000])
+    external_words = Visualizer(memory_budget=8 * 1024).count_words(small[:2000])
+    assert dict(external_words.items()) == dict(words)
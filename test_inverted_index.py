@@ -0,0 +1,86 @@
+"""
+倒排索引查询与逐条全量扫描的对照测试
+运行: python -m pytest -q test_inverted_index.py
+"""
+import os
+
+import jieba
+import pytest
+
+from danmaku_corpus import DanmakuCorpus
+from danmaku_generator import DanmakuGenerator
+from inverted_index import InvertedIndex, parse_query
+
+QUERIES = ['大模型', 'GPT', '模', '成本|价格', '大模型 -免费', '大语言模型 成本|价格|免费', '讲得太快了',
+           '不存在的词', '-大模型', '', '=模型', '=大模型 =成本|=价格']
+KEYWORD_SETS = [['大模型'], ['成本', '价格'], ['讲得太快了'], ['稀有关键词'], ['不存在的词'], ['6']]
+
+
+@pytest.fixture(scope='module')
+def corpus():
+    danmaku = DanmakuGenerator(seed=13).generate(20000)
+    # 只在语料末尾出现的关键词，覆盖 first_rows 分块逐步加大的路径
+    danmaku[-3] = danmaku[-1] = '稀有关键词出现了'
+    return DanmakuCorpus.from_iterable(danmaku)
+
+
+@pytest.fixture(scope='module')
+def index(corpus):
+    return InvertedIndex.build(corpus)
+
+
+def _matches(term, text):
+    if term.startswith('='):
+        return term[1:] in {word.strip() for word in jieba.cut(text)}
+    return term in text
+
+
+def _scan(corpus, query):
+    groups, excluded = parse_query(query)
+    return [text for text in corpus.iter_unique_texts()
+            if all(any(_matches(term, text) for term in group) for group in groups)
+            and not any(_matches(term, text) for term in excluded)]
+
+
+@pytest.mark.parametrize('query', QUERIES)
+def test_query_matches_full_scan(index, corpus, query):
+    expected = _scan(corpus, query)
+    assert index.query(query, limit=None) == expected
+    assert index.query(query, limit=5) == expected[:5]
+    counts = dict(corpus.iter_unique())
+    assert index.count(query) == sum(counts[text] for text in expected)
+
+
+@pytest.mark.parametrize('keywords', KEYWORD_SETS)
+@pytest.mark.parametrize('limit', [1, 20, 100000])
+def test_first_rows_match_full_scan(index, corpus, keywords, limit):
+    expected = [text for text in corpus if any(kw in text for kw in keywords)][:limit]
+    assert index.first_rows(keywords, limit) == expected
+
+
+def test_save_load_round_trip(index, corpus, tmp_path):
+    path = str(tmp_path / 'index.bin')
+    index.save(path)
+    loaded = InvertedIndex.load(path, corpus)
+    assert loaded is not None and loaded.term_count == index.term_count
+    for query in QUERIES:
+        assert loaded.query(query, limit=None) == index.query(query, limit=None)
+
+
+def test_stale_or_truncated_index_is_rejected(index, corpus, tmp_path):
+    path = str(tmp_path / 'index.bin')
+    index.save(path)
+    other = DanmakuCorpus.from_iterable(list(corpus)[:-1] + ['另一条弹幕'])
+    assert InvertedIndex.load(path, other) is None
+
+    with open(path, 'r+b') as f:
+        f.truncate(os.path.getsize(path) - 4)
+    assert InvertedIndex.load(path, corpus) is None
+    assert InvertedIndex.load(str(tmp_path / 'missing.bin'), corpus) is None
+
+
+def test_token_query_requires_token_index(corpus):
+    index = InvertedIndex.build(corpus, tokens=False)
+    assert index.query('大模型', limit=None) == _scan(corpus, '大模型')
+    with pytest.raises(ValueError):
+        index.query('=模型')
@@ -0,0 +1,137 @@
+"""
+直播弹幕协议解析与滑动窗口统计的测试（窗口结果与按时间重新全量统计的参考实现对照）
+运行: python -m pytest -q test_live_stream.py
+"""
+import io
+import json
+import random
+import zlib
+from collections import Counter
+
+import pytest
+
+from danmaku_generator import DanmakuGenerator
+from data_analyzer import DataAnalyzer
+from data_processor import DanmakuProcessor
+from live_stream import (BROTLI_AVAILABLE, OP_AUTH_REPLY, OP_HEARTBEAT_REPLY, OP_MESSAGE, PACKET_HEADER,
+                         PROTO_BROTLI, PROTO_JSON, PROTO_ZLIB, LiveDanmakuClient, LiveStubServer,
+                         SlidingWindowStats, _ws_frame, _ws_read_message, decode_packets, encode_packet,
+                         parse_danmu, run_live)
+
+
+def _danmu_packet(text, timestamp_ms=1700000000000):
+    message = {'cmd': 'DANMU_MSG:4:0:2:2:2:0', 'info': [[0, 1, 25, 16777215, timestamp_ms], text, [0, 'u', 0]]}
+    return encode_packet(OP_MESSAGE, json.dumps(message, ensure_ascii=False).encode('utf-8'), PROTO_JSON)
+
+
+def test_round_trip_plain_and_zlib_packets():
+    inner = b''.join(_danmu_packet(f'弹幕{i}') for i in range(50))
+    data = (encode_packet(OP_AUTH_REPLY, b'{"code":0}')
+            + encode_packet(OP_MESSAGE, zlib.compress(inner), PROTO_ZLIB)
+            + encode_packet(OP_HEARTBEAT_REPLY, b'\x00\x00\x01\x00'))
+    packets = list(decode_packets(data))
+    assert packets[0] == (OP_AUTH_REPLY, b'{"code":0}')
+    assert packets[-1] == (OP_HEARTBEAT_REPLY, b'\x00\x00\x01\x00')
+    texts = [parse_danmu(json.loads(body))[0] for op, body in packets[1:-1]]
+    assert texts == [f'弹幕{i}' for i in range(50)]
+
+
+@pytest.mark.skipif(not BROTLI_AVAILABLE, reason='brotli未安装')
+def test_brotli_packets():
+    import brotli
+    inner = _danmu_packet('大模型') * 3
+    packets = list(decode_packets(encode_packet(OP_MESSAGE, brotli.compress(inner), PROTO_BROTLI)))
+    assert [parse_danmu(json.loads(body))[0] for _, body in packets] == ['大模型'] * 3
+
+
+@pytest.mark.parametrize('length,header_len', [(0, 16), (16, 0), (15, 16), (8, 4), (64, 16)])
+def test_malformed_packets_raise(length, header_len):
+    data = PACKET_HEADER.pack(length, header_len, PROTO_JSON, OP_MESSAGE, 1) + b'x' * 8
+    with pytest.raises(ValueError):
+        list(decode_packets(data))
+
+
+def test_malformed_packet_inside_zlib_raises():
+    bad = PACKET_HEADER.pack(0, 16, PROTO_JSON, OP_MESSAGE, 1)
+    with pytest.raises(ValueError):
+        list(decode_packets(encode_packet(OP_MESSAGE, zlib.compress(bad), PROTO_ZLIB)))
+
+
+def test_parse_danmu():
+    assert parse_danmu(json.loads(_danmu_packet('你好')[PACKET_HEADER.size:])) == ('你好', 1700000000.0)
+    assert parse_danmu({'cmd': 'SEND_GIFT', 'info': [[], 'x']}) is None
+    assert parse_danmu({'cmd': 'DANMU_MSG', 'info': [[0]]}) is None
+    assert parse_danmu({'cmd': 'DANMU_MSG', 'info': [[], '无时间戳']})[0] == '无时间戳'
+
+
+@pytest.mark.parametrize('size', [0, 5, 125, 126, 65535, 65536, 70000])
+@pytest.mark.parametrize('mask', [True, False])
+def test_websocket_frames_round_trip(size, mask):
+    payload = random.Random(size).randbytes(size)
+    assert _ws_read_message(io.BytesIO(_ws_frame(payload, mask=mask))) == (0x2, payload)
+
+
+def _reference_window(events, now, window_seconds, bucket_seconds):
+    processor, analyzer = DanmakuProcessor(), DataAnalyzer()
+    buckets = int(round(window_seconds / bucket_seconds))
+    slot = int(now // bucket_seconds)
+    texts = [text for text, t in events if int(t // bucket_seconds) > slot - buckets]
+    valid = [text for text in texts if not processor.is_noise(text)]
+    labels = [analyzer.sentiment_label(text) for text in valid]
+    return {
+        'total': len(texts),
+        'noise': len(texts) - len(valid),
+        'positive': labels.count(1),
+        'negative': labels.count(-1),
+        'counts': Counter(valid),
+    }
+
+
+@pytest.mark.parametrize('window_seconds,bucket_seconds', [(10, 1.0), (5, 0.5), (3, 3)])
+def test_sliding_window_matches_recount(window_seconds, bucket_seconds):
+    rng = random.Random(31)
+    texts = DanmakuGenerator(seed=31).generate(3000)
+    stats = SlidingWindowStats(window_seconds, bucket_seconds)
+    events = []
+    now = 1000.0
+    for i, text in enumerate(texts):
+        # 偶尔出现长时间无弹幕，覆盖一次滑过多个时间桶
+        now += rng.expovariate(50) if rng.random() > 0.002 else rng.uniform(5, 30)
+        stats.add(text, now)
+        events.append((text, now))
+        if i % 250 == 0 or i == len(texts) - 1:
+            expected = _reference_window(events, now, window_seconds, bucket_seconds)
+            snapshot = stats.snapshot(now, top_k=len(expected['counts']) + 1)
+            assert snapshot['total'] == expected['total']
+            assert stats.noise == expected['noise']
+            assert (stats.positive, stats.negative) == (expected['positive'], expected['negative'])
+            assert dict(snapshot['top']) == dict(expected['counts'])
+    assert stats.lifetime_total == len(texts)
+
+    # 窗口完全滑过后清零
+    later = now + window_seconds + bucket_seconds
+    snapshot = stats.snapshot(later)
+    assert snapshot['total'] == 0 and snapshot['top'] == [] and not stats.counts
+
+
+def test_late_message_counts_in_latest_bucket():
+    stats = SlidingWindowStats(10, 1.0)
+    stats.add('大模型真厉害', 100.5)
+    stats.add('大模型真厉害', 95.0)
+    assert stats.snapshot(100.5)['total'] == 2
+    assert stats.snapshot(110.2)['total'] == 0
+
+
+def test_stub_server_end_to_end():
+    stub = LiveStubServer(rate=2000).start()
+    client = LiveDanmakuClient(stub.url, room_id=1, heartbeat_interval=0.1, timeout=0.1)
+    stats = SlidingWindowStats(window_seconds=60)
+    try:
+        client.connect()
+        run_live(client, stats, interval=10, duration=0.5)
+    finally:
+        client.close()
+        stub.stop()
+    assert stats.lifetime_total > 0
+    assert stats.lifetime_total <= stub.sent
+    assert client.popularity > 0
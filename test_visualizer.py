@@ -0,0 +1,30 @@
+"""
+词云词频与 WordCloud.generate(text) 的等价性测试
+运行: python -m pytest -q test_visualizer.py
+"""
+from wordcloud import WordCloud
+
+from danmaku_corpus import DanmakuCorpus
+from danmaku_generator import DanmakuGenerator
+from visualizer import Visualizer
+
+# 覆盖所有格、数字、英文停用词、大小写和复数合并
+EDGE_CASES = [
+    "GPT's 2024 models model The AI is GPTs gpt 666 ChatGPT's it's",
+    'LLMs LLM llm class classes Cats cat\'s 3.5 GPT4',
+]
+
+
+def test_wordcloud_frequencies_match_generate():
+    visualizer = Visualizer()
+    sample = DanmakuGenerator(seed=3).generate(5000) + EDGE_CASES
+    expected = WordCloud(collocations=False).process_text(visualizer.process_text(sample))
+    for data in (sample, DanmakuCorpus.from_iterable(sample)):
+        word_freq = visualizer.count_words(data, wordcloud_filter=True)
+        assert dict(visualizer.merge_cases_and_plurals(word_freq)) == expected
+
+
+def test_count_words_unfiltered_keeps_numbers():
+    visualizer = Visualizer()
+    assert visualizer.count_words(['666 大模型'])['666'] == 1
+    assert '666' not in visualizer.count_words(['666 大模型'], wordcloud_filter=True)
@@ -4,10 +4,13 @@
 """
 import matplotlib.pyplot as plt
 import matplotlib
-from wordcloud import WordCloud
+from wordcloud import WordCloud, STOPWORDS
 import jieba
-from collections import Counter
+import re
+from collections import Counter, defaultdict
 from typing import List
+from danmaku_corpus import iter_weighted
+from external_counter import ExternalCounter
 import numpy as np
 from PIL import Image
 import os
@@ -16,9 +19,16 @@ import os
 matplotlib.rcParams['font.sans-serif'] = ['SimHei', 'Microsoft YaHei', 'Arial Unicode MS']
 matplotlib.rcParams['axes.unicode_minus'] = False
 
+# 与 WordCloud.process_text 相同的英文切词规则和停用词表
+WORDCLOUD_TOKEN_PATTERN = re.compile(r"\w[\w']*")
+WORDCLOUD_STOPWORDS = {word.lower() for word in STOPWORDS}
+
 
 class Visualizer:
-    def __init__(self):
+    def __init__(self, memory_budget: int = None):
+        # 词频统计的内存预算（字节），设置后使用外存计数（词表超出内存时溢写到磁盘）
+        self.memory_budget = memory_budget
+        
         # 设置中文字体（需要根据系统调整）
         self.font_path = self._get_font_path()
         
@@ -29,6 +39,10 @@ class Visualizer:
         jieba.add_word('GPT')
         jieba.add_word('ChatGPT')
         
+        # 停用词
+        self.stop_words = {'的', '了', '是', '我', '你', '他', '她', '它', '们', 
+                           '这', '那', '就', '也', '都', '还', '在', '有', '和'}
+        
     def _get_font_path(self) -> str:
         """
         获取系统中文字体路径
@@ -51,31 +65,95 @@ class Visualizer:
         """
         处理弹幕文本，进行分词
         """
-        # 过滤掉太短的词和停用词
-        stop_words = {'的', '了', '是', '我', '你', '他', '她', '它', '们', 
-                     '这', '那', '就', '也', '都', '还', '在', '有', '和'}
-        
         all_words = []
         for text in danmaku_list:
-            # 使用jieba分词
-            words = jieba.cut(text)
-            for word in words:
-                word = word.strip()
-                if len(word) > 1 and word not in stop_words:
-                    all_words.append(word)
+            all_words.extend(self._tokenize(text))
         
         return ' '.join(all_words)
     
+    def _tokenize(self, text: str) -> List[str]:
+        """
+        使用jieba分词，过滤掉太短的词和停用词
+        """
+        tokens = []
+        for word in jieba.cut(text):
+            word = word.strip()
+            if len(word) > 1 and word not in self.stop_words:
+                tokens.append(word)
+        return tokens
+    
+    def _wordcloud_words(self, word: str) -> List[str]:
+        """
+        按 WordCloud.generate(text) 的规则拆分和过滤单个词：
+        去掉结尾的 's、纯数字和英文停用词（不区分大小写）
+        """
+        words = []
+        for part in WORDCLOUD_TOKEN_PATTERN.findall(word):
+            if part.lower().endswith("'s"):
+                part = part[:-2]
+            if part and not part.isdigit() and part.lower() not in WORDCLOUD_STOPWORDS:
+                words.append(part)
+        return words
+    
+    def count_words(self, danmaku_list: List[str], wordcloud_filter: bool = False) -> Counter:
+        """
+        统计分词后的词频，不生成完整的词列表
+        传入 DanmakuCorpus 时每个不重复文本只分词一次，按出现次数累加
+        wordcloud_filter=True 时额外套用 WordCloud 的数字/停用词过滤（见 _wordcloud_words）
+        设置了 memory_budget 时返回合并完成的 ExternalCounter
+        """
+        def words_of(text):
+            for word in self._tokenize(text):
+                if wordcloud_filter:
+                    yield from self._wordcloud_words(word)
+                else:
+                    yield word
+
+        if self.memory_budget:
+            word_freq = ExternalCounter(self.memory_budget)
+            for text, weight in iter_weighted(danmaku_list):
+                for word in words_of(text):
+                    word_freq.add(word, weight)
+            return word_freq.finalize()
+        word_freq = Counter()
+        for text, weight in iter_weighted(danmaku_list):
+            for word in words_of(text):
+                word_freq[word] += weight
+        return word_freq
+    
+    @staticmethod
+    def merge_cases_and_plurals(word_freq: Counter) -> Counter:
+        """
+        按词频合并大小写变体和英文复数，等价于 wordcloud.tokenization.process_tokens：
+        每个词取出现最多的写法，以 s（非 ss）结尾且单数形式也出现时并入单数
+        """
+        cases = defaultdict(dict)
+        for word, count in word_freq.items():
+            case_dict = cases[word.lower()]
+            case_dict[word] = case_dict.get(word, 0) + count
+        for key in list(cases.keys()):
+            if key.endswith('s') and not key.endswith('ss') and key[:-1] in cases:
+                singular = cases[key[:-1]]
+                for word, count in cases.pop(key).items():
+                    singular[word[:-1]] = singular.get(word[:-1], 0) + count
+        merged = Counter()
+        for case_dict in cases.values():
+            merged[max(case_dict.items(), key=lambda item: item[1])[0]] = sum(case_dict.values())
+        return merged
+    
     def create_wordcloud(self, danmaku_list: List[str], output_path: str = 'wordcloud.png'):
         """
         创建词云图
         """
         print("正在生成词云图...")
         
-        # 处理文本
-        text = self.process_text(danmaku_list)
+        # 处理文本（与原先 wordcloud.generate(text) 一样过滤数字和英文停用词）
+        word_freq = self.count_words(danmaku_list, wordcloud_filter=True)
+        if isinstance(word_freq, Counter):
+            # 外存计数时跳过大小写/复数合并，避免把完整词表载入内存
+            word_freq = self.merge_cases_and_plurals(word_freq)
         
-        if not text:
+        if not word_freq:
             print("警告: 没有有效文本数据生成词云")
             return
         
@@ -103,8 +181,8 @@ class Visualizer:
         # 创建词云对象
         wordcloud = WordCloud(**wordcloud_config)
         
-        # 生成词云
-        wordcloud.generate(text)
+        # 生成词云（WordCloud 只使用前 max_words 个词，只取前N名即可，外存计数时无需载入完整词表）
+        wordcloud.generate_from_frequencies(dict(word_freq.most_common(wordcloud_config['max_words'])))
         
         # 创建图形
         plt.figure(figsize=(20, 12))
@@ -126,17 +204,13 @@ class Visualizer:
         """
         print("正在生成高级词云图...")
         
-        # 处理文本
-        text = self.process_text(danmaku_list)
+        # 使用词频来创建词云
+        word_freq = self.count_words(danmaku_list)
         
-        if not text:
+        if not word_freq:
             print("警告: 没有有效文本数据生成词云")
             return
         
-        # 使用词频来创建词云
-        words = text.split()
-        word_freq = Counter(words)
-        
         # 配置词云参数（更美观的设置）
         wordcloud_config = {
             'width': 1920,
@@ -157,7 +231,7 @@ class Visualizer:
         
         # 创建词云
         wordcloud = WordCloud(**wordcloud_config)
-        wordcloud.generate_from_frequencies(word_freq)
+        wordcloud.generate_from_frequencies(dict(word_freq.most_common(wordcloud_config['max_words'])))
         
         # 创建图形
         fig, ax = plt.subplots(figsize=(20, 12), facecolor='white')